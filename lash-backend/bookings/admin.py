@@ -1,8 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from django.utils import timezone
 from bookings.models import (
     Service, AddOn, Customer, Appointment, 
-    AppointmentClient, BusinessHours, BlockedDate
+    AppointmentClient, BusinessHours, BlockedDate, OutboundEmail
 )
+from bookings.constants import EmailStatus
+from bookings.exceptions import SlotNotAvailableException
 
 
 @admin.register(Service)
@@ -69,6 +73,15 @@ class AppointmentAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        # A save that collides with another booking has been rolled back;
+        # report it on the form instead of as a server error
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except SlotNotAvailableException as error:
+            self.message_user(request, str(error.detail), messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
 
 
 @admin.register(BusinessHours)
@@ -84,3 +97,19 @@ class BlockedDateAdmin(admin.ModelAdmin):
     ordering = ['-date']
     search_fields = ['reason']
 
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'kind', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['subject', 'appointment__confirmation_code']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'sent_at', 'last_error']
+    actions = ['retry_now']
+    
+    @admin.action(description='Retry selected emails now')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=EmailStatus.SENT).update(
+            status=EmailStatus.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} emails queued for retry')
@@ -0,0 +1,238 @@
+"""
+Caching of computed availability and versioned in-process snapshots.
+Built on Django's cache framework, so configuring a shared backend
+(see CACHES in settings) makes invalidation visible to every worker.
+"""
+import hashlib
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def read_counters(*keys: str) -> List[int]:
+    """Read version/generation counters, initialising any that are missing"""
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # Start from a fresh number so an evicted counter can never
+            # come back and revive data cached under an old value
+            cache.add(key, time.time_ns(), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def bump_counter(key: str):
+    """Move a version/generation counter on"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+class AvailabilityCache:
+    """
+    Cache of day schedules and slot lists keyed by date and duration.
+    Entries are never deleted one by one: each date has a generation
+    number that is bumped on invalidation, which orphans every entry
+    for that date whatever duration it was computed for.
+    """
+
+    PREFIX = 'availability'
+    STATS_KEYS = ('hits', 'misses')
+
+    @classmethod
+    def _timeout(cls) -> int:
+        return getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 300)
+
+    @classmethod
+    def _generation_key(cls, date: Optional[datetime.date] = None) -> str:
+        return f'{cls.PREFIX}:generation:{date.isoformat() if date else "all"}'
+
+    @classmethod
+    def _entry_key(cls, date: datetime.date, duration: Optional[int]) -> str:
+        everything, day = read_counters(cls._generation_key(), cls._generation_key(date))
+        return f'{cls.PREFIX}:{everything}:{day}:{date.isoformat()}:{duration or "schedule"}'
+
+    @classmethod
+    def _count(cls, name: str):
+        # Off unless AVAILABILITY_CACHE_STATS: a count costs a cache write per lookup
+        if not getattr(settings, 'AVAILABILITY_CACHE_STATS', False):
+            return
+        key = f'{cls.PREFIX}:stats:{name}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+    @classmethod
+    def get_or_compute(
+        cls,
+        date: datetime.date,
+        duration: Optional[int],
+        compute: Callable
+    ):
+        """Return the cached value for (date, duration), computing it on a miss"""
+        key = cls._entry_key(date, duration)
+        value = cache.get(key)
+
+        if value is not None:
+            cls._count('hits')
+            return value
+
+        cls._count('misses')
+        value = compute()
+        cache.set(key, value, timeout=cls._timeout())
+        return value
+
+    @classmethod
+    def invalidate(cls, *dates: datetime.date):
+        """Drop every cached entry for the given dates"""
+        for date in dates:
+            if date is not None:
+                bump_counter(cls._generation_key(date))
+
+    @classmethod
+    def invalidate_all(cls):
+        """Drop every cached entry, e.g. after business hours change"""
+        bump_counter(cls._generation_key())
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """Hit and miss counters (only counted with AVAILABILITY_CACHE_STATS)"""
+        values = cache.get_many([f'{cls.PREFIX}:stats:{name}' for name in cls.STATS_KEYS])
+        return {
+            name: values.get(f'{cls.PREFIX}:stats:{name}', 0)
+            for name in cls.STATS_KEYS
+        }
+
+    @classmethod
+    def reset_stats(cls):
+        cache.delete_many([f'{cls.PREFIX}:stats:{name}' for name in cls.STATS_KEYS])
+
+
+class ConfirmationCache:
+    """
+    Cache of serialized appointments keyed by confirmation code, for the
+    confirmation page customers keep refreshing. Entries are deleted when
+    the appointment, its clients or its customer change; catalog edits
+    orphan every entry at once through a global generation number.
+    The view stores an (ETag, payload) pair so a hit can answer
+    If-None-Match without serializing anything.
+    """
+
+    PREFIX = 'confirmation'
+
+    @classmethod
+    def _timeout(cls) -> int:
+        return getattr(settings, 'CONFIRMATION_CACHE_TIMEOUT', 60)
+
+    @classmethod
+    def _key(cls, code: str) -> str:
+        generation = read_counters(f'{cls.PREFIX}:generation')[0]
+        # "tagged": bare payloads cached before entries held an ETag are never read
+        return f'{cls.PREFIX}:tagged:{generation}:{code}'
+
+    @classmethod
+    def get_or_compute(cls, code: str, compute: Callable):
+        """Return the cached entry for code, computing it on a miss"""
+        key = cls._key(code)
+        value = cache.get(key)
+
+        if value is None:
+            value = compute()
+            cache.set(key, value, timeout=cls._timeout())
+        return value
+
+    @classmethod
+    def invalidate(cls, *codes: str):
+        """Drop the cached payloads for the given codes"""
+        codes = [code for code in codes if code]
+        if codes:
+            cache.delete_many([cls._key(code) for code in codes])
+
+    @classmethod
+    def invalidate_all(cls):
+        """Drop every cached payload, e.g. after a service is renamed"""
+        bump_counter(f'{cls.PREFIX}:generation')
+
+
+class CatalogCache:
+    """
+    The rendered catalog document (GET /api/catalog/) and its ETag, keyed
+    by the version counters of the snapshots it is built from, so any
+    bump orphans it. The ETag is a hash of the bytes, so every worker
+    gives the same ETag for the same document. Entries expire after
+    SNAPSHOT_MAX_AGE, the same backstop VersionedSnapshot uses for
+    per-process cache backends.
+    """
+
+    PREFIX = 'catalog'
+
+    @classmethod
+    def _timeout(cls) -> int:
+        return getattr(settings, 'SNAPSHOT_MAX_AGE', 60)
+
+    @classmethod
+    def get_or_compute(cls, snapshots: Sequence['VersionedSnapshot'], compute: Callable) -> Tuple[str, bytes]:
+        """Return (ETag, body) for the current versions, rendering the body with compute() on a miss"""
+        versions = read_counters(*(snapshot.version_key for snapshot in snapshots))
+        key = f'{cls.PREFIX}:{":".join(map(str, versions))}'
+        entry = cache.get(key)
+
+        if entry is None:
+            body = compute()
+            entry = (f'"{hashlib.sha256(body).hexdigest()[:32]}"', body)
+            cache.set(key, entry, timeout=cls._timeout())
+        return entry
+
+
+class VersionedSnapshot:
+    """
+    Per-process copy of small, rarely changing tables.
+    Every read compares the snapshot against a version counter in the
+    cache and rebuilds it when the counter has moved on. max_age is a
+    backstop for per-process cache backends, where one worker cannot
+    see another worker's version bump.
+    """
+
+    PREFIX = 'snapshot'
+
+    def __init__(self, name: str, build: Callable, max_age: Optional[int] = None):
+        self.name = name
+        self._build = build
+        self._max_age = max_age
+        # (version, loaded_at, value), replaced as a whole so readers never see a mix
+        self._state = None
+
+    @property
+    def version_key(self) -> str:
+        return f'{self.PREFIX}:version:{self.name}'
+
+    @property
+    def max_age(self) -> int:
+        if self._max_age is not None:
+            return self._max_age
+        return getattr(settings, 'SNAPSHOT_MAX_AGE', 60)
+
+    def version(self) -> int:
+        """Current version counter"""
+        return read_counters(self.version_key)[0]
+
+    def get(self):
+        """Return the snapshot, rebuilding it if it is out of date"""
+        version = self.version()
+        state = self._state
+
+        if state is not None and state[0] == version and time.monotonic() - state[1] < self.max_age:
+            return state[2]
+
+        value = self._build()
+        self._state = (version, time.monotonic(), value)
+        return value
+
+    def invalidate(self):
+        """Mark every worker's copy as out of date"""
+        bump_counter(self.version_key)
@@ -2,6 +2,8 @@
 Constants for the bookings application.
 Centralizes all magic strings and numbers.
 """
+from decimal import Decimal
+
 
 # Appointment Status
 class AppointmentStatus:
@@ -22,6 +24,32 @@ class AppointmentStatus:
     ACTIVE_STATUSES = [PENDING, CONFIRMED]
 
 
+# Outbound email status
+class EmailStatus:
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    
+    CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead letter'),
+    ]
+
+
+# Kinds of outbound email
+class EmailKind:
+    APPOINTMENT_CONFIRMATION = 'appointment_confirmation'
+    ADMIN_NOTIFICATION = 'admin_notification'
+    APPOINTMENT_REMINDER = 'appointment_reminder'
+    
+    CHOICES = [
+        (APPOINTMENT_CONFIRMATION, 'Appointment confirmation'),
+        (ADMIN_NOTIFICATION, 'Admin notification'),
+        (APPOINTMENT_REMINDER, 'Appointment reminder'),
+    ]
+
+
 # Service Categories
 class ServiceCategory:
     CLASSIC = 'classic'
@@ -61,6 +89,81 @@ class TimeSlotConfig:
     SLOT_DURATION_MINUTES = 45
     DEFAULT_OPEN_TIME = '09:00'
     DEFAULT_CLOSE_TIME = '18:00'
+    MAX_CALENDAR_DAYS = 366
+    MAX_BATCH_CANDIDATES = 100
+    # next_available scans 7, 14, 28 then 41 days: at most 4 windows of 1 query
+    NEXT_AVAILABLE_FIRST_WINDOW_DAYS = 7
+    NEXT_AVAILABLE_MAX_DAYS = 90
+    NEXT_AVAILABLE_MAX_LIMIT = 20
+    # Granularity of SlotReservation cells; every slot start falls on this grid
+    RESERVATION_GRID_MINUTES = 15
+
+
+# Pricing
+class PricingConfig:
+    # Flat fee added once per booking when the studio travels to the customer
+    TRANSPORT_FEE = Decimal('2.00')
+
+
+# Booking transaction configuration
+class BookingLockConfig:
+    # Attempts at a booking transaction that hits a lock or serialization conflict
+    MAX_ATTEMPTS = 5
+    # Base delay before a retry, doubled on every attempt and jittered
+    RETRY_BACKOFF_SECONDS = 0.02
+    # First key of the two-key PostgreSQL advisory lock; the second is the date
+    ADVISORY_LOCK_NAMESPACE = 0x4C415348
+
+
+# Email outbox worker
+class EmailOutboxConfig:
+    # Attempts before an email is dead-lettered
+    MAX_ATTEMPTS = 6
+    # Delay before the first retry, doubled after every failure up to the maximum
+    BACKOFF_BASE_SECONDS = 30
+    BACKOFF_MAX_SECONDS = 60 * 60
+    # A claimed email is retried after this long if its worker dies mid-send
+    LEASE_SECONDS = 5 * 60
+    BATCH_SIZE = 20
+    POLL_INTERVAL_SECONDS = 5
+    # Messages sent over one SMTP connection before reconnecting; Gmail
+    # drops a session after about 100
+    MESSAGES_PER_CONNECTION = 50
+
+
+# Day-before reminders (send_reminders)
+class ReminderConfig:
+    # Remind appointments starting within this many hours
+    HOURS_AHEAD = 24
+    # Appointments read, sent and marked per batch
+    BATCH_SIZE = 200
+
+
+# Cursor pagination for list endpoints
+class PaginationConfig:
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    # ?paginate=false returns the whole list as a bare array, as before
+    # pagination; kept while the frontend moves to cursors
+    UNPAGINATED_PARAM = 'paginate'
+
+
+# Idempotency-Key handling for booking requests
+class IdempotencyConfig:
+    HEADER = 'Idempotency-Key'
+    MAX_KEY_LENGTH = 255
+    # A request that holds a key longer than this is assumed to have died
+    IN_FLIGHT_TIMEOUT_SECONDS = 60
+    # How long a duplicate request waits for the original to finish
+    WAIT_SECONDS = 10
+    POLL_INTERVAL_SECONDS = 0.1
+
+
+# Day status in the availability calendar
+class DayStatus:
+    OPEN = 'open'
+    CLOSED = 'closed'
+    FULLY_BOOKED = 'fully_booked'
 
 
 # Validation Messages
@@ -75,6 +178,7 @@ class ValidationMessages:
     DATE_BLOCKED = 'Date is blocked'
     CLOSED_ON_DAY = 'Closed on this day'
     OUTSIDE_BUSINESS_HOURS = 'Outside business hours'
+    ENDS_AFTER_CLOSING = 'Appointment would end after closing time'
     SLOT_ALREADY_BOOKED = 'Time slot already booked'
 
 
@@ -1,177 +1,382 @@
 """
-Email service for sending appointment confirmations.
+Email service for appointment confirmations.
+
+Message bodies are the plain-text and HTML templates in
+templates/bookings/emails/. Bookings do not talk to SMTP:
+queue_booking_emails() renders the messages into the OutboundEmail outbox inside the booking transaction, so they are
+stored only if the booking commits, and the run_email_worker command
+delivers them with retries, exponential backoff and dead-lettering.
 """
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+import random
+import smtplib
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
 from django.conf import settings
-from bookings.models import Appointment
-from datetime import datetime
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import F, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils import timezone
 
+from bookings.constants import EmailKind, EmailOutboxConfig, EmailStatus, PricingConfig
+from bookings.models import Appointment, OutboundEmail
+from bookings.services import AppointmentService
 
-def send_appointment_confirmation(appointment: Appointment) -> bool:
+STUDIO_EMAIL = 'heavenlylashstudiozw@gmail.com'
+
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    body: str
+    html_body: str
+    to: List[str]
+    
+    def message(self) -> EmailMultiAlternatives:
+        """The email as a multipart plain-text and HTML message"""
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=self.to,
+        )
+        message.attach_alternative(self.html_body, 'text/html')
+        return message
+
+
+def load_email_graph(appointment: Appointment) -> Appointment:
+    """
+    Prefetch everything the booking emails show: the customer, each client's
+    service and add-ons. Three queries at most, whatever the number of
+    clients, and none for relations already loaded.
+    """
+    prefetch_related_objects([appointment], 'customer', AppointmentService.clients_prefetch())
+    return appointment
+
+
+def email_context(appointment: Appointment) -> dict:
+    """Template context shared by the booking emails"""
+    appointment_datetime = datetime.combine(
+        appointment.appointment_date,
+        appointment.appointment_time
+    )
+    return {
+        'appointment': appointment,
+        'customer': appointment.customer,
+        'clients': appointment.clients.all(),
+        'appointment_date': appointment_datetime.strftime('%A, %B %d, %Y'),
+        'appointment_time': appointment_datetime.strftime('%I:%M %p'),
+        'transport_fee': PricingConfig.TRANSPORT_FEE,
+        'studio_email': STUDIO_EMAIL,
+        'admin_url': f'http://127.0.0.1:8000/admin/bookings/appointment/{appointment.id}/change/',
+    }
+
+
+def render_email(template_name: str, subject: str, to: List[str], context: dict) -> RenderedEmail:
+    """Render bookings/emails/<template_name>.txt and .html"""
+    return RenderedEmail(
+        subject=subject,
+        body=render_to_string(f'bookings/emails/{template_name}.txt', context),
+        html_body=render_to_string(f'bookings/emails/{template_name}.html', context),
+        to=to,
+    )
+
+
+def build_appointment_confirmation(appointment: Appointment, context: Optional[dict] = None) -> RenderedEmail:
+    """
+    Render the booking confirmation email for the customer.
+    
+    Args:
+        appointment: The Appointment instance
+        context: email_context() for the appointment, if already built
+    """
+    context = context or email_context(load_email_graph(appointment))
+    return render_email(
+        'appointment_confirmation',
+        f'Booking Confirmed - {appointment.confirmation_code}',
+        [context['customer'].email],
+        context
+    )
+
+
+def build_admin_notification(appointment: Appointment, context: Optional[dict] = None) -> RenderedEmail:
+    """
+    Render the new booking notification for the studio.
+    
+    Args:
+        appointment: The Appointment instance
+        context: email_context() for the appointment, if already built
     """
-    Send booking confirmation email to customer.
+    context = context or email_context(load_email_graph(appointment))
+    customer = context['customer']
+    return render_email(
+        'admin_notification',
+        f'🆕 New Booking - {customer.first_name} {customer.last_name} - {context["appointment_date"]}',
+        [STUDIO_EMAIL],
+        context
+    )
+
+
+def build_appointment_reminder(appointment: Appointment, context: Optional[dict] = None) -> RenderedEmail:
+    """
+    Render the day-before reminder for the customer.
+    
+    Args:
+        appointment: The Appointment instance
+        context: email_context() for the appointment, if already built
+    """
+    context = context or email_context(load_email_graph(appointment))
+    return render_email(
+        'appointment_reminder',
+        f'Reminder: your appointment on {context["appointment_date"]} - {appointment.confirmation_code}',
+        [context['customer'].email],
+        context
+    )
+
+
+BOOKING_EMAILS = [
+    (EmailKind.APPOINTMENT_CONFIRMATION, build_appointment_confirmation),
+    (EmailKind.ADMIN_NOTIFICATION, build_admin_notification),
+]
+
+
+def queue_booking_emails(appointment: Appointment) -> List[OutboundEmail]:
+    """
+    Write the booking's confirmation and admin emails to the outbox.
+    
+    Call inside the booking transaction: the emails are stored only if the
+    booking commits, and nothing here waits on the mail server.
     
     Args:
         appointment: The Appointment instance
         
+    Returns:
+        The queued OutboundEmail rows
+    """
+    # Both messages render from one prefetched appointment
+    context = email_context(load_email_graph(appointment))
+    
+    emails = []
+    for kind, build in BOOKING_EMAILS:
+        email = build(appointment, context)
+        emails.append(OutboundEmail(
+            kind=kind,
+            appointment=appointment,
+            subject=email.subject,
+            body=email.body,
+            html_body=email.html_body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=email.to,
+        ))
+    return OutboundEmail.objects.bulk_create(emails)
+
+
+def send_appointment_confirmation(appointment: Appointment) -> bool:
+    """
+    Send booking confirmation email to customer immediately, bypassing the outbox.
+    
     Returns:
         bool: True if email sent successfully, False otherwise
     """
-    try:
-        customer = appointment.customer
-        
-        # Format date and time for email
-        appointment_datetime = datetime.combine(
-            appointment.appointment_date,
-            appointment.appointment_time
-        )
-        formatted_date = appointment_datetime.strftime('%A, %B %d, %Y')
-        formatted_time = appointment_datetime.strftime('%I:%M %p')
-        
-        # Prepare context for email template
-        context = {
-            'customer_name': customer.first_name,
-            'confirmation_code': appointment.confirmation_code,
-            'appointment_date': formatted_date,
-            'appointment_time': formatted_time,
-            'location': appointment.location,
-            'needs_transport': appointment.needs_transport,
-            'total_price': f'${appointment.total_price}',
-            'total_duration': appointment.total_duration,
-            'clients': appointment.clients.all(),
-            'studio_email': 'heavenlylashstudiozw@gmail.com',
-        }
-        
-        # Plain text email content
-        plain_message = f"""
-Hi {customer.first_name},
-
-Your mobile lash appointment at Heavenly Lash Studio has been confirmed!
-
-Booking Details:
-------------------
-Confirmation Code: {appointment.confirmation_code}
-Date: {formatted_date}
-Time: {formatted_time}
-Your Location: {appointment.location}
-Total Duration: {appointment.total_duration} minutes
-Total Price: ${appointment.total_price}{'(includes $2 transport fee)' if appointment.needs_transport else ''}
-
-Services Booked:
-"""
-        
-        for client in appointment.clients.all():
-            plain_message += f"\n• {client.service.name} - ${client.service.price}"
-            if client.add_ons.exists():
-                for addon in client.add_ons.all():
-                    plain_message += f"\n  + {addon.name} - ${addon.price}"
-        
-        plain_message += f"""
+    return _send_now(build_appointment_confirmation(appointment))
 
-We'll come to your location at the scheduled time.
 
-Need to reschedule or have questions?
-Contact us at: heavenlylashstudiozw@gmail.com
+def send_admin_notification(appointment: Appointment) -> bool:
+    """
+    Send new booking notification to admin immediately, bypassing the outbox.
+    
+    Returns:
+        bool: True if email sent successfully, False otherwise
+    """
+    return _send_now(build_admin_notification(appointment))
 
-We look forward to seeing you!
 
-Best regards,
-Heavenly Lash Studio Team
-"""
-        
-        # Send email
-        subject = f'Booking Confirmed - {appointment.confirmation_code}'
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[customer.email],
-            fail_silently=False,
-        )
-        
+def _send_now(email: RenderedEmail) -> bool:
+    try:
+        email.message().send()
         return True
-        
     except Exception as e:
-        print(f'Error sending confirmation email: {str(e)}')
+        print(f'Error sending email: {str(e)}')
         return False
 
 
-def send_admin_notification(appointment: Appointment) -> bool:
+class BatchEmailSender:
     """
-    Send new booking notification to admin.
+    Send many messages over one mail server connection.
     
-    Args:
-        appointment: The Appointment instance
+    send_mail() connects, authenticates (and negotiates TLS) for every
+    message. This keeps the connection open across messages, reconnects
+    after MESSAGES_PER_CONNECTION messages or when the server hangs up,
+    and closes it on exit:
+    
+        with BatchEmailSender() as sender:
+            for message in messages:
+                sender.send(message)
+    """
+    
+    # Errors after which the connection is unusable but the message may go through on a new one
+    CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+    
+    def __init__(self, max_per_connection: int = EmailOutboxConfig.MESSAGES_PER_CONNECTION, **connection_kwargs):
+        self.max_per_connection = max_per_connection
+        self.connection_kwargs = connection_kwargs
+        self.connection = None
+        self.sent_on_connection = 0
+        self.connections_opened = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def open(self):
+        """Replace the current connection with a new one"""
+        self.close()
+        connection = get_connection(fail_silently=False, **self.connection_kwargs)
+        connection.open()
+        self.connection = connection
+        self.sent_on_connection = 0
+        self.connections_opened += 1
+    
+    def close(self):
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            try:
+                connection.close()
+            except Exception:
+                # Closing a connection the server already dropped
+                pass
+    
+    def send(self, message: EmailMessage):
+        """Send one message; raises if it could not be sent"""
+        if self.connection is None or self.sent_on_connection >= self.max_per_connection:
+            self.open()
         
-    Returns:
-        bool: True if email sent successfully, False otherwise
+        try:
+            self.connection.send_messages([message])
+        except self.CONNECTION_ERRORS:
+            # Idle or overused connections get dropped: retry once on a fresh one
+            self.open()
+            self._send_or_close(message)
+        except Exception:
+            # The session may be mid-command; start the next message on a new one
+            self.close()
+            raise
+        self.sent_on_connection += 1
+    
+    def _send_or_close(self, message: EmailMessage):
+        try:
+            self.connection.send_messages([message])
+        except Exception:
+            self.close()
+            raise
+
+
+# Outbox delivery (run_email_worker)
+
+def claim_due_emails(batch_size: int = EmailOutboxConfig.BATCH_SIZE) -> List[OutboundEmail]:
     """
-    try:
-        customer = appointment.customer
+    Lease up to batch_size pending emails that are due.
+    
+    Each claimed email counts an attempt and is pushed LEASE_SECONDS into the
+    future, so parallel workers skip it and a worker that dies mid-send only
+    delays it. Delivery is therefore at-least-once.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(
+            status=EmailStatus.PENDING, next_attempt_at__lte=now
+        ).order_by('next_attempt_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
         
-        # Format date and time for email
-        appointment_datetime = datetime.combine(
-            appointment.appointment_date,
-            appointment.appointment_time
+        OutboundEmail.objects.filter(id__in=ids).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + timedelta(seconds=EmailOutboxConfig.LEASE_SECONDS)
         )
-        formatted_date = appointment_datetime.strftime('%A, %B %d, %Y')
-        formatted_time = appointment_datetime.strftime('%I:%M %p')
-        
-        # Admin notification email
-        admin_message = f"""
-🎉 NEW BOOKING RECEIVED!
-
-Confirmation Code: {appointment.confirmation_code}
-------------------
-
-CUSTOMER DETAILS:
-Name: {customer.first_name} {customer.last_name}
-Email: {customer.email}
-Phone: {customer.phone}
-{"✓ Returning Client" if customer.is_returning else "○ New Client"}
-
-APPOINTMENT DETAILS:
-Date: {formatted_date}
-Time: {formatted_time}
-Location: {appointment.location}
-{"Transport Required: YES ($2 fee included)" if appointment.needs_transport else "Transport Required: NO"}
-
-SERVICES BOOKED:
-"""
-        
-        for client in appointment.clients.all():
-            admin_message += f"\n• {client.service.name} - ${client.service.price} ({client.service.duration} min)"
-            if client.add_ons.exists():
-                for addon in client.add_ons.all():
-                    admin_message += f"\n  + {addon.name} - ${addon.price} ({addon.duration} min)"
-        
-        admin_message += f"""
+        return list(OutboundEmail.objects.filter(id__in=ids).order_by('next_attempt_at', 'id'))
 
-TOTAL:
-Duration: {appointment.total_duration} minutes
-Price: ${appointment.total_price}
 
-{"NOTES: " + appointment.notes if appointment.notes else ""}
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after the given number of failed attempts, with jitter"""
+    seconds = min(
+        EmailOutboxConfig.BACKOFF_BASE_SECONDS * 2 ** (attempts - 1),
+        EmailOutboxConfig.BACKOFF_MAX_SECONDS
+    )
+    # Up to 25% extra so emails that failed together do not retry together
+    return timedelta(seconds=seconds * (1 + random.random() / 4))
 
-------------------
-View in admin panel: http://127.0.0.1:8000/admin/bookings/appointment/{appointment.id}/change/
-"""
-        
-        # Send email to admin
-        subject = f'🆕 New Booking - {customer.first_name} {customer.last_name} - {formatted_date}'
-        
-        send_mail(
-            subject=subject,
-            message=admin_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=['heavenlylashstudiozw@gmail.com'],
-            fail_silently=False,
+
+def deliver(email: OutboundEmail, sender: BatchEmailSender) -> bool:
+    """
+    Send one claimed email over the sender's connection and record the outcome.
+    
+    Failures are retried after retry_delay() until MAX_ATTEMPTS, then the
+    email is dead-lettered for an admin to inspect and retry.
+    
+    Returns:
+        bool: True if the email was sent
+    """
+    try:
+        message = EmailMultiAlternatives(
+            subject=email.subject,
+            body=email.body,
+            from_email=email.from_email,
+            to=email.to,
         )
-        
-        return True
-        
+        if email.html_body:
+            message.attach_alternative(email.html_body, 'text/html')
+        sender.send(message)
     except Exception as e:
-        print(f'Error sending admin notification: {str(e)}')
+        email.last_error = f'{type(e).__name__}: {e}'
+        if email.attempts >= EmailOutboxConfig.MAX_ATTEMPTS:
+            email.status = EmailStatus.DEAD
+        else:
+            email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+        email.save(update_fields=['status', 'next_attempt_at', 'last_error'])
         return False
+    
+    email.status = EmailStatus.SENT
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    email.save(update_fields=['status', 'sent_at', 'last_error'])
+    return True
+
+
+def process_outbox(
+    batch_size: int = EmailOutboxConfig.BATCH_SIZE,
+    sender: Optional[BatchEmailSender] = None
+) -> dict:
+    """
+    Claim and deliver one batch of due emails over one connection.
+    
+    Pass a sender to keep its connection open across batches; otherwise
+    one is opened for this batch and closed afterwards.
+    
+    Returns:
+        Counts of emails 'sent', 'retrying' and 'dead' in this batch
+    """
+    counts = {'sent': 0, 'retrying': 0, 'dead': 0}
+    emails = claim_due_emails(batch_size)
+    if not emails:
+        return counts
+    
+    own_sender = sender is None
+    if own_sender:
+        sender = BatchEmailSender()
+    try:
+        for email in emails:
+            if deliver(email, sender):
+                counts['sent'] += 1
+            elif email.status == EmailStatus.DEAD:
+                counts['dead'] += 1
+            else:
+                counts['retrying'] += 1
+    finally:
+        if own_sender:
+            sender.close()
+    return counts
@@ -59,6 +59,27 @@ class InvalidTimeFormatException(BookingBaseException):
     default_code = 'invalid_time_format'
 
 
+class InvalidDurationException(BookingBaseException):
+    """Raised when a duration is not a positive number of minutes up to a day"""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Invalid duration. Use a number of minutes from 1 to 1440'
+    default_code = 'invalid_duration'
+
+
+class InvalidDateRangeException(BookingBaseException):
+    """Raised when a date range is reversed or too long"""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Invalid date range. end must not be before start'
+    default_code = 'invalid_date_range'
+
+
+class BatchTooLargeException(BookingBaseException):
+    """Raised when a batch request has too many items"""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Too many items in batch request'
+    default_code = 'batch_too_large'
+
+
 class AppointmentNotFoundException(BookingBaseException):
     """Raised when appointment is not found"""
     status_code = status.HTTP_404_NOT_FOUND
@@ -76,6 +97,13 @@ class MissingRequiredParameterException(BookingBaseException):
         super().__init__(detail)
 
 
+class InvalidAddOnListsException(BookingBaseException):
+    """Raised when there are more per-client add-on lists than services"""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Give at most one add_on_ids list per service_ids entry'
+    default_code = 'invalid_add_on_lists'
+
+
 class ServiceNotFoundException(BookingBaseException):
     """Raised when service is not found"""
     status_code = status.HTTP_404_NOT_FOUND
@@ -88,3 +116,24 @@ class AddOnNotFoundException(BookingBaseException):
     status_code = status.HTTP_404_NOT_FOUND
     default_detail = 'Add-on not found'
     default_code = 'addon_not_found'
+
+
+class InvalidIdempotencyKeyException(BookingBaseException):
+    """Raised when an Idempotency-Key header is empty or too long"""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Invalid Idempotency-Key header'
+    default_code = 'invalid_idempotency_key'
+
+
+class IdempotencyKeyInUseException(BookingBaseException):
+    """Raised when a request with the same Idempotency-Key is still being processed"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still in progress'
+    default_code = 'idempotency_key_in_use'
+
+
+class IdempotencyKeyMismatchException(BookingBaseException):
+    """Raised when an Idempotency-Key is reused with a different request body"""
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'Idempotency-Key was already used with a different request'
+    default_code = 'idempotency_key_mismatch'
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from bookings.cache import AvailabilityCache
+
+
+class Command(BaseCommand):
+    help = 'Show availability cache hit/miss counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after showing them')
+        parser.add_argument('--invalidate', action='store_true', help='Drop every cached day')
+
+    def handle(self, *args, **options):
+        if not settings.AVAILABILITY_CACHE_STATS:
+            self.stdout.write('Counting is off; set AVAILABILITY_CACHE_STATS=True to enable it')
+
+        stats = AvailabilityCache.stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = (stats['hits'] / lookups * 100) if lookups else 0
+
+        self.stdout.write(f"Hits:     {stats['hits']}")
+        self.stdout.write(f"Misses:   {stats['misses']}")
+        self.stdout.write(f'Hit rate: {hit_rate:.1f}%')
+
+        if options['reset']:
+            AvailabilityCache.reset_stats()
+            self.stdout.write('Counters reset')
+
+        if options['invalidate']:
+            AvailabilityCache.invalidate_all()
+            self.stdout.write('Cached availability invalidated')
@@ -0,0 +1,114 @@
+import random
+import time as timer
+from datetime import datetime, timedelta, time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from bookings.cache import AvailabilityCache
+from bookings.constants import AppointmentStatus
+from bookings.models import Appointment, BusinessHours, Customer
+from bookings.services import AvailabilityService
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the availability calendar against one available_slots call per day'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, nargs='+', default=[31, 90, 365],
+            help='Range lengths to benchmark'
+        )
+        parser.add_argument(
+            '--per-day', type=int, default=3,
+            help='Synthetic appointments to create per open day'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Runs per measurement (best time is reported)'
+        )
+
+    def handle(self, *args, **options):
+        start_date = datetime.now().date() + timedelta(days=1)
+        longest = max(options['days'])
+
+        # Everything created here is rolled back when the benchmark ends
+        with transaction.atomic():
+            self.create_fixtures(start_date, longest, options['per_day'])
+
+            self.stdout.write(f'{"days":>6} {"calendar ms":>12} {"queries":>8} {"per-day ms":>11} {"queries":>8}')
+            self.stdout.write('-' * 50)
+
+            for days in options['days']:
+                end_date = start_date + timedelta(days=days - 1)
+
+                calendar_ms, calendar_queries = self.measure(
+                    lambda: AvailabilityService.get_availability_calendar(start_date, end_date),
+                    options['repeat']
+                )
+                per_day_ms, per_day_queries = self.measure(
+                    lambda: [
+                        AvailabilityService.get_available_slots(start_date + timedelta(days=offset))
+                        for offset in range(days)
+                    ],
+                    options['repeat']
+                )
+
+                self.stdout.write(
+                    f'{days:>6} {calendar_ms:>12.1f} {calendar_queries:>8} '
+                    f'{per_day_ms:>11.1f} {per_day_queries:>8}'
+                )
+
+            transaction.set_rollback(True)
+
+        # Snapshots and cached days were computed from rolled-back rows
+        AvailabilityService.schedule_changed()
+
+    def create_fixtures(self, start_date, days, per_day):
+        """Create business hours (if missing) and synthetic appointments"""
+        if not BusinessHours.objects.exists():
+            for weekday in range(7):
+                BusinessHours.objects.create(
+                    weekday=weekday, is_open=True,
+                    open_time=time(9, 30), close_time=time(18, 0)
+                )
+
+        customer = Customer.objects.create(
+            first_name='Benchmark', last_name='Customer',
+            email='benchmark@example.com', phone='0000000000'
+        )
+
+        rng = random.Random(42)
+        appointments = []
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            for index in range(per_day):
+                start = time(rng.randint(9, 16), rng.choice([0, 15, 30, 45]))
+                duration = rng.choice([90, 105, 120, 150])
+                # bulk_create skips save(), so fill in the denormalized end time here
+                appointments.append(Appointment(
+                    customer=customer,
+                    appointment_date=day,
+                    appointment_time=start,
+                    appointment_end_time=Appointment.calculate_end_time(start, duration),
+                    status=AppointmentStatus.CONFIRMED,
+                    confirmation_code=f'BENCH-{offset:04d}-{index:02d}',
+                    total_duration=duration,
+                    total_price=120,
+                ))
+        Appointment.objects.bulk_create(appointments)
+        AvailabilityService.schedule_changed()
+
+    def measure(self, func, repeat):
+        """Return (best milliseconds, queries per run)"""
+        best = None
+        for _ in range(repeat):
+            # Measure computation, not cache hits
+            AvailabilityCache.invalidate_all()
+            with CaptureQueriesContext(connection) as queries:
+                started = timer.perf_counter()
+                func()
+                elapsed = (timer.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(queries)
@@ -0,0 +1,98 @@
+import socket
+import time as timer
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.constants import EmailOutboxConfig
+from bookings.email_service import BatchEmailSender
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark messages/second with a new SMTP connection per message '
+        'against BatchEmailSender connection reuse. Starts a local aiosmtpd '
+        'sink unless --host is given (pip install aiosmtpd).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='Messages per run')
+        parser.add_argument(
+            '--per-connection', type=int, default=EmailOutboxConfig.MESSAGES_PER_CONNECTION,
+            help='Messages per connection when reusing connections'
+        )
+        parser.add_argument('--host', help='SMTP server to use instead of a local sink')
+        parser.add_argument('--port', type=int, default=25, help='Port of --host')
+        parser.add_argument('--use-tls', action='store_true', help='STARTTLS with --host')
+
+    def handle(self, *args, **options):
+        controller = None
+        if options['host']:
+            host, port = options['host'], options['port']
+        else:
+            controller = self.start_sink()
+            host, port = controller.hostname, controller.port
+            self.stdout.write(f'aiosmtpd sink on {host}:{port}')
+
+        connection_kwargs = {
+            'backend': SMTP_BACKEND, 'host': host, 'port': port,
+            'use_tls': options['use_tls'], 'use_ssl': False,
+            'username': '', 'password': '', 'timeout': 10,
+        }
+        messages = [
+            EmailMessage(
+                subject=f'Benchmark {number}', body='Booking confirmation body\n' * 20,
+                from_email='studio@example.com', to=[f'client{number}@example.com']
+            )
+            for number in range(options['messages'])
+        ]
+
+        try:
+            results = [
+                ('connection per message', *self.time_per_message(messages, connection_kwargs)),
+                (f'reuse, {options["per_connection"]}/connection',
+                 *self.time_batched(messages, connection_kwargs, options['per_connection'])),
+            ]
+        finally:
+            if controller is not None:
+                controller.stop()
+
+        self.stdout.write(f'{"mode":<28} {"messages":>9} {"connections":>12} {"seconds":>8} {"msg/s":>8}')
+        self.stdout.write('-' * 69)
+        for mode, seconds, connections in results:
+            self.stdout.write(
+                f'{mode:<28} {len(messages):>9} {connections:>12} {seconds:>8.2f} '
+                f'{len(messages) / seconds:>8.0f}'
+            )
+        speedup = results[0][1] / results[1][1]
+        self.stdout.write(self.style.SUCCESS(f'Connection reuse is {speedup:.1f}x faster'))
+
+    def start_sink(self):
+        try:
+            from aiosmtpd.controller import Controller
+            from aiosmtpd.handlers import Sink
+        except ImportError:
+            raise CommandError('aiosmtpd is not installed: pip install aiosmtpd, or pass --host')
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        controller = Controller(Sink(), hostname='127.0.0.1', port=port)
+        controller.start()
+        return controller
+
+    def time_per_message(self, messages, connection_kwargs):
+        """What send_mail() does: connect, send and quit for every message"""
+        started = timer.perf_counter()
+        for message in messages:
+            get_connection(fail_silently=False, **connection_kwargs).send_messages([message])
+        return timer.perf_counter() - started, len(messages)
+
+    def time_batched(self, messages, connection_kwargs, per_connection):
+        started = timer.perf_counter()
+        with BatchEmailSender(per_connection, **connection_kwargs) as sender:
+            for message in messages:
+                sender.send(message)
+        return timer.perf_counter() - started, sender.connections_opened
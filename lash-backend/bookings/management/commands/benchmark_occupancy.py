@@ -0,0 +1,119 @@
+import random
+import time as timer
+from datetime import datetime, timedelta, time
+
+from django.core.management.base import BaseCommand
+
+from bookings.constants import TimeSlotConfig
+from bookings.services import DayOccupancy
+
+
+def datetime_loop_starts(day, bookings, open_time, close_time, duration):
+    """The original approach: datetime.combine per slot and a scan of every booking"""
+    slots = []
+    current = datetime.combine(day, open_time)
+    end_of_day = datetime.combine(day, close_time)
+
+    while current < end_of_day:
+        slot_end = current + timedelta(minutes=duration)
+        is_available = True
+        for booked_time, booked_duration in bookings:
+            booked_start = datetime.combine(day, booked_time)
+            booked_end = booked_start + timedelta(minutes=booked_duration)
+            if booked_start < slot_end and booked_end > current:
+                is_available = False
+                break
+        slots.append({'time': current.strftime('%H:%M'), 'available': is_available})
+        current += timedelta(minutes=TimeSlotConfig.SLOT_DURATION_MINUTES)
+
+    return [slot['time'] for slot in slots if slot['available']]
+
+
+def interval_sweep_starts(intervals, starts, duration):
+    """Sorted-interval sweep over (start_minute, end_minute) pairs"""
+    intervals = sorted(intervals)
+    available = []
+    index = 0
+    latest_end = None
+
+    for start in starts:
+        while index < len(intervals) and intervals[index][0] < start + duration:
+            end = intervals[index][1]
+            latest_end = end if latest_end is None else max(latest_end, end)
+            index += 1
+        if latest_end is None or latest_end <= start:
+            available.append(start)
+
+    return available
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the bitmap day occupancy against list and datetime based slot loops'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--appointments', type=int, nargs='+', default=[0, 5, 10, 20, 40],
+            help='Bookings per synthetic day'
+        )
+        parser.add_argument('--days', type=int, default=500, help='Synthetic days per measurement')
+        parser.add_argument('--duration', type=int, default=150, help='Requested duration in minutes')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        day = datetime.now().date()
+        open_time, close_time = time(9, 30), time(18, 0)
+        open_minute, close_minute = 9 * 60 + 30, 18 * 60
+        starts = list(range(open_minute, close_minute, TimeSlotConfig.SLOT_DURATION_MINUTES))
+        duration = options['duration']
+
+        self.stdout.write(
+            f'{"bookings":>9} {"datetime µs":>12} {"sweep µs":>10} {"bitmap µs":>10} {"built µs":>10}'
+        )
+        self.stdout.write('-' * 56)
+
+        for count in options['appointments']:
+            days = []
+            for _ in range(options['days']):
+                bookings = [
+                    (time(rng.randint(9, 17), rng.choice([0, 15, 30, 45])), rng.choice([45, 90, 120, 150]))
+                    for _ in range(count)
+                ]
+                intervals = [
+                    (booked.hour * 60 + booked.minute, booked.hour * 60 + booked.minute + length)
+                    for booked, length in bookings
+                ]
+                days.append((bookings, intervals))
+
+            datetime_us = self.measure(lambda: [
+                datetime_loop_starts(day, bookings, open_time, close_time, duration)
+                for bookings, _ in days
+            ], len(days))
+            sweep_us = self.measure(lambda: [
+                interval_sweep_starts(intervals, starts, duration)
+                for _, intervals in days
+            ], len(days))
+            # Building the bitmap is included, as DaySchedule.load does it
+            bitmap_us = self.measure(lambda: [
+                DayOccupancy.from_intervals(intervals).fitting_starts(starts, duration)
+                for _, intervals in days
+            ], len(days))
+            # A cached DaySchedule reuses its bitmap, so only the lookups remain
+            occupancies = [DayOccupancy.from_intervals(intervals) for _, intervals in days]
+            cached_us = self.measure(lambda: [
+                occupancy.fitting_starts(starts, duration) for occupancy in occupancies
+            ], len(days))
+
+            self.stdout.write(
+                f'{count:>9} {datetime_us:>12.2f} {sweep_us:>10.2f} {bitmap_us:>10.2f} '
+                f'{cached_us:>10.2f}'
+            )
+
+    def measure(self, func, days, repeat=3):
+        """Best time per day in microseconds"""
+        best = None
+        for _ in range(repeat):
+            started = timer.perf_counter()
+            func()
+            elapsed = timer.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best / days * 1_000_000
@@ -0,0 +1,76 @@
+import time as timer
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from bookings.views import AddOnViewSet, AppointmentViewSet, BusinessHoursViewSet, ServiceViewSet
+
+
+def legacy(viewset):
+    """The viewset as it was: ModelSerializer list() and the stdlib JSON renderer/parser"""
+    return type(f'Legacy{viewset.__name__}', (viewset,), {
+        'list': viewsets.ReadOnlyModelViewSet.list,
+        'renderer_classes': [JSONRenderer],
+        'parser_classes': [JSONParser],
+    })
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark requests/second for the page-load read endpoints (services, '
+        'add-ons, business hours, available slots) against ModelSerializer and '
+        'the stdlib JSON renderer. Uses the current database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per measurement')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        slots_date = (timezone.localdate() + timedelta(days=1)).isoformat()
+        endpoints = [
+            ('services', ServiceViewSet, 'list', '/api/services/'),
+            ('addons', AddOnViewSet, 'list', '/api/addons/'),
+            ('business-hours', BusinessHoursViewSet, 'list', '/api/business-hours/'),
+            ('available_slots', AppointmentViewSet, 'available_slots',
+             f'/api/appointments/available_slots/?date={slots_date}'),
+        ]
+
+        self.stdout.write(f'{"endpoint":<16} {"bytes":>7} {"before req/s":>13} {"after req/s":>12} {"speedup":>8}')
+        self.stdout.write('-' * 60)
+        for name, viewset, action, url in endpoints:
+            before_view = legacy(viewset).as_view({'get': action})
+            after_view = viewset.as_view({'get': action})
+            before_body = self.render(before_view, factory.get(url))
+            after_body = self.render(after_view, factory.get(url))
+            if before_body != after_body:
+                self.stdout.write(self.style.ERROR(f'{name}: responses differ'))
+
+            before = self.rate(before_view, factory, url, options)
+            after = self.rate(after_view, factory, url, options)
+            self.stdout.write(
+                f'{name:<16} {len(after_body):>7} {before:>13.0f} {after:>12.0f} {after / before:>7.2f}x'
+            )
+
+    @staticmethod
+    def render(view, request):
+        response = view(request)
+        response.render()
+        return response.content
+
+    def rate(self, view, factory, url, options):
+        best = None
+        for _ in range(options['repeat']):
+            requests = [factory.get(url) for _ in range(options['requests'])]
+            started = timer.perf_counter()
+            for request in requests:
+                self.render(view, request)
+            elapsed = timer.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return options['requests'] / best
@@ -0,0 +1,317 @@
+import csv
+import json
+import time as timer
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from bookings.cache import AvailabilityCache
+from bookings.constants import AppointmentStatus, ValidationMessages
+from bookings.exceptions import BookingBaseException, SlotNotAvailableException
+from bookings.models import Appointment, AppointmentClient, Customer, SlotReservation
+from bookings.serializers import AppointmentCreateSerializer
+from bookings.services import AppointmentService, AvailabilityService, DaySchedule, time_to_minutes
+
+
+class Command(BaseCommand):
+    help = (
+        'Import bookings from a CSV or JSONL file in constant memory. '
+        'JSONL lines use the POST /api/appointments/ body. CSV rows use the same '
+        'column names, with a "clients" column such as '
+        '"classic-natural+colored-tips;volume-full" (clients separated by ";", '
+        'add-ons joined to their service with "+"). Rows that fail validation or '
+        'availability are written to a reject file with the reason.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV or JSONL file to import')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Input format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--rejects',
+            help='Where to write rejected rows (default: <file>.rejects.<format>)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Rows validated and written per transaction'
+        )
+        parser.add_argument(
+            '--status', default=AppointmentStatus.CONFIRMED,
+            choices=[choice for choice, _ in AppointmentStatus.CHOICES],
+            help='Status for rows without a status column (default: confirmed)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Validate and check availability, then roll every chunk back'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['file'])
+        if not path.exists():
+            raise CommandError(f'{path} does not exist')
+
+        file_format = options['format'] or ('jsonl' if path.suffix in ('.jsonl', '.ndjson') else 'csv')
+        rejects_path = Path(options['rejects'] or f'{path}.rejects.{file_format}')
+        self.default_status = options['status']
+        self.serializer = AppointmentCreateSerializer()
+
+        totals = {'rows': 0, 'imported': 0, 'rejected': 0}
+        started = timer.perf_counter()
+
+        with path.open(newline='', encoding='utf-8') as source, \
+                rejects_path.open('w', newline='', encoding='utf-8') as rejects_file:
+            rows = self.read_csv(source) if file_format == 'csv' else self.read_jsonl(source)
+            self.reject = self.reject_writer(rejects_file, file_format)
+
+            for chunk_number, chunk in enumerate(iter(lambda: list(islice(rows, options['chunk_size'])), []), 1):
+                imported = self.import_chunk(chunk, options['dry_run'])
+                totals['rows'] += len(chunk)
+                totals['imported'] += imported
+                totals['rejected'] += len(chunk) - imported
+
+                if options['verbosity'] >= 2 or chunk_number % 10 == 0:
+                    elapsed = timer.perf_counter() - started
+                    self.stdout.write(f'{totals["rows"]} rows, {totals["rows"] / elapsed:.0f} rows/s')
+
+        elapsed = timer.perf_counter() - started
+        rate = totals['rows'] / elapsed if elapsed else 0
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {totals["imported"]} of {totals["rows"]} rows in {elapsed:.1f}s ({rate:.0f} rows/s)'
+        ))
+        if totals['rejected']:
+            self.stdout.write(self.style.WARNING(f'{totals["rejected"]} rejected rows written to {rejects_path}'))
+
+    # Reading
+
+    def read_csv(self, source):
+        """Yield (line number, original row, booking data) for each CSV row"""
+        reader = csv.DictReader(source)
+        self.csv_fields = reader.fieldnames or []
+        for row in reader:
+            # Blank optional cells mean "not given", not an empty value
+            data = {key: value for key, value in row.items() if key and value not in ('', None)}
+            data['clients'] = [
+                {'service_id': ids[0], 'add_on_ids': ids[1:]}
+                for ids in (
+                    [part.strip() for part in client.split('+') if part.strip()]
+                    for client in data.get('clients', '').split(';')
+                )
+                if ids
+            ]
+            yield reader.line_num, row, data
+
+    def read_jsonl(self, source):
+        """Yield (line number, original line, booking data) for each JSONL line"""
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as error:
+                data = error
+            yield line_number, line, data
+
+    def reject_writer(self, rejects_file, file_format):
+        """Return a function that records a rejected row and its reason"""
+        if file_format == 'jsonl':
+            def reject(line_number, original, reason):
+                rejects_file.write(json.dumps({'line': line_number, 'error': reason, 'row': original.rstrip('\n')}) + '\n')
+            return reject
+
+        writer = None
+
+        def reject(line_number, original, reason):
+            nonlocal writer
+            if writer is None:
+                writer = csv.DictWriter(rejects_file, fieldnames=['line', 'error', *self.csv_fields])
+                writer.writeheader()
+            writer.writerow({'line': line_number, 'error': reason, **original})
+        return reject
+
+    # Importing
+
+    def validate(self, data):
+        """Apply the API's validation rules and price the booking; raises on bad rows"""
+        if isinstance(data, Exception):
+            raise ValidationError(f'Invalid JSON: {data}')
+        if not isinstance(data, dict):
+            raise ValidationError('Expected a JSON object')
+
+        # One serializer for every row: building its fields is costlier than validating
+        booking = self.serializer.run_validation(data)
+
+        status = data.get('status', self.default_status)
+        if status not in dict(AppointmentStatus.CHOICES):
+            raise ValidationError(f'Invalid status: {status}')
+
+        clients = booking['clients']
+        quote = AppointmentService.quote(
+            [client['service_id'] for client in clients],
+            [client.get('add_on_ids', []) for client in clients],
+            booking['needs_transport']
+        )
+        return {**booking, 'status': status, 'quote': quote}
+
+    def import_chunk(self, chunk, dry_run):
+        """Validate, check and write one chunk of rows; returns how many were imported"""
+        valid = []
+        for line_number, original, data in chunk:
+            try:
+                valid.append((line_number, original, self.validate(data)))
+            except (ValidationError, BookingBaseException) as error:
+                self.reject(line_number, original, self.describe(error))
+
+        if not valid:
+            return 0
+
+        with transaction.atomic():
+            dates = sorted({booking['appointment_date'] for _, _, booking in valid})
+            # Same per-date locks as the API, so live bookings cannot slip in between
+            AppointmentService.lock_dates(dates)
+            schedules = DaySchedule.load_dates(dates)
+            # Cells are rounded outwards to the grid, so bookings that do not
+            # overlap by the minute can still share one; check those too
+            reserved = set(
+                SlotReservation.objects.filter(date__in=dates).values_list('date', 'cell')
+            )
+
+            accepted = []
+            for line_number, original, booking in valid:
+                if booking['status'] in AppointmentStatus.ACTIVE_STATUSES:
+                    schedule = schedules[booking['appointment_date']]
+                    duration = booking['quote']['total_duration']
+                    cells = {
+                        (booking['appointment_date'], cell)
+                        for cell in AppointmentService.grid_cells(booking['appointment_time'], duration)
+                    }
+                    try:
+                        AvailabilityService.check_schedule(schedule, booking['appointment_time'], duration)
+                        if cells & reserved:
+                            raise SlotNotAvailableException(ValidationMessages.SLOT_ALREADY_BOOKED)
+                    except BookingBaseException as error:
+                        self.reject(line_number, original, self.describe(error))
+                        continue
+                    # Later rows in the file see this booking
+                    start = time_to_minutes(booking['appointment_time'])
+                    schedule.occupancy.occupy(start, start + duration)
+                    reserved |= cells
+                accepted.append(booking)
+
+            self.write_bookings(accepted)
+
+            if dry_run:
+                transaction.set_rollback(True)
+
+        if not dry_run:
+            AvailabilityCache.invalidate(*dates)
+        return len(accepted)
+
+    def write_bookings(self, bookings):
+        """Insert customers, appointments, clients, add-ons and slot cells in bulk"""
+        customer_ids = self.resolve_customers(bookings)
+        codes = self.confirmation_codes(len(bookings))
+
+        appointments = Appointment.objects.bulk_create([
+            Appointment(
+                customer_id=customer_ids[booking['email']],
+                appointment_date=booking['appointment_date'],
+                appointment_time=booking['appointment_time'],
+                # bulk_create skips save(), so fill in the denormalized end time here
+                appointment_end_time=Appointment.calculate_end_time(
+                    booking['appointment_time'], booking['quote']['total_duration']
+                ),
+                location=booking['location'],
+                needs_transport=booking['needs_transport'],
+                notes=booking.get('notes', ''),
+                confirmation_code=code,
+                total_duration=booking['quote']['total_duration'],
+                total_price=booking['quote']['total_price'],
+                status=booking['status'],
+            )
+            for booking, code in zip(bookings, codes)
+        ])
+
+        client_rows = [
+            (appointment, client)
+            for appointment, booking in zip(appointments, bookings)
+            for client in booking['quote']['clients']
+        ]
+        appointment_clients = AppointmentClient.objects.bulk_create([
+            AppointmentClient(
+                appointment=appointment,
+                client_number=client['client_number'],
+                service_id=client['service_id']
+            )
+            for appointment, client in client_rows
+        ])
+
+        ClientAddOn = AppointmentClient.add_ons.through
+        ClientAddOn.objects.bulk_create([
+            ClientAddOn(appointmentclient_id=appointment_client.id, addon_id=addon_id)
+            for appointment_client, (_, client) in zip(appointment_clients, client_rows)
+            for addon_id in client['add_on_ids']
+        ])
+
+        # Signals do not run for bulk_create, so reserve the slot cells here
+        SlotReservation.objects.bulk_create([
+            SlotReservation(appointment=appointment, date=appointment.appointment_date, cell=cell)
+            for appointment in appointments
+            if appointment.status in AppointmentStatus.ACTIVE_STATUSES
+            for cell in AppointmentService.reservation_cells(appointment)
+        ])
+
+    def resolve_customers(self, bookings):
+        """Map each email to a customer ID, creating customers that do not exist yet"""
+        emails = {booking['email'] for booking in bookings}
+        customer_ids = {}
+        # Oldest customer wins when an email is already duplicated
+        for email, customer_id in (
+            Customer.objects.filter(email__in=emails).order_by('-id').values_list('email', 'id')
+        ):
+            customer_ids[email] = customer_id
+
+        new_customers = {}
+        for booking in bookings:
+            if booking['email'] not in customer_ids and booking['email'] not in new_customers:
+                new_customers[booking['email']] = Customer(
+                    first_name=booking['first_name'],
+                    last_name=booking['last_name'],
+                    email=booking['email'],
+                    phone=booking['phone'],
+                    is_returning=booking['is_returning'],
+                )
+
+        for customer in Customer.objects.bulk_create(new_customers.values()):
+            customer_ids[customer.email] = customer.id
+        return customer_ids
+
+    def confirmation_codes(self, count):
+        """count confirmation codes not used by any appointment"""
+        codes = set()
+        while len(codes) < count:
+            candidates = {AppointmentService.generate_confirmation_code() for _ in range(count - len(codes))}
+            taken = set(
+                Appointment.objects.filter(confirmation_code__in=candidates)
+                .values_list('confirmation_code', flat=True)
+            )
+            codes |= candidates - taken
+        return list(codes)
+
+    @staticmethod
+    def describe(error):
+        """Flatten a DRF error into one line for the reject file"""
+        detail = error.detail
+        if isinstance(detail, dict):
+            return '; '.join(
+                f'{field}: {" ".join(map(str, messages)) if isinstance(messages, list) else messages}'
+                for field, messages in detail.items()
+            )
+        if isinstance(detail, list):
+            return ' '.join(map(str, detail))
+        return str(detail)
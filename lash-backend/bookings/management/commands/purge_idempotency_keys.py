@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookings.services import IdempotencyService
+
+
+class Command(BaseCommand):
+    help = 'Delete expired Idempotency-Key records'
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyService.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
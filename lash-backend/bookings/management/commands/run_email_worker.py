@@ -0,0 +1,76 @@
+import time as timer
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from bookings.constants import EmailOutboxConfig, EmailStatus
+from bookings.email_service import BatchEmailSender, process_outbox
+from bookings.models import OutboundEmail
+
+
+class Command(BaseCommand):
+    help = (
+        'Send queued emails from the outbox. Failed sends are retried with '
+        'exponential backoff and dead-lettered after '
+        f'{EmailOutboxConfig.MAX_ATTEMPTS} attempts. Busy queues are sent over one '
+        'reused SMTP connection. Safe to run several workers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Send everything that is due, then exit (for cron)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=EmailOutboxConfig.BATCH_SIZE,
+            help='Emails claimed per batch'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=EmailOutboxConfig.POLL_INTERVAL_SECONDS,
+            help='Seconds to wait when nothing is due'
+        )
+        parser.add_argument(
+            '--per-connection', type=int, default=EmailOutboxConfig.MESSAGES_PER_CONNECTION,
+            help='Messages sent over one SMTP connection before reconnecting'
+        )
+        parser.add_argument(
+            '--retry-dead', action='store_true',
+            help='Move dead-lettered emails back to the queue before starting'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_dead']:
+            requeued = OutboundEmail.objects.filter(status=EmailStatus.DEAD).update(
+                status=EmailStatus.PENDING, attempts=0, next_attempt_at=timezone.now()
+            )
+            self.stdout.write(f'Requeued {requeued} dead-lettered emails')
+
+        totals = {'sent': 0, 'retrying': 0, 'dead': 0}
+        # One SMTP connection carries consecutive batches while the queue is busy
+        sender = BatchEmailSender(options['per_connection'])
+        try:
+            while True:
+                close_old_connections()
+                counts = process_outbox(options['batch_size'], sender)
+                for outcome, count in counts.items():
+                    totals[outcome] += count
+                if counts['sent'] or counts['retrying'] or counts['dead']:
+                    self.stdout.write(
+                        f'sent {counts["sent"]}, retrying {counts["retrying"]}, dead {counts["dead"]}'
+                    )
+
+                if sum(counts.values()) < options['batch_size']:
+                    # Batch not full: nothing else is due right now
+                    sender.close()
+                    if options['once']:
+                        break
+                    timer.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sender.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {totals["sent"]} emails; {totals["retrying"]} to retry, {totals["dead"]} dead-lettered'
+        ))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from bookings.models import Service, AddOn, BusinessHours
+from bookings.services import AvailabilityService
 
 
 class Command(BaseCommand):
@@ -132,6 +133,9 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(f'  ✓ Created hours: {day_name} (Closed)')
         
+        # Business hours were replaced wholesale, so refresh every worker's snapshot
+        AvailabilityService.schedule_changed()
+        
         self.stdout.write(self.style.SUCCESS('\n✅ Database seeded successfully!'))
         self.stdout.write(f'Created {len(services_data)} services')
         self.stdout.write(f'Created {len(addons_data)} add-ons')
@@ -0,0 +1,96 @@
+import time as timer
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bookings.constants import EmailOutboxConfig, ReminderConfig
+from bookings.email_service import BatchEmailSender, build_appointment_reminder, email_context
+from bookings.models import Appointment
+from bookings.services import AppointmentService
+
+
+class Command(BaseCommand):
+    help = (
+        'Email reminders for active appointments starting in the next '
+        f'{ReminderConfig.HOURS_AHEAD} hours. Appointments are streamed in batches '
+        'over one SMTP connection, and each batch is marked sent with one UPDATE, '
+        'so memory stays flat and re-running sends nothing twice. Run hourly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours-ahead', type=float, default=ReminderConfig.HOURS_AHEAD,
+            help='Remind appointments starting within this many hours'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=ReminderConfig.BATCH_SIZE,
+            help='Appointments read, sent and marked per batch'
+        )
+        parser.add_argument(
+            '--per-connection', type=int, default=EmailOutboxConfig.MESSAGES_PER_CONNECTION,
+            help='Messages sent over one SMTP connection before reconnecting'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List the appointments that would be reminded without sending'
+        )
+
+    def handle(self, *args, **options):
+        # Appointment dates and times are local wall-clock values
+        window_start = timezone.localtime().replace(tzinfo=None)
+        window_end = window_start + timedelta(hours=options['hours_ahead'])
+        appointments = AppointmentService.due_reminders(window_start, window_end).iterator(
+            chunk_size=options['batch_size']
+        )
+
+        totals = {'sent': 0, 'failed': 0}
+        started = timer.perf_counter()
+        batch = []
+        with BatchEmailSender(options['per_connection']) as sender:
+            for appointment in appointments:
+                batch.append(appointment)
+                if len(batch) == options['batch_size']:
+                    self.send_batch(batch, sender, totals, options['dry_run'])
+                    batch = []
+            if batch:
+                self.send_batch(batch, sender, totals, options['dry_run'])
+
+        elapsed = timer.perf_counter() - started
+        verb = 'Would send' if options['dry_run'] else 'Sent'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {totals["sent"]} reminders for {window_start:%Y-%m-%d %H:%M} to '
+            f'{window_end:%Y-%m-%d %H:%M} in {elapsed:.1f}s'
+        ))
+        if totals['failed']:
+            self.stdout.write(self.style.WARNING(
+                f'{totals["failed"]} reminders failed and will be retried on the next run'
+            ))
+
+    def send_batch(self, batch, sender, totals, dry_run):
+        """Send one batch of reminders, then mark the ones that went out with one UPDATE"""
+        sent_ids = []
+        for appointment in batch:
+            if dry_run:
+                self.stdout.write(
+                    f'{appointment.appointment_date} {appointment.appointment_time:%H:%M} '
+                    f'{appointment.confirmation_code} {appointment.customer.email}'
+                )
+                sent_ids.append(appointment.id)
+                continue
+
+            email = build_appointment_reminder(appointment, email_context(appointment))
+            try:
+                sender.send(email.message())
+            except Exception as e:
+                totals['failed'] += 1
+                self.stderr.write(f'Reminder for {appointment.confirmation_code} failed: {e}')
+                continue
+            sent_ids.append(appointment.id)
+
+        if sent_ids and not dry_run:
+            # Only rows still unmarked, in case another run got there first
+            Appointment.objects.filter(id__in=sent_ids, reminder_sent_at__isnull=True).update(
+                reminder_sent_at=timezone.now()
+            )
+        totals['sent'] += len(sent_ids)
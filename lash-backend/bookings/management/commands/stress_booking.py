@@ -0,0 +1,138 @@
+import threading
+import time as timer
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from bookings.exceptions import SlotNotAvailableException
+from bookings.models import Appointment, Customer, OutboundEmail, Service
+from bookings.serializers import AppointmentCreateSerializer
+from bookings.services import AvailabilityService
+
+
+class Command(BaseCommand):
+    help = 'Fire parallel bookings at the same slot and check exactly one wins each round'
+
+    EMAIL_DOMAIN = 'stress.example.com'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=16,
+            help='Concurrent bookings per round'
+        )
+        parser.add_argument(
+            '--rounds', type=int, default=5,
+            help='Rounds to run, each on its own open date'
+        )
+        parser.add_argument(
+            '--days-ahead', type=int, default=400,
+            help='How far ahead to start looking for open dates'
+        )
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the bookings made instead of deleting them afterwards'
+        )
+
+    def handle(self, *args, **options):
+        service = Service.objects.filter(is_active=True).order_by('duration').first()
+        if service is None:
+            raise CommandError('No active services to book')
+
+        dates = self.open_dates(
+            datetime.now().date() + timedelta(days=options['days_ahead']),
+            options['rounds']
+        )
+
+        self.stdout.write(f'{"date":>10} {"won":>4} {"lost":>5} {"errors":>7} {"ms":>8} {"attempts/s":>11}')
+        self.stdout.write('-' * 50)
+
+        total_attempts = 0
+        total_seconds = 0
+        failed_rounds = []
+
+        try:
+            for round_number, day in enumerate(dates):
+                won, lost, errors, seconds = self.run_round(
+                    round_number, day, service, options['threads']
+                )
+                total_attempts += options['threads']
+                total_seconds += seconds
+
+                self.stdout.write(
+                    f'{day.isoformat():>10} {won:>4} {lost:>5} {len(errors):>7} '
+                    f'{seconds * 1000:>8.1f} {options["threads"] / seconds:>11.1f}'
+                )
+                for error in errors[:3]:
+                    self.stdout.write(f'    {error!r}')
+                if won != 1 or errors:
+                    failed_rounds.append(day)
+        finally:
+            if not options['keep']:
+                OutboundEmail.objects.filter(
+                    appointment__customer__email__endswith=f'@{self.EMAIL_DOMAIN}'
+                ).delete()
+                Appointment.objects.filter(customer__email__endswith=f'@{self.EMAIL_DOMAIN}').delete()
+                Customer.objects.filter(email__endswith=f'@{self.EMAIL_DOMAIN}').delete()
+
+        self.stdout.write(
+            f'{total_attempts} attempts in {total_seconds:.2f}s '
+            f'({total_attempts / total_seconds:.1f} attempts/s)'
+        )
+
+        if failed_rounds:
+            raise CommandError(
+                f'Expected exactly one winner and no errors on {", ".join(map(str, failed_rounds))}'
+            )
+        self.stdout.write(self.style.SUCCESS('Exactly one booking won every round'))
+
+    def open_dates(self, start_date, count):
+        """The first count open, unblocked dates from start_date"""
+        dates = []
+        day = start_date
+        for _ in range(count * 7 + 366):
+            hours = AvailabilityService.get_business_hours(day.weekday())
+            if hours and hours.is_open and not AvailabilityService.is_date_blocked(day):
+                dates.append(day)
+                if len(dates) == count:
+                    return dates
+            day += timedelta(days=1)
+        raise CommandError('Not enough open dates to run the requested rounds')
+
+    def run_round(self, round_number, day, service, threads):
+        """Return (won, lost, errors, seconds) for one round of parallel bookings"""
+        slot = AvailabilityService.get_business_hours(day.weekday()).open_time
+        barrier = threading.Barrier(threads)
+        outcomes = [None] * threads
+
+        def book(index):
+            serializer = AppointmentCreateSerializer(data={
+                'first_name': 'Stress', 'last_name': f'Client {index}',
+                'email': f'round{round_number}-client{index}@{self.EMAIL_DOMAIN}',
+                'phone': '0000000000', 'location': 'Stress test',
+                'appointment_date': day.isoformat(),
+                'appointment_time': slot.strftime('%H:%M'),
+                'clients': [{'service_id': service.id}],
+            })
+            barrier.wait()
+            try:
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                outcomes[index] = 'won'
+            except SlotNotAvailableException:
+                outcomes[index] = 'lost'
+            except Exception as error:
+                outcomes[index] = error
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=book, args=(index,)) for index in range(threads)]
+        started = timer.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = timer.perf_counter() - started
+
+        errors = [outcome for outcome in outcomes if outcome not in ('won', 'lost')]
+        return outcomes.count('won'), outcomes.count('lost'), errors, seconds
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from bookings.models import BusinessHours
+from bookings.services import AvailabilityService
 
 
 class Command(BaseCommand):
@@ -33,4 +34,7 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(f'  ✓ Updated hours: {day_name} (Closed)')
         
+        # Business hours were replaced wholesale, so refresh every worker's snapshot
+        AvailabilityService.schedule_changed()
+        
         self.stdout.write(self.style.SUCCESS('\n✅ Business hours updated successfully!'))
@@ -0,0 +1,52 @@
+# Generated by Django 6.1.2 on 2026-10-18 15:08
+
+import math
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+GRID_MINUTES = 15
+ACTIVE_STATUSES = ['pending', 'confirmed']
+
+
+def backfill_reservations(apps, schema_editor):
+    Appointment = apps.get_model('bookings', 'Appointment')
+    SlotReservation = apps.get_model('bookings', 'SlotReservation')
+
+    reservations = []
+    for appointment in Appointment.objects.filter(status__in=ACTIVE_STATUSES).order_by('created_at'):
+        start = appointment.appointment_time.hour * 60 + appointment.appointment_time.minute
+        end = start + appointment.total_duration
+        for cell in range(start // GRID_MINUTES, math.ceil(end / GRID_MINUTES)):
+            reservations.append(SlotReservation(
+                appointment_id=appointment.id, date=appointment.appointment_date, cell=cell
+            ))
+
+    # Existing double bookings keep whichever appointment was made first
+    SlotReservation.objects.bulk_create(reservations, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_appointment_location_appointment_needs_transport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('cell', models.IntegerField(help_text='Index of the grid cell within the day')),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_reservations', to='bookings.appointment')),
+            ],
+            options={
+                'verbose_name': 'Slot Reservation',
+                'verbose_name_plural': 'Slot Reservations',
+                'ordering': ['date', 'cell'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'cell'), name='unique_slot_reservation')],
+            },
+        ),
+        migrations.RunPython(backfill_reservations, migrations.RunPython.noop),
+    ]
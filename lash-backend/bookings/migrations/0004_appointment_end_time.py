@@ -0,0 +1,48 @@
+# Generated by Django 6.1.2 on 2026-10-18 16:02
+
+import datetime
+
+from django.db import migrations, models
+
+
+def backfill_end_times(apps, schema_editor):
+    Appointment = apps.get_model('bookings', 'Appointment')
+
+    appointments = list(Appointment.objects.only('appointment_time', 'total_duration'))
+    for appointment in appointments:
+        end = (
+            datetime.datetime.combine(datetime.date.min, appointment.appointment_time)
+            + datetime.timedelta(minutes=appointment.total_duration)
+        )
+        appointment.appointment_end_time = datetime.time.max if end.date() > datetime.date.min else end.time()
+
+    Appointment.objects.bulk_update(appointments, ['appointment_end_time'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_slotreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='appointment_end_time',
+            field=models.TimeField(editable=False, help_text='Denormalized from appointment_time + total_duration, capped at midnight', null=True),
+        ),
+        migrations.RunPython(backfill_end_times, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='appointment_end_time',
+            field=models.TimeField(editable=False, help_text='Denormalized from appointment_time + total_duration, capped at midnight'),
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='bookings_ap_appoint_eb8c82_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'status', 'appointment_time', 'appointment_end_time'], name='appointment_overlap_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.1.2 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_appointment_end_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingDateLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+            ],
+            options={
+                'verbose_name': 'Booking Date Lock',
+                'verbose_name_plural': 'Booking Date Locks',
+                'ordering': ['date'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='html_body',
+            field=models.TextField(blank=True, help_text='HTML alternative to the plain-text body'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.1.2 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_outboundemail_html_body'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, help_text='When the day-before reminder was sent', null=True),
+        ),
+        migrations.AlterField(
+            model_name='outboundemail',
+            name='kind',
+            field=models.CharField(choices=[('appointment_confirmation', 'Appointment confirmation'), ('admin_notification', 'Admin notification'), ('appointment_reminder', 'Appointment reminder')], max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('reminder_sent_at__isnull', True), ('status__in', ['pending', 'confirmed'])), fields=['appointment_date', 'appointment_time'], name='appointment_reminder_due_idx'),
+        ),
+    ]
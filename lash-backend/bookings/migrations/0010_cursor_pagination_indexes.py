@@ -0,0 +1,21 @@
+# Generated by Django 6.1.2 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_appointment_reminder_sent_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-appointment_date', '-appointment_time', 'id'], name='appointment_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-created_at', 'id'], name='customer_cursor_idx'),
+        ),
+    ]
@@ -1,7 +1,8 @@
-from django.db import models
+from datetime import date, datetime, time, timedelta
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, EmailValidator
 from django.utils import timezone
-from bookings.constants import AppointmentStatus, ServiceCategory, Weekday
+from bookings.constants import AppointmentStatus, EmailKind, EmailStatus, ServiceCategory, Weekday
 
 
 class Service(models.Model):
@@ -63,6 +64,10 @@ class Customer(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Customer'
         verbose_name_plural = 'Customers'
+        indexes = [
+            # Keyset pagination order (CustomerCursorPagination)
+            models.Index(fields=['-created_at', 'id'], name='customer_cursor_idx'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
@@ -78,6 +83,10 @@ class Appointment(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='appointments')
     appointment_date = models.DateField()
     appointment_time = models.TimeField()
+    appointment_end_time = models.TimeField(
+        editable=False,
+        help_text="Denormalized from appointment_time + total_duration, capped at midnight"
+    )
     location = models.CharField(max_length=255, default='Harare', help_text="Customer's location for mobile service")
     needs_transport = models.BooleanField(default=False, help_text="Whether transport fee is included")
     status = models.CharField(max_length=20, choices=AppointmentStatus.CHOICES, default=AppointmentStatus.PENDING)
@@ -85,6 +94,7 @@ class Appointment(models.Model):
     total_duration = models.IntegerField(validators=[MinValueValidator(0)], help_text="Total duration in minutes")
     total_price = models.DecimalField(max_digits=8, decimal_places=2, validators=[MinValueValidator(0)])
     notes = models.TextField(blank=True, null=True)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, help_text="When the day-before reminder was sent")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -93,13 +103,52 @@ class Appointment(models.Model):
         verbose_name = 'Appointment'
         verbose_name_plural = 'Appointments'
         indexes = [
-            models.Index(fields=['appointment_date', 'appointment_time']),
             models.Index(fields=['status']),
+            # Supersedes the old (appointment_date, appointment_time) index for
+            # every date-filtered query, and covers the overlap check outright
+            models.Index(
+                fields=['appointment_date', 'status', 'appointment_time', 'appointment_end_time'],
+                name='appointment_overlap_idx'
+            ),
+            # Keyset pagination order (AppointmentCursorPagination)
+            models.Index(
+                fields=['-appointment_date', '-appointment_time', 'id'],
+                name='appointment_cursor_idx'
+            ),
+            # Active appointments still waiting for a reminder (send_reminders)
+            models.Index(
+                fields=['appointment_date', 'appointment_time'],
+                name='appointment_reminder_due_idx',
+                condition=models.Q(
+                    reminder_sent_at__isnull=True,
+                    status__in=AppointmentStatus.ACTIVE_STATUSES
+                )
+            ),
         ]
     
     def __str__(self):
         return f"{self.customer.full_name} - {self.appointment_date} {self.appointment_time}"
     
+    @staticmethod
+    def calculate_end_time(start: time, duration: int) -> time:
+        """End of an appointment, capped at the last moment of the day"""
+        end = datetime.combine(date.min, start) + timedelta(minutes=duration)
+        if end.date() > date.min:
+            return time.max
+        return end.time()
+    
+    def save(self, *args, **kwargs):
+        self.appointment_end_time = self.calculate_end_time(self.appointment_time, self.total_duration)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'appointment_time', 'total_duration'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'appointment_end_time'}
+        
+        # The post_save slot sync deletes and re-inserts reservations; a
+        # conflict there must roll back the row update and the delete too
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     @property
     def is_upcoming(self):
         now = timezone.now()
@@ -141,6 +190,108 @@ class AppointmentClient(models.Model):
         return price
 
 
+class SlotReservation(models.Model):
+    """
+    One occupied grid cell of an active appointment.
+    The unique constraint on (date, cell) makes double booking fail at insert time.
+    """
+    
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='slot_reservations')
+    date = models.DateField()
+    cell = models.IntegerField(help_text="Index of the grid cell within the day")
+    
+    class Meta:
+        ordering = ['date', 'cell']
+        verbose_name = 'Slot Reservation'
+        verbose_name_plural = 'Slot Reservations'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'cell'], name='unique_slot_reservation'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} cell {self.cell} - {self.appointment.confirmation_code}"
+
+
+class BookingDateLock(models.Model):
+    """
+    One row per date that has been booked, locked with select_for_update
+    so bookings for the same date run one at a time.
+    Not used on PostgreSQL, where an advisory lock needs no row.
+    """
+    
+    date = models.DateField(unique=True)
+    
+    class Meta:
+        ordering = ['date']
+        verbose_name = 'Booking Date Lock'
+        verbose_name_plural = 'Booking Date Locks'
+    
+    def __str__(self):
+        return str(self.date)
+
+
+class OutboundEmail(models.Model):
+    """
+    Email waiting to be sent, written in the same transaction as the change
+    that caused it and delivered later by the run_email_worker command.
+    """
+    
+    kind = models.CharField(max_length=40, choices=EmailKind.CHOICES)
+    appointment = models.ForeignKey(
+        Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails'
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, help_text="HTML alternative to the plain-text body")
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(help_text="List of recipient addresses")
+    status = models.CharField(max_length=10, choices=EmailStatus.CHOICES, default=EmailStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Outbound Email'
+        verbose_name_plural = 'Outbound Emails'
+        indexes = [
+            # The worker's "due emails" query
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} to {', '.join(self.to)} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Outcome of a booking request sent with an Idempotency-Key header.
+    The row is inserted when the request starts, so a concurrent duplicate
+    finds it in flight; the response is filled in once the booking succeeds.
+    """
+    
+    key = models.CharField(max_length=255, unique=True)
+    request_fingerprint = models.CharField(max_length=64, help_text="SHA-256 of the request body")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Empty while in flight")
+    response_body = models.TextField(blank=True, help_text="JSON response replayed to retries")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+    
+    def __str__(self):
+        return self.key
+    
+    @property
+    def is_complete(self):
+        return self.status_code is not None
+
+
 class BusinessHours(models.Model):
     """Business hours configuration"""
     
@@ -148,6 +299,7 @@ class BusinessHours(models.Model):
     is_open = models.BooleanField(default=True)
     open_time = models.TimeField(null=True, blank=True)
     close_time = models.TimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['weekday']
@@ -167,6 +319,7 @@ class BlockedDate(models.Model):
     date = models.DateField(unique=True)
     reason = models.CharField(max_length=200, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['date']
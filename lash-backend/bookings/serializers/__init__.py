@@ -1,9 +1,14 @@
+import re
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from bookings.models import (
     Service, AddOn, Customer, Appointment, 
     AppointmentClient, BusinessHours, BlockedDate
 )
-import secrets
+from bookings.services import AvailabilityService, AppointmentService
+from bookings.email_service import queue_booking_emails
 
 
 class ServiceSerializer(serializers.ModelSerializer):
@@ -96,9 +101,55 @@ class AppointmentListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'confirmation_code']
     
     def get_client_count(self, obj):
+        # Annotated by AppointmentService.list_queryset()
+        if hasattr(obj, 'client_count'):
+            return obj.client_count
         return obj.clients.count()
 
 
+def validate_clients_data(value):
+    """Validate the clients list shared by booking and quote requests"""
+    for client in value:
+        if 'service_id' not in client:
+            raise serializers.ValidationError("Each client must have a service_id")
+        if not isinstance(client.get('add_on_ids', []), list):
+            raise serializers.ValidationError("add_on_ids must be a list")
+    return value
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    """Serializer for quote requests: the clients part of a booking"""
+    
+    needs_transport = serializers.BooleanField(default=False)
+    clients = serializers.ListField(
+        child=serializers.DictField(),
+        min_length=1
+    )
+    
+    def validate_clients(self, value):
+        return validate_clients_data(value)
+
+
+class QuoteClientSerializer(serializers.Serializer):
+    """Serializer for one client's line of a quote"""
+    
+    client_number = serializers.IntegerField()
+    service_id = serializers.CharField()
+    add_on_ids = serializers.ListField(child=serializers.CharField())
+    duration = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+
+class QuoteSerializer(serializers.Serializer):
+    """Serializer for a booking quote (see AppointmentService.quote)"""
+    
+    clients = QuoteClientSerializer(many=True)
+    total_duration = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=8, decimal_places=2)
+    transport_fee = serializers.DecimalField(max_digits=8, decimal_places=2)
+    total_price = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+
 class AppointmentCreateSerializer(serializers.Serializer):
     """Serializer for creating new appointments"""
     
@@ -124,13 +175,22 @@ class AppointmentCreateSerializer(serializers.Serializer):
     
     def validate_clients(self, value):
         """Validate clients data structure"""
-        for client in value:
-            if 'service_id' not in client:
-                raise serializers.ValidationError("Each client must have a service_id")
-        return value
+        return validate_clients_data(value)
     
     def create(self, validated_data):
-        """Create customer, appointment, and appointment clients"""
+        """
+        Create customer, appointment, and appointment clients.
+        Runs in one transaction holding the booking lock for the date,
+        so bookings for the same day cannot interleave; any failure rolls
+        everything back. Lock conflicts are retried briefly.
+        """
+        return AppointmentService.run_booking_transaction(
+            validated_data['appointment_date'],
+            lambda: self.create_locked(dict(validated_data))
+        )
+    
+    def create_locked(self, validated_data):
+        """Body of create(), run with the date's booking lock held"""
         clients_data = validated_data.pop('clients')
         
         # Create or get customer
@@ -154,27 +214,26 @@ class AppointmentCreateSerializer(serializers.Serializer):
                 setattr(customer, key, value)
             customer.save()
         
-        # Calculate total duration and price
-        total_duration = 0
-        total_price = 0
-        
-        for client_data in clients_data:
-            service = Service.objects.get(id=client_data['service_id'])
-            total_duration += service.duration
-            total_price += float(service.price)
-            
-            add_on_ids = client_data.get('add_on_ids', [])
-            for addon_id in add_on_ids:
-                addon = AddOn.objects.get(id=addon_id)
-                total_duration += addon.duration
-                total_price += float(addon.price)
+        # Price the booking from the catalog snapshot
+        quote = AppointmentService.quote(
+            [client_data['service_id'] for client_data in clients_data],
+            [client_data.get('add_on_ids', []) for client_data in clients_data],
+            validated_data.get('needs_transport', False)
+        )
+        total_duration = quote['total_duration']
         
-        # Add transport fee if needed ($2)
-        if validated_data.get('needs_transport', False):
-            total_price += 2.0
+        # Reject blocked dates, closed days, out-of-hours and overlapping times.
+        # Read from the database: a booking committed while we waited for the
+        # lock may not have reached the cache yet.
+        AvailabilityService.check_availability(
+            validated_data['appointment_date'],
+            validated_data['appointment_time'],
+            total_duration,
+            use_cache=False
+        )
         
         # Generate confirmation code
-        confirmation_code = f"HLS-{secrets.token_hex(4).upper()}"
+        confirmation_code = AppointmentService.generate_confirmation_code()
         
         # Create appointment
         appointment = Appointment.objects.create(
@@ -186,25 +245,29 @@ class AppointmentCreateSerializer(serializers.Serializer):
             notes=validated_data.get('notes', ''),
             confirmation_code=confirmation_code,
             total_duration=total_duration,
-            total_price=total_price,
+            total_price=quote['total_price'],
             status='pending'
         )
         
-        # Create appointment clients
-        for idx, client_data in enumerate(clients_data, start=1):
-            service = Service.objects.get(id=client_data['service_id'])
-            
-            appointment_client = AppointmentClient.objects.create(
+        # Create appointment clients and their add-ons in two inserts
+        appointment_clients = AppointmentClient.objects.bulk_create([
+            AppointmentClient(
                 appointment=appointment,
-                client_number=idx,
-                service=service
+                client_number=client['client_number'],
+                service_id=client['service_id']
             )
-            
-            # Add add-ons if any
-            add_on_ids = client_data.get('add_on_ids', [])
-            if add_on_ids:
-                addons = AddOn.objects.filter(id__in=add_on_ids)
-                appointment_client.add_ons.set(addons)
+            for client in quote['clients']
+        ])
+        
+        ClientAddOn = AppointmentClient.add_ons.through
+        ClientAddOn.objects.bulk_create([
+            ClientAddOn(appointmentclient_id=appointment_client.id, addon_id=addon_id)
+            for appointment_client, client in zip(appointment_clients, quote['clients'])
+            for addon_id in client['add_on_ids']
+        ])
+        
+        # Queue the confirmation emails; they commit or roll back with the booking
+        queue_booking_emails(appointment)
         
         return appointment
 
@@ -227,3 +290,70 @@ class BlockedDateSerializer(serializers.ModelSerializer):
         fields = ['id', 'date', 'reason', 'created_at']
         read_only_fields = ['created_at']
 
+
+class ValuesSerializer:
+    """
+    Read-only fast path for a flat ModelSerializer.
+    
+    Rows come from queryset.values() and each field is converted the way
+    the ModelSerializer would, from a plan worked out once per class, so
+    no model instances are built and no fields are introspected per
+    request. serialize() returns the same data as
+    serializer_class(queryset, many=True).data. Supported fields are
+    model columns and get_<field>_display sources.
+    """
+    
+    # Fields whose to_representation returns the database value unchanged
+    PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+    
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+    
+    @cached_property
+    def plan(self):
+        """(columns to select, [(output name, column index, converter or None)])"""
+        serializer = self.serializer_class()
+        model = serializer.Meta.model
+        columns = []
+        fields = []
+        
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            display = re.fullmatch(r'get_(\w+)_display', field.source)
+            column = display.group(1) if display else field.source
+            try:
+                model_field = model._meta.get_field(column)
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is None or not model_field.concrete or model_field.is_relation:
+                raise ImproperlyConfigured(
+                    f'{self.serializer_class.__name__}.{name} is not a model column'
+                )
+            
+            if display:
+                labels = {value: str(label) for value, label in model_field.flatchoices}
+                convert = lambda value, labels=labels: labels.get(value, str(value))
+            elif isinstance(field, self.PASSTHROUGH_FIELDS) and not isinstance(field, serializers.ChoiceField):
+                convert = None
+            else:
+                convert = field.to_representation
+            
+            if column not in columns:
+                columns.append(column)
+            fields.append((name, columns.index(column), convert))
+        
+        return columns, fields
+    
+    def serialize(self, queryset):
+        """List of row dicts for queryset, in the serializer's field order"""
+        columns, fields = self.plan
+        data = []
+        for row in queryset.values_list(*columns):
+            item = {}
+            for name, index, convert in fields:
+                value = row[index]
+                # As Serializer.to_representation: None is never converted
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
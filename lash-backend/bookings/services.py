@@ -2,25 +2,343 @@
 Service layer for appointments business logic.
 Separates business logic from views following clean architecture principles.
 """
+import hashlib
+import json
+import random
+import secrets
+from bisect import bisect_right
+from collections import defaultdict
 from datetime import datetime, timedelta, time
-from typing import List, Dict, Optional, Tuple
-from django.db.models import QuerySet
-from bookings.models import Appointment, BlockedDate, BusinessHours, Service, AddOn
+from decimal import Decimal
+from time import monotonic, sleep
+from typing import Callable, List, Dict, Optional, Tuple
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.utils import timezone
+from django.db.models import Count, OuterRef, Prefetch, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework.utils import encoders
+from bookings.cache import AvailabilityCache, VersionedSnapshot
+from bookings.models import (
+    Appointment, AppointmentClient, BlockedDate, BookingDateLock, BusinessHours, IdempotencyKey,
+    Service, AddOn, SlotReservation
+)
 from bookings.constants import (
     AppointmentStatus, 
+    BookingLockConfig,
+    DayStatus,
+    IdempotencyConfig,
+    PricingConfig,
     TimeSlotConfig, 
     ValidationMessages
 )
 from bookings.exceptions import (
+    BookingBaseException,
     DateBlockedException,
     BusinessClosedException,
     OutsideBusinessHoursException,
     SlotNotAvailableException,
     InvalidDateFormatException,
     InvalidTimeFormatException,
+    InvalidDurationException,
+    InvalidDateRangeException,
+    ServiceNotFoundException,
+    AddOnNotFoundException,
+    InvalidIdempotencyKeyException,
+    IdempotencyKeyInUseException,
+    IdempotencyKeyMismatchException,
 )
 
 
+def time_to_minutes(value: time) -> int:
+    """Convert a time of day to minutes since midnight"""
+    return value.hour * 60 + value.minute
+
+
+def minutes_to_time(minutes: int) -> time:
+    """Convert minutes since midnight to a time of day"""
+    return time(minutes // 60, minutes % 60)
+
+
+class DayOccupancy:
+    """
+    Minute-resolution occupancy of one day as a bitmap.
+    Bit m is set when minute m after midnight is booked, so "does this
+    duration fit here" is one AND against a mask, with no per-booking loop.
+    """
+    
+    MINUTES_PER_DAY = 24 * 60
+    
+    __slots__ = ('bits',)
+    
+    def __init__(self, bits: int = 0):
+        self.bits = bits
+    
+    @classmethod
+    def from_intervals(cls, intervals: List[Tuple[int, int]]) -> 'DayOccupancy':
+        """Build from (start_minute, end_minute) intervals"""
+        occupancy = cls()
+        for start, end in intervals:
+            occupancy.occupy(start, end)
+        return occupancy
+    
+    def occupy(self, start: int, end: int):
+        """Mark minutes [start, end) as booked"""
+        if end > start:
+            self.bits |= ((1 << (end - start)) - 1) << start
+    
+    def _mask(self, duration: int) -> int:
+        # Minutes past the highest booked one are free, so the mask never
+        # needs to be wider than the bitmap, however long the duration
+        return (1 << max(min(duration, self.bits.bit_length()), 1)) - 1
+    
+    def fits(self, start: int, duration: int) -> bool:
+        """Check that minutes [start, start + duration) are all free"""
+        return not (self.bits >> start) & self._mask(duration)
+    
+    def fitting_starts(self, starts: List[int], duration: int) -> List[int]:
+        """Filter candidate start minutes down to those where the duration fits"""
+        bits = self.bits
+        mask = self._mask(duration)
+        return [start for start in starts if not (bits >> start) & mask]
+
+
+class ScheduleSnapshot:
+    """
+    Business hours, blocked dates and the per-weekday slot grid derived
+    from them. Held in memory by each worker (see schedule_snapshot) so
+    availability checks do not re-query these tiny tables.
+    """
+    
+    def __init__(self, business_hours: List[BusinessHours], blocked_dates: List[datetime.date]):
+        self.hours_by_weekday = {hours.weekday: hours for hours in business_hours}
+        self.blocked_dates = frozenset(blocked_dates)
+        self.slot_grid = {
+            weekday: self._slot_starts(hours)
+            for weekday, hours in self.hours_by_weekday.items()
+        }
+    
+    @classmethod
+    def load(cls) -> 'ScheduleSnapshot':
+        """Load both tables (two queries)"""
+        return cls(
+            list(BusinessHours.objects.all()),
+            list(BlockedDate.objects.values_list('date', flat=True))
+        )
+    
+    @staticmethod
+    def _slot_starts(business_hours: BusinessHours) -> List[int]:
+        """Start minute of every slot between opening and closing time"""
+        if not business_hours.is_open or not business_hours.open_time or not business_hours.close_time:
+            return []
+        
+        return list(range(
+            time_to_minutes(business_hours.open_time),
+            time_to_minutes(business_hours.close_time),
+            TimeSlotConfig.SLOT_DURATION_MINUTES
+        ))
+    
+    def day_schedule(
+        self,
+        date: datetime.date,
+        intervals: List[Tuple[int, int]]
+    ) -> 'DaySchedule':
+        """Combine this snapshot with a day's booked intervals"""
+        if date in self.blocked_dates:
+            return DaySchedule(date, None, True, [], [])
+        
+        weekday = date.weekday()
+        return DaySchedule(
+            date,
+            self.hours_by_weekday.get(weekday),
+            False,
+            intervals,
+            self.slot_grid.get(weekday, [])
+        )
+
+
+# Each worker's copy, refreshed when the version is bumped by schedule_changed()
+schedule_snapshot = VersionedSnapshot('schedule', ScheduleSnapshot.load)
+
+
+class CatalogSnapshot:
+    """
+    Active services and add-ons keyed by ID, held in memory by each
+    worker (see catalog_snapshot) so quotes need no queries.
+    """
+    
+    def __init__(self, services: List[Service], addons: List[AddOn]):
+        self.services = {service.id: service for service in services}
+        self.addons = {addon.id: addon for addon in addons}
+    
+    @classmethod
+    def load(cls) -> 'CatalogSnapshot':
+        """Load both tables (two queries)"""
+        return cls(
+            list(Service.objects.filter(is_active=True)),
+            list(AddOn.objects.filter(is_active=True))
+        )
+
+
+# Each worker's copy, refreshed when a Service or AddOn is saved or deleted
+catalog_snapshot = VersionedSnapshot('catalog', CatalogSnapshot.load)
+
+
+class DaySchedule:
+    """
+    In-memory view of a single day's opening hours and bookings.
+    Loaded with a fixed number of queries so slot calculations never
+    go back to the database once per slot.
+    """
+    
+    def __init__(
+        self,
+        date: datetime.date,
+        business_hours: Optional[BusinessHours],
+        is_blocked: bool,
+        intervals: List[Tuple[int, int]],
+        slot_grid: List[int]
+    ):
+        self.date = date
+        self.business_hours = business_hours
+        self.is_blocked = is_blocked
+        self.occupancy = DayOccupancy.from_intervals(intervals)
+        self.slot_grid = slot_grid
+    
+    @classmethod
+    def load(cls, date: datetime.date) -> 'DaySchedule':
+        """
+        Load the schedule for a date.
+        Hours and blocked dates come from the in-memory snapshot, so this
+        is a single appointment query (none on closed or blocked days).
+        """
+        snapshot = schedule_snapshot.get()
+        schedule = snapshot.day_schedule(date, [])
+        
+        # Nothing can be booked on blocked or closed days, so skip the appointment query
+        if schedule.is_blocked or (schedule.business_hours and not schedule.business_hours.is_open):
+            return schedule
+        
+        query = Appointment.objects.filter(
+            appointment_date=date,
+            status__in=AppointmentStatus.ACTIVE_STATUSES
+        )
+        
+        intervals = [
+            (time_to_minutes(start), time_to_minutes(start) + duration)
+            for start, duration in query.values_list('appointment_time', 'total_duration')
+        ]
+        return snapshot.day_schedule(date, intervals)
+    
+    @classmethod
+    def load_range(
+        cls,
+        start_date: datetime.date,
+        end_date: datetime.date
+    ) -> Dict[datetime.date, 'DaySchedule']:
+        """
+        Load schedules for every date in [start_date, end_date] with one
+        appointment query, whatever the length of the range.
+        """
+        snapshot = schedule_snapshot.get()
+        intervals = cls._booked_intervals(appointment_date__range=(start_date, end_date))
+        
+        schedules = {}
+        current = start_date
+        while current <= end_date:
+            schedules[current] = snapshot.day_schedule(current, intervals.get(current, []))
+            current += timedelta(days=1)
+        
+        return schedules
+    
+    @classmethod
+    def load_dates(cls, dates) -> Dict[datetime.date, 'DaySchedule']:
+        """Load schedules for any set of dates with one appointment query"""
+        snapshot = schedule_snapshot.get()
+        intervals = cls._booked_intervals(appointment_date__in=dates)
+        
+        return {
+            date: snapshot.day_schedule(date, intervals.get(date, []))
+            for date in dates
+        }
+    
+    @staticmethod
+    def _booked_intervals(**filters) -> Dict[datetime.date, List[Tuple[int, int]]]:
+        """Booked [start, end) minutes of active appointments, grouped by date"""
+        intervals = defaultdict(list)
+        rows = Appointment.objects.filter(
+            status__in=AppointmentStatus.ACTIVE_STATUSES,
+            **filters
+        ).values_list('appointment_date', 'appointment_time', 'total_duration')
+        
+        for appointment_date, start, duration in rows:
+            intervals[appointment_date].append(
+                (time_to_minutes(start), time_to_minutes(start) + duration)
+            )
+        
+        return intervals
+    
+    @property
+    def is_open(self) -> bool:
+        """Whether the business takes bookings on this date"""
+        return (
+            not self.is_blocked
+            and self.business_hours is not None
+            and self.business_hours.is_open
+        )
+    
+    def slot_starts(self) -> List[int]:
+        """Start minute of every slot between opening and closing time"""
+        if not self.is_open:
+            return []
+        
+        return self.slot_grid
+    
+    @property
+    def close_minute(self) -> Optional[int]:
+        """Closing time in minutes after midnight, or None when there is none"""
+        if self.business_hours is None or not self.business_hours.close_time:
+            return None
+        return time_to_minutes(self.business_hours.close_time)
+    
+    def ends_by_close(self, start: int, duration: int) -> bool:
+        """Check that [start, start + duration) is over by closing time"""
+        close = self.close_minute
+        return close is None or start + duration <= close
+    
+    def fits(self, start: int, duration: int) -> bool:
+        """Check that [start, start + duration) ends by closing time and overlaps no booking"""
+        return self.ends_by_close(start, duration) and self.occupancy.fits(start, duration)
+    
+    def available_starts(self, duration: int) -> List[int]:
+        """Slot starts where the whole duration fits before closing time"""
+        starts = self.slot_starts()
+        close = self.close_minute
+        if close is not None:
+            # Slot starts are ascending, so cut the list at the latest possible start
+            starts = starts[:bisect_right(starts, close - max(duration, 1))]
+        return self.occupancy.fitting_starts(starts, duration)
+    
+    def get_slots(self, duration: Optional[int] = None) -> List[Dict[str, any]]:
+        """
+        Build the slot list for this day.
+        A slot is available when the requested duration (one slot by
+        default) fits before the next booking.
+        Returns list of {time: str, available: bool}
+        """
+        if duration is None:
+            duration = TimeSlotConfig.SLOT_DURATION_MINUTES
+        
+        available = set(self.available_starts(duration))
+        return [
+            {
+                'time': minutes_to_time(start).strftime('%H:%M'),
+                'available': start in available
+            }
+            for start in self.slot_starts()
+        ]
+
+
 class AvailabilityService:
     """
     Service for checking appointment availability.
@@ -43,18 +361,42 @@ class AvailabilityService:
         except ValueError:
             raise InvalidTimeFormatException()
     
+    @staticmethod
+    def parse_duration(value) -> int:
+        """Parse a duration in minutes, between 1 and a whole day"""
+        try:
+            duration = int(value)
+        except (TypeError, ValueError):
+            raise InvalidDurationException()
+        
+        if not 0 < duration <= DayOccupancy.MINUTES_PER_DAY:
+            raise InvalidDurationException()
+        
+        return duration
+    
     @staticmethod
     def is_date_blocked(date: datetime.date) -> bool:
         """Check if a date is blocked"""
-        return BlockedDate.objects.filter(date=date).exists()
+        return date in schedule_snapshot.get().blocked_dates
     
     @staticmethod
     def get_business_hours(weekday: int) -> Optional[BusinessHours]:
         """Get business hours for a specific weekday"""
-        try:
-            return BusinessHours.objects.get(weekday=weekday)
-        except BusinessHours.DoesNotExist:
-            return None
+        return schedule_snapshot.get().hours_by_weekday.get(weekday)
+    
+    @staticmethod
+    def schedule_changed():
+        """
+        Refresh every worker's schedule snapshot and drop all cached availability.
+        Call after bulk writes to BusinessHours or BlockedDate that bypass signals.
+        """
+        schedule_snapshot.invalidate()
+        AvailabilityCache.invalidate_all()
+    
+    @staticmethod
+    def get_schedule(date: datetime.date) -> DaySchedule:
+        """Get the (cached) schedule for a date"""
+        return AvailabilityCache.get_or_compute(date, None, lambda: DaySchedule.load(date))
     
     @staticmethod
     def is_within_business_hours(
@@ -68,31 +410,40 @@ class AvailabilityService:
         return (business_hours.open_time <= appointment_time < business_hours.close_time)
     
     @staticmethod
-    def has_overlapping_appointments(
+    def overlapping_appointments(
         date: datetime.date,
         start_time: time,
         duration: int,
         exclude_appointment_id: Optional[int] = None
-    ) -> bool:
-        """Check if there are overlapping appointments"""
-        end_time = (
-            datetime.combine(date, start_time) + 
-            timedelta(minutes=duration)
-        ).time()
-        
+    ) -> QuerySet:
+        """
+        Active appointments whose [start, end) overlaps the given interval.
+        One range predicate, served by appointment_overlap_idx.
+        """
         query = Appointment.objects.filter(
             appointment_date=date,
-            status__in=AppointmentStatus.ACTIVE_STATUSES
-        ).exclude(
-            appointment_time__gte=end_time
-        ).exclude(
-            appointment_time__lt=start_time
-        )
+            status__in=AppointmentStatus.ACTIVE_STATUSES,
+            appointment_time__lt=Appointment.calculate_end_time(start_time, duration),
+            appointment_end_time__gt=start_time
+        ).order_by()  # The default ordering would steer the planner to appointment_cursor_idx
         
         if exclude_appointment_id:
             query = query.exclude(id=exclude_appointment_id)
         
-        return query.exists()
+        return query
+    
+    @classmethod
+    def has_overlapping_appointments(
+        cls,
+        date: datetime.date,
+        start_time: time,
+        duration: int,
+        exclude_appointment_id: Optional[int] = None
+    ) -> bool:
+        """Check if there are overlapping appointments"""
+        return cls.overlapping_appointments(
+            date, start_time, duration, exclude_appointment_id
+        ).exists()
     
     @classmethod
     def check_availability(
@@ -100,19 +451,44 @@ class AvailabilityService:
         date: datetime.date,
         appointment_time: time,
         duration: int,
-        exclude_appointment_id: Optional[int] = None
+        exclude_appointment_id: Optional[int] = None,
+        use_cache: bool = True
     ) -> Tuple[bool, Optional[str]]:
         """
         Check if a time slot is available.
+        Pass use_cache=False to decide overlap in the database, e.g. while
+        holding the date's booking lock: hours come from the snapshot and
+        the overlap is one indexed range query (has_overlapping_appointments).
         Returns: (is_available, reason_if_not_available)
         """
+        if exclude_appointment_id or not use_cache:
+            # An empty day schedule checks the hours; the database checks the bookings
+            cls.check_schedule(schedule_snapshot.get().day_schedule(date, []), appointment_time, duration)
+            
+            if cls.has_overlapping_appointments(date, appointment_time, duration, exclude_appointment_id):
+                raise SlotNotAvailableException(ValidationMessages.SLOT_ALREADY_BOOKED)
+
+            return True, None
+        
+        return cls.check_schedule(cls.get_schedule(date), appointment_time, duration)
+    
+    @classmethod
+    def check_schedule(
+        cls,
+        schedule: DaySchedule,
+        appointment_time: time,
+        duration: int
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Check a time against an already loaded day schedule.
+        Raises the same exceptions as check_availability.
+        """
         # Check if date is blocked
-        if cls.is_date_blocked(date):
+        if schedule.is_blocked:
             raise DateBlockedException()
         
         # Check business hours
-        weekday = date.weekday()
-        business_hours = cls.get_business_hours(weekday)
+        business_hours = schedule.business_hours
         
         if business_hours and not business_hours.is_open:
             raise BusinessClosedException()
@@ -120,52 +496,152 @@ class AvailabilityService:
         if business_hours and not cls.is_within_business_hours(appointment_time, business_hours):
             raise OutsideBusinessHoursException()
         
-        # Check for overlapping appointments
-        if cls.has_overlapping_appointments(date, appointment_time, duration, exclude_appointment_id):
+        start = time_to_minutes(appointment_time)
+        if not schedule.ends_by_close(start, duration):
+            raise OutsideBusinessHoursException(ValidationMessages.ENDS_AFTER_CLOSING)
+        
+        # Check for overlapping appointments against each booking's full duration
+        if not schedule.fits(start, duration):
             raise SlotNotAvailableException(ValidationMessages.SLOT_ALREADY_BOOKED)
         
         return True, None
     
     @classmethod
-    def get_available_slots(cls, date: datetime.date) -> List[Dict[str, any]]:
+    def check_availability_batch(
+        cls,
+        candidates: List[Tuple[datetime.date, time, int]]
+    ) -> List[Tuple[bool, Optional[str]]]:
+        """
+        Check many (date, time, duration) candidates at once.
+        Each distinct date's schedule is fetched once and shared by all
+        candidates on that date.
+        Returns: list of (is_available, reason_if_not_available) in input order
+        """
+        schedules = {
+            date: cls.get_schedule(date)
+            for date in dict.fromkeys(date for date, _, _ in candidates)
+        }
+        
+        results = []
+        for date, appointment_time, duration in candidates:
+            try:
+                results.append(cls.check_schedule(schedules[date], appointment_time, duration))
+            except BookingBaseException as e:
+                results.append((False, str(e.detail)))
+        
+        return results
+    
+    @classmethod
+    def get_available_slots(
+        cls,
+        date: datetime.date,
+        duration: Optional[int] = None
+    ) -> List[Dict[str, any]]:
         """
         Get all available time slots for a specific date.
+        When a duration is given, a slot is only available if the whole
+        appointment fits without overlapping an existing booking.
         Returns list of {time: str, available: bool}
         """
-        # Check if date is blocked
-        if cls.is_date_blocked(date):
-            return []
+        if duration is None:
+            duration = TimeSlotConfig.SLOT_DURATION_MINUTES
         
-        # Get business hours
-        weekday = date.weekday()
-        business_hours = cls.get_business_hours(weekday)
+        return AvailabilityCache.get_or_compute(
+            date, duration, lambda: cls.get_schedule(date).get_slots(duration)
+        )
+    
+    @classmethod
+    def find_next_available(
+        cls,
+        from_date: datetime.date,
+        duration: int,
+        limit: int = 1,
+        now: Optional[datetime] = None
+    ) -> Tuple[List[Dict[str, str]], datetime.date]:
+        """
+        Find the earliest start times where the duration fits.
+        Scans forward in windows that double in size, loading each window
+        with DaySchedule.load_range, and stops once limit slots are found
+        or NEXT_AVAILABLE_MAX_DAYS have been scanned (one appointment query
+        per window once the schedule snapshot is cached).
+        Returns: (list of {date, time}, last date scanned)
+        """
+        now = now or timezone.localtime()
+        found = []
+        window_start = from_date
+        window_days = TimeSlotConfig.NEXT_AVAILABLE_FIRST_WINDOW_DAYS
+        last_day = from_date + timedelta(days=TimeSlotConfig.NEXT_AVAILABLE_MAX_DAYS - 1)
         
-        if not business_hours or not business_hours.is_open:
-            return []
+        while window_start <= last_day:
+            window_end = min(window_start + timedelta(days=window_days - 1), last_day)
+            
+            for day, schedule in DaySchedule.load_range(window_start, window_end).items():
+                for start in schedule.available_starts(duration):
+                    # Never offer a time that has already passed today
+                    if day == now.date() and start <= time_to_minutes(now.time()):
+                        continue
+                    
+                    found.append({
+                        'date': day.isoformat(),
+                        'time': minutes_to_time(start).strftime('%H:%M'),
+                    })
+                    if len(found) >= limit:
+                        return found, day
+            
+            window_start = window_end + timedelta(days=1)
+            window_days *= 2
         
-        # Generate time slots
-        slots = []
-        current_time = datetime.combine(date, business_hours.open_time)
-        end_datetime = datetime.combine(date, business_hours.close_time)
+        return found, last_day
+    
+    @staticmethod
+    def validate_date_range(start_date: datetime.date, end_date: datetime.date):
+        """Ensure a date range is ordered and not longer than the calendar limit"""
+        if end_date < start_date:
+            raise InvalidDateRangeException()
         
-        while current_time < end_datetime:
-            slot_time = current_time.time()
+        if (end_date - start_date).days + 1 > TimeSlotConfig.MAX_CALENDAR_DAYS:
+            raise InvalidDateRangeException(
+                f'Date range cannot exceed {TimeSlotConfig.MAX_CALENDAR_DAYS} days'
+            )
+    
+    @classmethod
+    def get_availability_calendar(
+        cls,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        duration: Optional[int] = None
+    ) -> List[Dict[str, any]]:
+        """
+        Get availability for every date in a range.
+        Returns list of {date: str, status: str, slots: [str]} where slots
+        holds the free start times and status is open, closed or fully_booked.
+        """
+        cls.validate_date_range(start_date, end_date)
+        
+        if duration is None:
+            duration = TimeSlotConfig.SLOT_DURATION_MINUTES
+        
+        calendar = []
+        for day, schedule in DaySchedule.load_range(start_date, end_date).items():
+            free = [
+                minutes_to_time(start).strftime('%H:%M')
+                for start in schedule.available_starts(duration)
+            ]
             
-            # Check if slot is available (using simplified check for single slot)
-            is_available = not Appointment.objects.filter(
-                appointment_date=date,
-                appointment_time=slot_time,
-                status__in=AppointmentStatus.ACTIVE_STATUSES
-            ).exists()
+            if not schedule.is_open:
+                day_status = DayStatus.CLOSED
+            elif not free:
+                day_status = DayStatus.FULLY_BOOKED
+            else:
+                day_status = DayStatus.OPEN
             
-            slots.append({
-                'time': slot_time.strftime('%H:%M'),
-                'available': is_available
+            calendar.append({
+                'date': day.isoformat(),
+                'status': day_status,
+                'slots': free,
             })
-            
-            current_time += timedelta(minutes=TimeSlotConfig.SLOT_DURATION_MINUTES)
         
-        return slots
+        return calendar
 
 
 class AppointmentService:
@@ -174,14 +650,158 @@ class AppointmentService:
     Handles appointment-related operations.
     """
     
+    @staticmethod
+    def clients_prefetch() -> Prefetch:
+        """Prefetch an appointment's clients with their services and add-ons"""
+        return Prefetch(
+            'clients',
+            queryset=AppointmentClient.objects.select_related('service').prefetch_related('add_ons')
+        )
+    
+    @staticmethod
+    def list_queryset() -> QuerySet:
+        """
+        Appointments for AppointmentListSerializer in one query: the customer
+        joined and the clients counted in SQL. The count is a correlated
+        subquery rather than a join, because GROUP BY would make the database
+        sort the whole table before a page can be cut from it.
+        """
+        client_count = AppointmentClient.objects.filter(
+            appointment=OuterRef('pk')
+        ).order_by().values('appointment').annotate(count=Count('id')).values('count')
+        return Appointment.objects.select_related('customer').annotate(
+            client_count=Coalesce(Subquery(client_count), 0)
+        )
+    
+    @staticmethod
+    def detail_queryset() -> QuerySet:
+        """
+        Appointments for AppointmentDetailSerializer, with customer, clients,
+        services and add-ons loaded up front (three queries in total).
+        """
+        return Appointment.objects.select_related('customer').prefetch_related(
+            AppointmentService.clients_prefetch()
+        )
+    
     @staticmethod
     def get_by_confirmation_code(code: str) -> Optional[Appointment]:
-        """Get appointment by confirmation code"""
+        """Get appointment by confirmation code, ready to serialize (see detail_queryset)"""
         try:
-            return Appointment.objects.get(confirmation_code=code)
+            return AppointmentService.detail_queryset().get(confirmation_code=code)
         except Appointment.DoesNotExist:
             return None
     
+    @staticmethod
+    def generate_confirmation_code() -> str:
+        """New random confirmation code; uniqueness is enforced by the database"""
+        return f"HLS-{secrets.token_hex(4).upper()}"
+    
+    @staticmethod
+    def grid_cells(start_time: time, duration: int) -> range:
+        """Grid cells covered by [start_time, start_time + duration), rounded outwards to whole cells"""
+        grid = TimeSlotConfig.RESERVATION_GRID_MINUTES
+        start = time_to_minutes(start_time)
+        end = start + duration
+        return range(start // grid, -(-end // grid))
+    
+    @classmethod
+    def reservation_cells(cls, appointment: Appointment) -> range:
+        """Grid cells covered by an appointment, rounded outwards to whole cells"""
+        return cls.grid_cells(appointment.appointment_time, appointment.total_duration)
+    
+    @classmethod
+    def sync_slot_reservations(cls, appointment: Appointment, replace: bool = True):
+        """
+        Make the appointment's SlotReservation rows match its date, time,
+        duration and status. Inserting a cell another appointment holds
+        violates the unique constraint and raises SlotNotAvailableException.
+        """
+        if replace:
+            SlotReservation.objects.filter(appointment=appointment).delete()
+        
+        if appointment.status not in AppointmentStatus.ACTIVE_STATUSES:
+            return
+        
+        reservations = [
+            SlotReservation(appointment=appointment, date=appointment.appointment_date, cell=cell)
+            for cell in cls.reservation_cells(appointment)
+        ]
+        
+        try:
+            # Savepoint, so a conflict leaves the caller's transaction usable
+            with transaction.atomic():
+                SlotReservation.objects.bulk_create(reservations)
+        except IntegrityError:
+            raise SlotNotAvailableException(ValidationMessages.SLOT_ALREADY_BOOKED)
+    
+    @classmethod
+    def lock_date(cls, date: datetime.date):
+        """Hold the booking lock for a date until the current transaction ends"""
+        cls.lock_dates([date])
+    
+    @staticmethod
+    def lock_dates(dates):
+        """
+        Hold the booking locks for several dates until the current transaction
+        ends, taken in date order so concurrent callers cannot deadlock.
+        Uses transaction-level advisory locks on PostgreSQL and a
+        select_for_update on the dates' BookingDateLock rows elsewhere.
+        """
+        dates = sorted(set(dates))
+        
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s, day) '
+                    'FROM (SELECT unnest(%s::integer[]) AS day ORDER BY day) AS days',
+                    [BookingLockConfig.ADVISORY_LOCK_NAMESPACE, [date.toordinal() for date in dates]]
+                )
+            return
+        
+        if len(dates) == 1:
+            # A freshly inserted row is locked by the insert itself
+            BookingDateLock.objects.select_for_update().get_or_create(date=dates[0])
+            return
+        
+        BookingDateLock.objects.bulk_create(
+            [BookingDateLock(date=date) for date in dates], ignore_conflicts=True
+        )
+        list(BookingDateLock.objects.select_for_update().filter(date__in=dates).order_by('date'))
+    
+    @staticmethod
+    def is_retryable_conflict(error: OperationalError) -> bool:
+        """Whether an error is a lock or serialization conflict worth retrying"""
+        cause = error.__cause__
+        # psycopg 3 exposes sqlstate, psycopg2 pgcode
+        code = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+        if code in ('40001', '40P01'):  # serialization_failure, deadlock_detected
+            return True
+        return 'database is locked' in str(error) or 'database table is locked' in str(error)
+    
+    @classmethod
+    def run_booking_transaction(cls, date: datetime.date, func: Callable):
+        """
+        Run func in a transaction holding the booking lock for date.
+        Lock and serialization conflicts are retried with a short jittered
+        backoff. Inside an outer transaction the conflict is re-raised
+        instead, since only the outermost transaction can be retried.
+        """
+        retryable = not transaction.get_connection().in_atomic_block
+        
+        for attempt in range(1, BookingLockConfig.MAX_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    cls.lock_date(date)
+                    return func()
+            except OperationalError as error:
+                if not retryable or attempt == BookingLockConfig.MAX_ATTEMPTS:
+                    raise
+                if not cls.is_retryable_conflict(error):
+                    raise
+            
+            delay = BookingLockConfig.RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            sleep(delay * random.uniform(0.5, 1.5))
+    
     @staticmethod
     def get_active_appointments(date: Optional[datetime.date] = None) -> QuerySet:
         """Get active appointments, optionally filtered by date"""
@@ -195,33 +815,203 @@ class AppointmentService:
         return query.order_by('appointment_date', 'appointment_time')
     
     @staticmethod
-    def calculate_total_duration(service_ids: List[str], addon_ids: List[List[str]]) -> int:
-        """Calculate total duration for all clients"""
-        total = 0
-        
-        # Get all services
-        services = Service.objects.filter(id__in=service_ids)
-        total += sum(s.duration for s in services)
+    def due_reminders(window_start: datetime, window_end: datetime) -> QuerySet:
+        """
+        Active appointments starting after window_start and up to window_end
+        (naive local datetimes) whose reminder has not been sent, with
+        everything the reminder email shows. Served by appointment_reminder_due_idx.
+        """
+        start_date, start_time = window_start.date(), window_start.time()
+        end_date, end_time = window_end.date(), window_end.time()
         
-        # Get all add-ons
-        flat_addon_ids = [aid for client_addons in addon_ids for aid in client_addons]
-        addons = AddOn.objects.filter(id__in=flat_addon_ids)
-        total += sum(a.duration for a in addons)
+        if start_date == end_date:
+            in_window = Q(appointment_date=start_date, appointment_time__gt=start_time, appointment_time__lte=end_time)
+        else:
+            in_window = (
+                Q(appointment_date=start_date, appointment_time__gt=start_time)
+                | Q(appointment_date__gt=start_date, appointment_date__lt=end_date)
+                | Q(appointment_date=end_date, appointment_time__lte=end_time)
+            )
         
-        return total
+        return Appointment.objects.filter(
+            in_window,
+            status__in=AppointmentStatus.ACTIVE_STATUSES,
+            reminder_sent_at__isnull=True
+        ).select_related('customer').prefetch_related(
+            AppointmentService.clients_prefetch()
+        ).order_by('appointment_date', 'appointment_time', 'id')
     
     @staticmethod
-    def calculate_total_price(service_ids: List[str], addon_ids: List[List[str]]) -> float:
-        """Calculate total price for all clients"""
-        total = 0
+    def resolve_catalog(
+        service_ids: List[str],
+        addon_ids: List[List[str]]
+    ) -> Tuple[Dict[str, Service], Dict[str, AddOn]]:
+        """
+        Look up the active services and add-ons a booking refers to in the
+        catalog snapshot. Raises ServiceNotFoundException/AddOnNotFoundException
+        listing every unknown or inactive ID at once.
+        """
+        catalog = catalog_snapshot.get()
+        flat_addon_ids = {aid for client_addons in addon_ids for aid in client_addons}
+        
+        missing = sorted(set(service_ids) - catalog.services.keys())
+        if missing:
+            raise ServiceNotFoundException(f"Service not found: {', '.join(missing)}")
+        
+        missing = sorted(flat_addon_ids - catalog.addons.keys())
+        if missing:
+            raise AddOnNotFoundException(f"Add-on not found: {', '.join(missing)}")
+        
+        return (
+            {sid: catalog.services[sid] for sid in service_ids},
+            {aid: catalog.addons[aid] for aid in flat_addon_ids}
+        )
+    
+    @classmethod
+    def quote(
+        cls,
+        service_ids: List[str],
+        addon_ids: List[List[str]],
+        needs_transport: bool = False
+    ) -> Dict:
+        """
+        Exact duration and price of a booking, per client and in total.
+        Served from the catalog snapshot, so it runs no queries once warm.
+        An add-on is counted at most once per client.
+        addon_ids holds one list per service, so every client is priced.
+        Raises ServiceNotFoundException/AddOnNotFoundException for unknown IDs.
+        """
+        if len(addon_ids) != len(service_ids):
+            raise ValueError(
+                f'quote() needs one add-on list per service: '
+                f'got {len(addon_ids)} for {len(service_ids)} services'
+            )
+        addon_ids = [list(dict.fromkeys(client_addons)) for client_addons in addon_ids]
+        services, addons = cls.resolve_catalog(service_ids, addon_ids)
+        
+        clients = []
+        for client_number, (service_id, client_addon_ids) in enumerate(zip(service_ids, addon_ids), start=1):
+            service = services[service_id]
+            client_addons = [addons[aid] for aid in client_addon_ids]
+            clients.append({
+                'client_number': client_number,
+                'service_id': service_id,
+                'add_on_ids': client_addon_ids,
+                'duration': service.duration + sum(addon.duration for addon in client_addons),
+                'price': service.price + sum((addon.price for addon in client_addons), Decimal('0')),
+            })
         
-        # Get all services
-        services = Service.objects.filter(id__in=service_ids)
-        total += sum(float(s.price) for s in services)
+        subtotal = sum((client['price'] for client in clients), Decimal('0'))
+        transport_fee = PricingConfig.TRANSPORT_FEE if needs_transport else Decimal('0')
         
-        # Get all add-ons
-        flat_addon_ids = [aid for client_addons in addon_ids for aid in client_addons]
-        addons = AddOn.objects.filter(id__in=flat_addon_ids)
-        total += sum(float(a.price) for a in addons)
+        return {
+            'clients': clients,
+            'total_duration': sum(client['duration'] for client in clients),
+            'subtotal': subtotal,
+            'transport_fee': transport_fee,
+            'total_price': subtotal + transport_fee,
+        }
+    
+    @classmethod
+    def calculate_total_duration(cls, service_ids: List[str], addon_ids: List[List[str]]) -> int:
+        """
+        Calculate total duration for all clients.
+        Raises ServiceNotFoundException/AddOnNotFoundException for unknown IDs.
+        """
+        return cls.quote(service_ids, addon_ids)['total_duration']
+    
+    @classmethod
+    def calculate_total_price(cls, service_ids: List[str], addon_ids: List[List[str]]) -> Decimal:
+        """Calculate total price for all clients, excluding the transport fee"""
+        return cls.quote(service_ids, addon_ids)['subtotal']
+
+
+class IdempotencyService:
+    """
+    Service for Idempotency-Key handling.
+    A request claims its key before doing any work, and stores its
+    response once it succeeds; retries with the same key get that
+    response back instead of repeating the work.
+    """
+    
+    @staticmethod
+    def validate_key(key: str) -> str:
+        key = key.strip()
+        if not key or len(key) > IdempotencyConfig.MAX_KEY_LENGTH:
+            raise InvalidIdempotencyKeyException()
+        return key
+    
+    @staticmethod
+    def fingerprint(payload) -> str:
+        """Stable hash of a request body"""
+        body = json.dumps(payload, sort_keys=True, cls=encoders.JSONEncoder)
+        return hashlib.sha256(body.encode()).hexdigest()
+    
+    @staticmethod
+    def claim(key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+        """
+        Claim a key for a new request.
+        Returns None when the caller now owns the key and should do the work,
+        or the completed record to replay. A duplicate of a request still in
+        flight waits for it to finish, up to IdempotencyConfig.WAIT_SECONDS.
+        """
+        deadline = monotonic() + IdempotencyConfig.WAIT_SECONDS
         
-        return total
+        while True:
+            now = timezone.now()
+            
+            # Expired keys, finished or abandoned, are free to reuse
+            IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+            
+            try:
+                with transaction.atomic():
+                    IdempotencyKey.objects.create(
+                        key=key,
+                        request_fingerprint=fingerprint,
+                        expires_at=now + timedelta(seconds=IdempotencyConfig.IN_FLIGHT_TIMEOUT_SECONDS)
+                    )
+                return None
+            except IntegrityError:
+                pass
+            
+            record = IdempotencyKey.objects.filter(key=key).first()
+            if record is None:
+                # Released or expired since the insert failed
+                continue
+            
+            if record.request_fingerprint != fingerprint:
+                raise IdempotencyKeyMismatchException()
+            
+            if record.is_complete:
+                return record
+            
+            if monotonic() >= deadline:
+                raise IdempotencyKeyInUseException()
+            
+            sleep(IdempotencyConfig.POLL_INTERVAL_SECONDS)
+    
+    @staticmethod
+    def complete(key: str, status_code: int, data):
+        """Store the response for a claimed key so retries can replay it"""
+        ttl = timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+        IdempotencyKey.objects.filter(key=key).update(
+            status_code=status_code,
+            # DRF's encoder, so a replay renders exactly like the original
+            response_body=json.dumps(data, cls=encoders.JSONEncoder),
+            expires_at=timezone.now() + ttl
+        )
+    
+    @staticmethod
+    def release(key: str):
+        """Give up a claimed key, e.g. after a failed request, so it can be retried"""
+        IdempotencyKey.objects.filter(key=key, status_code__isnull=True).delete()
+    
+    @staticmethod
+    def replay_data(record: IdempotencyKey):
+        return json.loads(record.response_body)
+    
+    @staticmethod
+    def purge_expired() -> int:
+        """Delete expired keys; returns how many were removed"""
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
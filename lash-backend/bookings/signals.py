@@ -0,0 +1,125 @@
+"""
+Signal handlers keeping slot reservations, cached availability, cached
+confirmation pages and the catalog snapshot in step with the database.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from bookings.cache import AvailabilityCache, ConfirmationCache
+from bookings.models import (
+    AddOn, Appointment, AppointmentClient, BlockedDate, BusinessHours, Customer, Service
+)
+from bookings.services import AppointmentService, AvailabilityService, catalog_snapshot
+
+
+# Fields that decide which slots an appointment occupies
+SCHEDULE_FIELDS = ('appointment_date', 'appointment_time', 'total_duration', 'status')
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous_schedule(sender, instance, raw=False, **kwargs):
+    """Record the stored schedule so a rescheduled appointment frees its old slots"""
+    instance._previous_schedule = None
+    if raw or instance.pk is None:
+        return
+
+    instance._previous_schedule = (
+        Appointment.objects.filter(pk=instance.pk)
+        .values_list(*SCHEDULE_FIELDS)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Appointment)
+def sync_slot_reservations(sender, instance, created, raw=False, **kwargs):
+    """
+    Re-reserve grid cells whenever an appointment's slot changes.
+    Runs inside the caller's transaction, so a conflict rolls the save back.
+    """
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_schedule', None)
+    current = tuple(getattr(instance, field) for field in SCHEDULE_FIELDS)
+    if created or previous is None:
+        AppointmentService.sync_slot_reservations(instance, replace=False)
+    elif previous != current:
+        AppointmentService.sync_slot_reservations(instance)
+
+
+def _invalidate(func, *args):
+    # Invalidate now and again on commit, so a read that raced the open
+    # transaction cannot leave pre-commit availability in the cache
+    func(*args)
+    transaction.on_commit(lambda: func(*args))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_dates(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_schedule', None)
+    _invalidate(
+        AvailabilityCache.invalidate,
+        instance.appointment_date,
+        previous[0] if previous else None
+    )
+
+
+@receiver(post_save, sender=BlockedDate)
+@receiver(post_delete, sender=BlockedDate)
+@receiver(post_save, sender=BusinessHours)
+@receiver(post_delete, sender=BusinessHours)
+def invalidate_schedule(sender, instance, **kwargs):
+    # Rare admin edits that can affect many dates at once
+    _invalidate(AvailabilityService.schedule_changed)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=AddOn)
+@receiver(post_delete, sender=AddOn)
+def invalidate_catalog(sender, instance, **kwargs):
+    _invalidate(catalog_snapshot.invalidate)
+    # Confirmation pages embed service and add-on details
+    _invalidate(ConfirmationCache.invalidate_all)
+
+
+def _invalidate_confirmations(**appointment_filters):
+    codes = list(
+        Appointment.objects.filter(**appointment_filters)
+        .values_list('confirmation_code', flat=True)
+    )
+    _invalidate(ConfirmationCache.invalidate, *codes)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_confirmation(sender, instance, **kwargs):
+    _invalidate(ConfirmationCache.invalidate, instance.confirmation_code)
+
+
+@receiver(post_save, sender=AppointmentClient)
+@receiver(post_delete, sender=AppointmentClient)
+def invalidate_client_confirmation(sender, instance, **kwargs):
+    _invalidate_confirmations(pk=instance.appointment_id)
+
+
+@receiver(m2m_changed, sender=AppointmentClient.add_ons.through)
+def invalidate_add_on_confirmation(sender, instance, action, reverse, pk_set, **kwargs):
+    # A clear is handled before it happens, while the links still exist
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        _invalidate_confirmations(pk=instance.appointment_id)
+    elif pk_set:
+        # Add-on side of the relation: pk_set holds AppointmentClient ids
+        _invalidate_confirmations(clients__in=pk_set)
+    else:
+        _invalidate_confirmations(clients__add_ons=instance)
+
+
+@receiver(post_save, sender=Customer)
+def invalidate_customer_confirmations(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_confirmations(customer=instance)
@@ -1,3 +1,2095 @@
-from django.test import TestCase
+import csv
+import json
+import random
+import smtplib
+import subprocess
+import sys
+import tempfile
+import time as timer
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from bookings.constants import (
+    AppointmentStatus, EmailOutboxConfig, EmailStatus, IdempotencyConfig, PaginationConfig
+)
+from bookings.models import (
+    Service, AddOn, Customer, Appointment, AppointmentClient, BusinessHours, BlockedDate,
+    BookingDateLock, IdempotencyKey, OutboundEmail, SlotReservation
+)
+from bookings.exceptions import OutsideBusinessHoursException, SlotNotAvailableException
+from bookings.parsers import ORJSONParser
+from bookings.renderers import ORJSONRenderer
+from bookings.serializers import (
+    AddOnSerializer, AppointmentCreateSerializer, BusinessHoursSerializer, CustomerSerializer,
+    ServiceSerializer, ValuesSerializer
+)
+from bookings.cache import AvailabilityCache
+from bookings.email_service import BatchEmailSender, process_outbox, queue_booking_emails
+from bookings.services import (
+    AvailabilityService, AppointmentService, DayOccupancy, DaySchedule, IdempotencyService,
+    catalog_snapshot, schedule_snapshot
+)
+
+
+# Saturday 09:30-18:00 gives twelve 45-minute slots, weekdays 18:00-22:00 give six
+SATURDAY = date(2030, 6, 1)
+MONDAY = date(2030, 6, 3)
+SUNDAY = date(2030, 6, 2)
+
+
+class BookingTestMixin:
+    """Shared fixtures for booking tests"""
+
+    def setUp(self):
+        super().setUp()
+        # The cache outlives each test's rolled-back transaction
+        cache.clear()
+
+    @classmethod
+    def create_business_hours(cls):
+        for weekday in range(5):
+            BusinessHours.objects.create(
+                weekday=weekday, is_open=True,
+                open_time=time(18, 0), close_time=time(22, 0)
+            )
+        BusinessHours.objects.create(
+            weekday=5, is_open=True,
+            open_time=time(9, 30), close_time=time(18, 0)
+        )
+        BusinessHours.objects.create(weekday=6, is_open=False)
+
+    @classmethod
+    def create_catalog(cls):
+        cls.classic = Service.objects.create(
+            id='classic-natural', name='Classic Natural', description='Classic',
+            duration=90, price=Decimal('120.00'), category='classic'
+        )
+        cls.volume = Service.objects.create(
+            id='volume-full', name='Full Volume', description='Volume',
+            duration=150, price=Decimal('220.00'), category='volume'
+        )
+        cls.tips = AddOn.objects.create(
+            id='colored-tips', name='Colored Tips', description='Tips',
+            duration=15, price=Decimal('25.00')
+        )
+        cls.removal = AddOn.objects.create(
+            id='lash-removal', name='Removal', description='Removal',
+            duration=30, price=Decimal('30.00')
+        )
+
+    @classmethod
+    def create_appointment(cls, appointment_date, appointment_time, duration=90,
+                           status=AppointmentStatus.PENDING, customer=None):
+        if customer is None:
+            customer = Customer.objects.create(
+                first_name='Test', last_name='Client',
+                email=f'client{Customer.objects.count()}@example.com', phone='0770000000'
+            )
+        return Appointment.objects.create(
+            customer=customer,
+            appointment_date=appointment_date,
+            appointment_time=appointment_time,
+            status=status,
+            confirmation_code=f'HLS-{Appointment.objects.count():08d}',
+            total_duration=duration,
+            total_price=Decimal('120.00'),
+        )
+
+
+class AvailableSlotsTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+
+    def test_slots_cover_business_hours(self):
+        slots = AvailabilityService.get_available_slots(SATURDAY)
+
+        self.assertEqual(len(slots), 12)
+        self.assertEqual(slots[0], {'time': '09:30', 'available': True})
+        self.assertEqual(slots[-1]['time'], '17:45')
+
+    def test_booked_slot_is_unavailable(self):
+        self.create_appointment(SATURDAY, time(10, 15), duration=45)
+        self.create_appointment(SATURDAY, time(11, 0), status=AppointmentStatus.CANCELLED)
+
+        slots = {slot['time']: slot['available'] for slot in AvailabilityService.get_available_slots(SATURDAY)}
+
+        self.assertTrue(slots['09:30'])
+        self.assertFalse(slots['10:15'])
+        self.assertTrue(slots['11:00'])
+
+    def test_long_booking_blocks_following_slots(self):
+        """A 150-minute booking at 09:30 runs until 12:00"""
+        self.create_appointment(SATURDAY, time(9, 30), duration=150)
+
+        slots = {slot['time']: slot['available'] for slot in AvailabilityService.get_available_slots(SATURDAY)}
+
+        self.assertFalse(slots['10:15'])
+        self.assertFalse(slots['11:00'])
+        self.assertTrue(slots['12:30'])
+
+    def test_duration_must_fit_before_next_booking(self):
+        self.create_appointment(SATURDAY, time(12, 30), duration=90)
+
+        slots = {
+            slot['time']: slot['available']
+            for slot in AvailabilityService.get_available_slots(SATURDAY, duration=120)
+        }
+
+        self.assertTrue(slots['09:30'])
+        self.assertTrue(slots['10:15'])
+        self.assertFalse(slots['11:00'])
+        self.assertFalse(slots['13:15'])
+        self.assertTrue(slots['14:00'])
+
+    def test_slots_agree_with_check_availability(self):
+        self.create_appointment(SATURDAY, time(9, 30), duration=150)
+        self.create_appointment(SATURDAY, time(14, 45), duration=60)
+
+        for slot in AvailabilityService.get_available_slots(SATURDAY, duration=105):
+            slot_time = AvailabilityService.parse_time(slot['time'])
+            try:
+                AvailabilityService.check_availability(SATURDAY, slot_time, 105)
+                available = True
+            except (SlotNotAvailableException, OutsideBusinessHoursException):
+                available = False
+            self.assertEqual(slot['available'], available, slot['time'])
+
+    def test_bookings_must_end_by_closing_time(self):
+        # Saturday closes at 18:00
+        self.assertEqual(AvailabilityService.check_availability(SATURDAY, time(16, 0), 120), (True, None))
+        with self.assertRaisesMessage(OutsideBusinessHoursException, 'end after closing'):
+            AvailabilityService.check_availability(SATURDAY, time(16, 30), 120)
+
+        slots = AvailabilityService.get_available_slots(SATURDAY, duration=120)
+        # The 45-minute grid runs 15:30, 16:15: the last start ending by 18:00 is 15:30
+        self.assertEqual([slot['time'] for slot in slots if slot['available']][-1], '15:30')
+        self.assertFalse(any(slot['available'] for slot in AvailabilityService.get_available_slots(SATURDAY, 600)))
+
+    def test_endpoint_resolves_duration_from_services(self):
+        self.create_catalog()
+        self.create_appointment(SATURDAY, time(12, 30), duration=90)
+
+        # Full Volume (150) plus Colored Tips (15) does not fit at 10:15
+        response = self.client.get('/api/appointments/available_slots/', {
+            'date': SATURDAY.isoformat(),
+            'service_ids': 'volume-full',
+            'add_on_ids': 'colored-tips',
+        })
+        slots = {slot['time']: slot['available'] for slot in response.data['slots']}
+
+        self.assertTrue(slots['09:30'])
+        self.assertFalse(slots['10:15'])
+
+    def test_endpoint_counts_every_client(self):
+        self.create_catalog()
+        self.create_appointment(SATURDAY, time(14, 0), duration=45)
+
+        # Classic (90) with Colored Tips (15) plus Full Volume (150)
+        self.assertEqual(
+            AppointmentService.calculate_total_duration(
+                ['classic-natural', 'volume-full'], [['colored-tips'], []]
+            ),
+            255
+        )
+        grouped = self.client.get('/api/appointments/available_slots/', {
+            'date': SATURDAY.isoformat(),
+            'service_ids': 'classic-natural,volume-full',
+            'add_on_ids': 'colored-tips',
+        })
+        explicit = self.client.get('/api/appointments/available_slots/', {
+            'date': SATURDAY.isoformat(), 'duration': '255'
+        })
+
+        self.assertEqual(grouped.data, explicit.data)
+        slots = {slot['time']: slot['available'] for slot in grouped.data['slots']}
+        self.assertFalse(slots['10:15'])
+
+    def test_endpoint_takes_add_ons_per_client(self):
+        self.create_catalog()
+
+        def duration(**params):
+            return self.client.get('/api/appointments/next_available/', {
+                'from': SATURDAY.isoformat(), 'service_ids': 'classic-natural,classic-natural', **params
+            })
+
+        # Both clients take Colored Tips: 2 x (90 + 15)
+        self.assertEqual(duration(add_on_ids=['colored-tips', 'colored-tips']).data['duration'], 210)
+        # Only the second client does
+        self.assertEqual(duration(add_on_ids=['', 'colored-tips']).data['duration'], 195)
+        self.assertEqual(duration(add_on_ids=['colored-tips'] * 3).status_code, 400)
+
+    def test_quote_rejects_mismatched_add_on_lists(self):
+        self.create_catalog()
+
+        with self.assertRaises(ValueError):
+            AppointmentService.calculate_total_duration(['classic-natural', 'volume-full'], [[]])
+
+    def test_endpoint_accepts_duration(self):
+        self.create_appointment(SATURDAY, time(11, 0), duration=45)
+
+        response = self.client.get('/api/appointments/available_slots/', {
+            'date': SATURDAY.isoformat(), 'duration': '90'
+        })
+        slots = {slot['time']: slot['available'] for slot in response.data['slots']}
+
+        self.assertFalse(slots['10:15'])
+        self.assertTrue(slots['11:45'])
+
+    def test_endpoint_rejects_bad_duration_and_unknown_service(self):
+        for duration in ('long', '0', '1441', '10000000000'):
+            response = self.client.get('/api/appointments/available_slots/', {
+                'date': SATURDAY.isoformat(), 'duration': duration
+            })
+            self.assertEqual(response.status_code, 400, duration)
+
+        response = self.client.get('/api/appointments/available_slots/', {
+            'date': SATURDAY.isoformat(), 'service_ids': 'missing'
+        })
+        self.assertEqual(response.status_code, 404)
+
+    def test_closed_and_blocked_dates_have_no_slots(self):
+        BlockedDate.objects.create(date=MONDAY, reason='Holiday')
+
+        self.assertEqual(AvailabilityService.get_available_slots(MONDAY), [])
+        self.assertEqual(AvailabilityService.get_available_slots(SUNDAY), [])
+
+    def test_query_count_is_constant(self):
+        """The endpoint costs the same number of queries for any day"""
+        for slot_time in (time(9, 30), time(11, 0), time(14, 0), time(17, 15)):
+            self.create_appointment(SATURDAY, slot_time)
+        self.create_appointment(MONDAY, time(18, 0))
+        schedule_snapshot.get()
+
+        for target_date in (SATURDAY, MONDAY):
+            with self.assertNumQueries(1):
+                response = self.client.get(
+                    '/api/appointments/available_slots/', {'date': target_date.isoformat()}
+                )
+            self.assertEqual(response.status_code, 200)
+
+    def test_schedule_load_independent_of_bookings(self):
+        schedule_snapshot.get()
+        with CaptureQueriesContext(connection) as empty_day:
+            DaySchedule.load(SATURDAY).get_slots()
+
+        for hour in range(10, 17):
+            self.create_appointment(SATURDAY, time(hour, 0), duration=45)
+
+        with CaptureQueriesContext(connection) as busy_day:
+            DaySchedule.load(SATURDAY).get_slots()
+
+        self.assertEqual(len(empty_day), len(busy_day))
+
+
+class AvailabilityCalendarTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+
+    def get_calendar(self, start, end, **params):
+        return self.client.get('/api/appointments/availability_calendar/', {
+            'start': start.isoformat(), 'end': end.isoformat(), **params
+        })
+
+    def test_calendar_reports_day_status_and_free_slots(self):
+        BlockedDate.objects.create(date=MONDAY, reason='Holiday')
+        # Fill Saturday from 09:30 to 18:00
+        self.create_appointment(SATURDAY, time(9, 30), duration=510)
+        self.create_appointment(date(2030, 6, 4), time(18, 45), duration=45)
+
+        response = self.get_calendar(SATURDAY, date(2030, 6, 4))
+        days = {day['date']: day for day in response.data['days']}
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(days['2030-06-01']['status'], 'fully_booked')
+        self.assertEqual(days['2030-06-02']['status'], 'closed')
+        self.assertEqual(days['2030-06-03']['status'], 'closed')
+        self.assertEqual(days['2030-06-04']['status'], 'open')
+        # 21:45 is on the grid, but a 45-minute slot there would end after 22:00
+        self.assertEqual(days['2030-06-04']['slots'], ['18:00', '19:30', '20:15', '21:00'])
+
+    def test_calendar_matches_available_slots(self):
+        self.create_appointment(SATURDAY, time(11, 0), duration=150)
+        self.create_appointment(MONDAY, time(18, 45), duration=90)
+
+        response = self.get_calendar(SATURDAY, MONDAY, duration=90)
+
+        for day in response.data['days']:
+            slots = AvailabilityService.get_available_slots(date.fromisoformat(day['date']), 90)
+            self.assertEqual(day['slots'], [slot['time'] for slot in slots if slot['available']])
+
+    def test_query_count_independent_of_range(self):
+        for offset in range(0, 60, 3):
+            self.create_appointment(date(2030, 6, 1) + timedelta(days=offset), time(18, 0))
+        schedule_snapshot.get()
+
+        for end in (date(2030, 6, 7), date(2030, 8, 31)):
+            with self.assertNumQueries(1):
+                response = self.get_calendar(SATURDAY, end)
+            self.assertEqual(response.status_code, 200)
+
+    def test_invalid_ranges_are_rejected(self):
+        self.assertEqual(self.get_calendar(MONDAY, SATURDAY).status_code, 400)
+        self.assertEqual(self.get_calendar(SATURDAY, date(2031, 12, 31)).status_code, 400)
+        response = self.client.get('/api/appointments/availability_calendar/', {'start': '2030-06-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AvailabilityCacheTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+
+    def setUp(self):
+        super().setUp()
+        AvailabilityCache.reset_stats()
+
+    def get_slots(self, target_date=SATURDAY, **params):
+        response = self.client.get('/api/appointments/available_slots/', {
+            'date': target_date.isoformat(), **params
+        })
+        return {slot['time']: slot['available'] for slot in response.data['slots']}
+
+    @override_settings(AVAILABILITY_CACHE_STATS=True)
+    def test_repeat_requests_hit_cache(self):
+        self.get_slots()
+
+        with self.assertNumQueries(0):
+            self.get_slots()
+            self.get_slots(duration=45)
+
+        self.assertEqual(AvailabilityCache.stats(), {'hits': 2, 'misses': 2})
+
+    @override_settings(AVAILABILITY_CACHE_STATS=False)
+    def test_lookups_are_not_counted_by_default(self):
+        self.get_slots()
+
+        with patch.object(cache, 'incr') as incr:
+            self.get_slots()
+
+        incr.assert_not_called()
+        self.assertEqual(AvailabilityCache.stats(), {'hits': 0, 'misses': 0})
+
+    def test_durations_are_cached_separately(self):
+        self.create_appointment(SATURDAY, time(12, 30), duration=45)
+
+        self.assertTrue(self.get_slots()['11:45'])
+        self.assertFalse(self.get_slots(duration=90)['11:45'])
+
+    def test_new_appointment_invalidates_its_date(self):
+        self.get_slots()
+        self.get_slots(MONDAY)
+
+        self.create_appointment(SATURDAY, time(10, 15), duration=45)
+
+        self.assertFalse(self.get_slots()['10:15'])
+        with self.assertNumQueries(0):
+            self.get_slots(MONDAY)
+
+    def test_rescheduled_and_cancelled_appointments_invalidate(self):
+        appointment = self.create_appointment(SATURDAY, time(10, 15), duration=45)
+        self.assertFalse(self.get_slots()['10:15'])
+        self.get_slots(MONDAY)
+
+        appointment.appointment_date = MONDAY
+        appointment.appointment_time = time(18, 0)
+        appointment.save()
+
+        self.assertTrue(self.get_slots()['10:15'])
+        self.assertFalse(self.get_slots(MONDAY)['18:00'])
+
+        appointment.delete()
+        self.assertTrue(self.get_slots(MONDAY)['18:00'])
+
+    def test_blocked_dates_and_hours_invalidate(self):
+        self.get_slots(MONDAY)
+
+        blocked = BlockedDate.objects.create(date=MONDAY)
+        self.assertEqual(self.get_slots(MONDAY), {})
+
+        blocked.delete()
+        self.assertIn('18:00', self.get_slots(MONDAY))
+
+        # Queryset.update() skips signals, which is why bulk paths invalidate explicitly
+        BusinessHours.objects.filter(weekday=0).update(open_time=time(17, 0))
+        self.assertNotIn('17:00', self.get_slots(MONDAY))
+        AvailabilityService.schedule_changed()
+        self.assertIn('17:00', self.get_slots(MONDAY))
+
+        call_command('update_business_hours', stdout=StringIO())
+        self.assertNotIn('17:00', self.get_slots(MONDAY))
+        self.assertIn('18:00', self.get_slots(MONDAY))
+
+    def test_check_availability_uses_cached_schedule(self):
+        AvailabilityService.check_availability(SATURDAY, time(9, 30), 90)
+
+        with self.assertNumQueries(0):
+            AvailabilityService.check_availability(SATURDAY, time(11, 0), 90)
+
+
+class SlotReservationTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+
+    def booking_payload(self, appointment_time='10:15', service_id='classic-natural', **overrides):
+        payload = {
+            'first_name': 'Tariro', 'last_name': 'Moyo',
+            'email': 'tariro@example.com', 'phone': '0771234567',
+            'location': 'Harare', 'needs_transport': False, 'is_returning': False,
+            'appointment_date': SATURDAY.isoformat(), 'appointment_time': appointment_time,
+            'clients': [{'service_id': service_id, 'add_on_ids': []}],
+        }
+        payload.update(overrides)
+        return payload
+
+    def test_booking_reserves_grid_cells(self):
+        response = self.client.post('/api/appointments/', self.booking_payload(), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        appointment = Appointment.objects.get()
+        # 10:15 for 90 minutes covers 15-minute cells 41 to 46
+        self.assertEqual(
+            list(appointment.slot_reservations.values_list('cell', flat=True)),
+            list(range(41, 47))
+        )
+
+    def test_conflicting_reservation_raises_slot_not_available(self):
+        first = self.create_appointment(SATURDAY, time(10, 15), duration=90)
+        second = self.create_appointment(SATURDAY, time(12, 30), duration=45)
+
+        second.appointment_time = time(11, 0)
+        with self.assertRaises(SlotNotAvailableException):
+            AppointmentService.sync_slot_reservations(second)
+
+        self.assertEqual(first.slot_reservations.count(), 6)
+
+    def test_rejected_reschedule_leaves_appointment_unchanged(self):
+        self.create_appointment(SATURDAY, time(9, 30), duration=90)
+        second = self.create_appointment(SATURDAY, time(13, 0), duration=90)
+        cells = list(second.slot_reservations.values_list('cell', flat=True))
+
+        response = self.client.patch(
+            f'/api/appointments/{second.pk}/', {'appointment_time': '10:00'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 409)
+        second.refresh_from_db()
+        self.assertEqual(second.appointment_time, time(13, 0))
+        self.assertEqual(second.appointment_end_time, time(14, 30))
+        self.assertEqual(list(second.slot_reservations.values_list('cell', flat=True)), cells)
+
+    def test_admin_reschedule_conflict_is_reported(self):
+        self.create_appointment(SATURDAY, time(9, 30), duration=90)
+        second = self.create_appointment(SATURDAY, time(13, 0), duration=90)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        url = f'/admin/bookings/appointment/{second.pk}/change/'
+
+        response = self.client.post(url, {
+            'customer': second.customer_id, 'appointment_date': SATURDAY.isoformat(),
+            'appointment_time': '10:00', 'status': second.status,
+            'total_duration': 90, 'total_price': '120.00', 'notes': '',
+            'clients-TOTAL_FORMS': 0, 'clients-INITIAL_FORMS': 0,
+        }, follow=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'already booked')
+        second.refresh_from_db()
+        self.assertEqual(second.appointment_time, time(13, 0))
+        self.assertEqual(second.slot_reservations.count(), 6)
+
+    def test_overlapping_booking_is_rejected(self):
+        self.create_appointment(SATURDAY, time(9, 30), duration=150)
+
+        response = self.client.post(
+            '/api/appointments/', self.booking_payload('11:00'), format='json'
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertFalse(Customer.objects.filter(email='tariro@example.com').exists())
+
+    def test_stale_availability_still_cannot_double_book(self):
+        """The unique constraint catches what a stale availability check lets through"""
+        self.create_appointment(SATURDAY, time(10, 15), duration=90)
+
+        with patch.object(AvailabilityService, 'check_availability', return_value=(True, None)):
+            response = self.client.post('/api/appointments/', self.booking_payload(), format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_booking_outside_business_hours_is_rejected(self):
+        response = self.client.post(
+            '/api/appointments/', self.booking_payload('08:00'), format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Appointment.objects.count(), 0)
+
+    def test_cancelling_and_rescheduling_release_cells(self):
+        appointment = self.create_appointment(SATURDAY, time(10, 15), duration=90)
+
+        appointment.appointment_time = time(14, 0)
+        appointment.save()
+        self.assertEqual(
+            list(appointment.slot_reservations.values_list('cell', flat=True)),
+            list(range(56, 62))
+        )
+
+        appointment.status = AppointmentStatus.CANCELLED
+        appointment.save()
+        self.assertFalse(SlotReservation.objects.exists())
+
+        # The freed slot can be booked again
+        self.create_appointment(SATURDAY, time(14, 0), duration=90)
+
+
+class DayOccupancyTests(SimpleTestCase):
+
+    def test_fits_respects_interval_edges(self):
+        occupancy = DayOccupancy.from_intervals([(600, 690)])
+
+        self.assertTrue(occupancy.fits(510, 90))
+        self.assertFalse(occupancy.fits(511, 90))
+        self.assertFalse(occupancy.fits(689, 1))
+        self.assertTrue(occupancy.fits(690, 45))
+
+    def test_bookings_past_midnight(self):
+        occupancy = DayOccupancy.from_intervals([(1380, 1500)])
+
+        self.assertFalse(occupancy.fits(1420, 30))
+        self.assertEqual(occupancy.fitting_starts([1320, 1335, 1350], 45), [1320, 1335])
+
+    def test_huge_durations_stay_cheap(self):
+        occupancy = DayOccupancy.from_intervals([(600, 690)])
+
+        self.assertFalse(occupancy.fits(0, 10 ** 10))
+        self.assertTrue(occupancy.fits(690, 10 ** 10))
+        self.assertEqual(occupancy.fitting_starts([0, 690, 1000], 10 ** 10), [690, 1000])
+        self.assertTrue(DayOccupancy().fits(0, 10 ** 10))
+
+    def test_fitting_starts_match_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            intervals = []
+            for _ in range(rng.randint(0, 40)):
+                start = rng.randrange(0, 1440, 15)
+                intervals.append((start, start + rng.choice([0, 45, 90, 105, 150])))
+            duration = rng.choice([1, 45, 90, 165, 300])
+            starts = list(range(0, 1440, 45))
+
+            expected = [
+                start for start in starts
+                if all(end <= start or begin >= start + duration for begin, end in intervals if end > begin)
+            ]
+            occupancy = DayOccupancy.from_intervals(intervals)
+
+            self.assertEqual(occupancy.fitting_starts(starts, duration), expected)
+            self.assertEqual([start for start in starts if occupancy.fits(start, duration)], expected)
+
+
+class CheckAvailabilityBatchTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+
+    def check_batch(self, candidates):
+        return self.client.post(
+            '/api/appointments/check_availability_batch/', {'candidates': candidates}, format='json'
+        )
+
+    def test_verdicts_match_single_checks(self):
+        BlockedDate.objects.create(date=date(2030, 6, 4))
+        self.create_appointment(SATURDAY, time(9, 30), duration=150)
+        candidates = [
+            {'appointment_date': '2030-06-01', 'appointment_time': '11:00', 'duration': 90},
+            {'appointment_date': '2030-06-01', 'appointment_time': '12:00', 'duration': 90},
+            {'appointment_date': '2030-06-01', 'appointment_time': '08:00', 'duration': 90},
+            {'appointment_date': '2030-06-02', 'appointment_time': '14:00', 'duration': 90},
+            {'appointment_date': '2030-06-04', 'appointment_time': '18:00', 'duration': 90},
+            {'appointment_date': '2030-06-03', 'appointment_time': '18:00'},
+        ]
+
+        response = self.check_batch(candidates)
+
+        self.assertEqual(response.status_code, 200)
+        for candidate, result in zip(candidates, response.data['results']):
+            single = self.client.post(
+                '/api/appointments/check_availability/', candidate, format='json'
+            )
+            self.assertEqual(result, single.data)
+        self.assertEqual(
+            [result.get('reason') for result in response.data['results']],
+            [
+                'Time slot already booked', None, 'The selected time is outside business hours',
+                'Business is closed on the selected day', 'The selected date is blocked', None,
+            ]
+        )
+
+    def test_each_date_is_loaded_once(self):
+        candidates = [
+            {'appointment_date': day, 'appointment_time': slot, 'duration': 45}
+            for day in ('2030-06-01', '2030-06-03')
+            for slot in ('10:15', '11:00', '18:00', '18:45', '19:30')
+        ]
+
+        schedule_snapshot.get()
+
+        with self.assertNumQueries(2):
+            response = self.check_batch(candidates)
+
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self.check_batch([]).status_code, 400)
+        self.assertEqual(self.check_batch([{'appointment_date': '2030-06-01'}]).status_code, 400)
+        self.assertEqual(
+            self.check_batch([{'appointment_date': '2030-06-01', 'appointment_time': '25:00'}]).status_code,
+            400
+        )
+        too_many = [{'appointment_date': '2030-06-01', 'appointment_time': '10:15'}] * 101
+        self.assertEqual(self.check_batch(too_many).status_code, 400)
+
+    def test_single_check_parses_duration(self):
+        def check(duration):
+            return self.client.post('/api/appointments/check_availability/', {
+                'appointment_date': '2030-06-01', 'appointment_time': '16:00', 'duration': duration
+            }, format='json')
+
+        self.assertEqual(check('120').data, {'available': True})
+        self.assertEqual(check('121').data['available'], False)
+        for duration in (-30, 'abc', 1441):
+            self.assertEqual(check(duration).status_code, 400)
+
+
+class NextAvailableTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+
+    def next_available(self, **params):
+        return self.client.get('/api/appointments/next_available/', {'from': SATURDAY.isoformat(), **params})
+
+    def test_returns_earliest_fitting_slots(self):
+        # Saturday is fully booked, Sunday closed, Monday busy until 18:45;
+        # 195 minutes must start by 18:45 to end by the 22:00 close
+        self.create_appointment(SATURDAY, time(9, 30), duration=510)
+        self.create_appointment(MONDAY, time(18, 0), duration=45)
+
+        response = self.next_available(
+            service_id='volume-full', add_on_ids='colored-tips,lash-removal', limit=3
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['duration'], 195)
+        self.assertEqual(response.data['slots'], [
+            {'date': '2030-06-03', 'time': '18:45'},
+            {'date': '2030-06-04', 'time': '18:00'},
+            {'date': '2030-06-04', 'time': '18:45'},
+        ])
+
+    def test_stops_at_first_window_with_enough_slots(self):
+        schedule_snapshot.get()
+
+        with self.assertNumQueries(1):
+            response = self.next_available(duration=45, limit=5)
+
+        self.assertEqual(response.data['slots'][0], {'date': '2030-06-01', 'time': '09:30'})
+        self.assertEqual(response.data['searched_until'], '2030-06-01')
+
+    def test_scan_is_capped(self):
+        # Closed every day, so the whole horizon is scanned
+        BusinessHours.objects.update(is_open=False)
+        AvailabilityService.schedule_changed()
+        schedule_snapshot.get()
+
+        with self.assertNumQueries(4):
+            response = self.next_available(duration=600)
+
+        self.assertEqual(response.data['slots'], [])
+        self.assertEqual(response.data['searched_until'], '2030-08-29')
+
+    def test_skips_times_already_past_today(self):
+        now = timezone.make_aware(timezone.datetime(2030, 6, 1, 12, 0))
+
+        slots, _ = AvailabilityService.find_next_available(SATURDAY, 45, limit=1, now=now)
+
+        self.assertEqual(slots, [{'date': '2030-06-01', 'time': '12:30'}])
+
+    def test_requires_duration(self):
+        self.assertEqual(self.next_available().status_code, 400)
+
+
+class ScheduleSnapshotTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+
+    def test_snapshot_is_reused_until_version_changes(self):
+        with self.assertNumQueries(2):
+            snapshot = schedule_snapshot.get()
+
+        with self.assertNumQueries(0):
+            self.assertIs(schedule_snapshot.get(), snapshot)
+            self.assertFalse(AvailabilityService.is_date_blocked(SATURDAY))
+            self.assertEqual(AvailabilityService.get_business_hours(5).open_time, time(9, 30))
+
+        BlockedDate.objects.create(date=SATURDAY)
+
+        self.assertIsNot(schedule_snapshot.get(), snapshot)
+        self.assertTrue(AvailabilityService.is_date_blocked(SATURDAY))
+
+    def test_slot_grid_follows_business_hours(self):
+        snapshot = schedule_snapshot.get()
+
+        self.assertEqual(snapshot.slot_grid[5][:2], [570, 615])
+        self.assertEqual(len(snapshot.slot_grid[5]), 12)
+        self.assertEqual(snapshot.slot_grid[6], [])
+
+        hours = BusinessHours.objects.get(weekday=6)
+        hours.is_open = True
+        hours.open_time, hours.close_time = time(14, 0), time(18, 0)
+        hours.save()
+
+        self.assertEqual(schedule_snapshot.get().slot_grid[6], [840, 885, 930, 975, 1020, 1065])
+
+    def test_version_bump_from_another_process_is_seen(self):
+        """What update_business_hours and other commands rely on to reach the workers"""
+        version = schedule_snapshot.version()
+
+        subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c',
+             'from bookings.services import AvailabilityService; AvailabilityService.schedule_changed()'],
+            cwd=settings.BASE_DIR, check=True, capture_output=True
+        )
+
+        self.assertNotEqual(schedule_snapshot.version(), version)
+
+    def test_max_age_bounds_staleness_without_version_bump(self):
+        schedule_snapshot.get()
+        BusinessHours.objects.filter(weekday=5).update(open_time=time(10, 0))
+
+        self.assertEqual(AvailabilityService.get_business_hours(5).open_time, time(9, 30))
+
+        with self.settings(SNAPSHOT_MAX_AGE=0):
+            self.assertEqual(AvailabilityService.get_business_hours(5).open_time, time(10, 0))
+
+
+class AppointmentOverlapQueryTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+
+    def test_end_time_is_kept_in_sync(self):
+        appointment = self.create_appointment(SATURDAY, time(9, 30), duration=150)
+        self.assertEqual(appointment.appointment_end_time, time(12, 0))
+
+        appointment.total_duration = 45
+        appointment.save(update_fields=['total_duration'])
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.appointment_end_time, time(10, 15))
+
+        late = self.create_appointment(MONDAY, time(21, 45), duration=150)
+        self.assertEqual(late.appointment_end_time, time.max)
+
+    def test_overlap_includes_earlier_long_appointments(self):
+        self.create_appointment(SATURDAY, time(9, 30), duration=150)
+
+        self.assertTrue(AvailabilityService.has_overlapping_appointments(SATURDAY, time(11, 0), 45))
+        self.assertTrue(AvailabilityService.has_overlapping_appointments(SATURDAY, time(9, 0), 45))
+        self.assertFalse(AvailabilityService.has_overlapping_appointments(SATURDAY, time(12, 0), 45))
+        self.assertFalse(AvailabilityService.has_overlapping_appointments(SATURDAY, time(8, 45), 45))
+
+    def test_overlap_ignores_inactive_and_excluded(self):
+        appointment = self.create_appointment(SATURDAY, time(9, 30), duration=150)
+        self.create_appointment(SATURDAY, time(14, 0), status=AppointmentStatus.CANCELLED)
+
+        self.assertFalse(AvailabilityService.has_overlapping_appointments(SATURDAY, time(14, 0), 45))
+        self.assertFalse(AvailabilityService.has_overlapping_appointments(
+            SATURDAY, time(11, 0), 45, exclude_appointment_id=appointment.id
+        ))
+
+    def test_locked_check_uses_range_query(self):
+        self.create_appointment(SATURDAY, time(9, 30), duration=150)
+        schedule_snapshot.get()
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertRaises(SlotNotAvailableException):
+                AvailabilityService.check_availability(SATURDAY, time(11, 0), 45, use_cache=False)
+            self.assertEqual(
+                AvailabilityService.check_availability(SATURDAY, time(12, 0), 45, use_cache=False),
+                (True, None)
+            )
+
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            self.assertIn('appointment_end_time', query['sql'])
+
+    def explain(self):
+        return AvailabilityService.overlapping_appointments(SATURDAY, time(11, 0), 90).explain()
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_overlap_query_uses_index_on_sqlite(self):
+        self.assertIn('appointment_overlap_idx', self.explain())
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL query plan')
+    def test_overlap_query_uses_index_on_postgresql(self):
+        with connection.cursor() as cursor:
+            # A test-sized table is always cheaper to scan sequentially
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            self.assertIn('appointment_overlap_idx', self.explain())
+
+
+class GroupBookingTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+
+    def book(self, clients, appointment_time='09:30', email='group@example.com'):
+        return self.client.post('/api/appointments/', {
+            'first_name': 'Rudo', 'last_name': 'Chari',
+            'email': email, 'phone': '0771234567',
+            'location': 'Harare', 'needs_transport': False, 'is_returning': False,
+            'appointment_date': SATURDAY.isoformat(), 'appointment_time': appointment_time,
+            'clients': clients,
+        }, format='json')
+
+    def test_group_booking_creates_clients_and_add_ons(self):
+        response = self.book([
+            {'service_id': 'classic-natural', 'add_on_ids': ['colored-tips', 'lash-removal']},
+            {'service_id': 'classic-natural', 'add_on_ids': ['colored-tips', 'colored-tips']},
+            {'service_id': 'volume-full'},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        appointment = Appointment.objects.get()
+        # 90 + 15 + 30, 90 + 15, 150
+        self.assertEqual(appointment.total_duration, 390)
+        clients = list(appointment.clients.order_by('client_number'))
+        self.assertEqual([client.service_id for client in clients],
+                         ['classic-natural', 'classic-natural', 'volume-full'])
+        self.assertEqual(
+            [sorted(client.add_ons.values_list('id', flat=True)) for client in clients],
+            [['colored-tips', 'lash-removal'], ['colored-tips'], []]
+        )
+
+    def test_unknown_and_inactive_ids_are_reported_together(self):
+        Service.objects.filter(id='volume-full').update(is_active=False)
+
+        response = self.book([
+            {'service_id': 'volume-full'}, {'service_id': 'mega-volume'},
+            {'service_id': 'classic-natural'},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(str(response.data['detail']), 'Service not found: mega-volume, volume-full')
+
+        response = self.book([
+            {'service_id': 'classic-natural', 'add_on_ids': ['glitter', 'colored-tips']},
+            {'service_id': 'classic-natural', 'add_on_ids': ['bottom-lashes']},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(str(response.data['detail']), 'Add-on not found: bottom-lashes, glitter')
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_create_query_count_is_constant_in_client_count(self):
+        schedule_snapshot.get()
+        catalog_snapshot.get()
+        # The first booking of a date also inserts its lock row
+        BookingDateLock.objects.create(date=SATURDAY)
+
+        def count_queries(client_count, appointment_time, email):
+            serializer = AppointmentCreateSerializer(data={
+                'first_name': 'Rudo', 'last_name': 'Chari', 'email': email,
+                'phone': '0771234567', 'location': 'Harare',
+                'appointment_date': SATURDAY.isoformat(), 'appointment_time': appointment_time,
+                'clients': [
+                    {'service_id': 'classic-natural', 'add_on_ids': ['colored-tips', 'lash-removal']}
+                ] * client_count,
+            })
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as queries:
+                serializer.save()
+            return len(queries)
+
+        # 135 minutes per client: 09:30-11:45, then 11:45-18:00 closes the day
+        self.assertEqual(
+            count_queries(1, '09:30', 'one@example.com'),
+            count_queries(2, '11:45', 'two@example.com')
+        )
+
+
+class IdempotencyKeyTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+
+    def book(self, key=None, appointment_time='10:15'):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key is not None else {}
+        return self.client.post('/api/appointments/', {
+            'first_name': 'Tariro', 'last_name': 'Moyo',
+            'email': 'tariro@example.com', 'phone': '0771234567', 'location': 'Harare',
+            'appointment_date': SATURDAY.isoformat(), 'appointment_time': appointment_time,
+            'clients': [{'service_id': 'classic-natural'}],
+        }, format='json', **headers)
+
+    def test_retry_replays_original_response(self):
+        first = self.book('retry-1')
+        second = self.book('retry-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Appointment.objects.count(), 1)
+        # Emails are queued once, by the original request only
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_different_keys_and_no_key_book_separately(self):
+        self.assertEqual(self.book('first', '09:30').status_code, 201)
+        self.assertEqual(self.book('second', '11:00').status_code, 201)
+        self.assertEqual(self.book(appointment_time='12:30').status_code, 201)
+        self.assertEqual(Appointment.objects.count(), 3)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.book('reused')
+        response = self.book('reused', '14:00')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_failed_request_releases_its_key(self):
+        blocking = self.create_appointment(SATURDAY, time(10, 0))
+
+        self.assertEqual(self.book('after-failure').status_code, 409)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        blocking.status = AppointmentStatus.CANCELLED
+        blocking.save()
+        self.assertEqual(self.book('after-failure').status_code, 201)
+
+    def test_expired_keys_are_reusable_and_purged(self):
+        self.book('expiring')
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Deleted 1', out.getvalue())
+
+        self.assertEqual(self.book('expiring', '14:00').status_code, 201)
+        self.assertEqual(Appointment.objects.count(), 2)
+
+    def test_duplicate_waits_for_request_in_flight(self):
+        original = self.book('in-flight')
+        # Put the key back in flight, as if the original were still running
+        IdempotencyKey.objects.update(status_code=None, response_body='')
+
+        def original_finishes(seconds):
+            IdempotencyService.complete('in-flight', 201, original.data)
+
+        with patch('bookings.services.sleep', side_effect=original_finishes) as sleep:
+            duplicate = self.book('in-flight')
+
+        sleep.assert_called_once()
+        self.assertEqual(duplicate.status_code, 201)
+        self.assertEqual(duplicate.content, original.content)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_duplicate_gives_up_after_waiting(self):
+        IdempotencyKey.objects.create(
+            key='stuck', expires_at=timezone.now() + timedelta(minutes=1),
+            request_fingerprint=IdempotencyService.fingerprint({
+                'first_name': 'Tariro', 'last_name': 'Moyo',
+                'email': 'tariro@example.com', 'phone': '0771234567', 'location': 'Harare',
+                'appointment_date': SATURDAY.isoformat(), 'appointment_time': '10:15',
+                'clients': [{'service_id': 'classic-natural'}],
+            })
+        )
+
+        with patch.object(IdempotencyConfig, 'WAIT_SECONDS', 0):
+            response = self.book('stuck')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_invalid_key_is_rejected(self):
+        self.assertEqual(self.book('   ').status_code, 400)
+        self.assertEqual(self.book('k' * 256).status_code, 400)
+
+
+class QuoteTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+        AddOn.objects.create(
+            id='bottom-lashes', name='Bottom Lashes', description='Bottom',
+            duration=20, price=Decimal('10.10')
+        )
+
+    def quote(self, clients, needs_transport=False):
+        return self.client.post('/api/appointments/quote/', {
+            'clients': clients, 'needs_transport': needs_transport,
+        }, format='json')
+
+    def test_quote_totals_are_exact(self):
+        response = self.quote([
+            {'service_id': 'classic-natural', 'add_on_ids': ['bottom-lashes', 'bottom-lashes']},
+            {'service_id': 'volume-full', 'add_on_ids': ['bottom-lashes', 'colored-tips']},
+        ], needs_transport=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_duration'], 90 + 20 + 150 + 20 + 15)
+        self.assertEqual(
+            [(client['add_on_ids'], client['price']) for client in response.data['clients']],
+            [(['bottom-lashes'], '130.10'), (['bottom-lashes', 'colored-tips'], '255.10')]
+        )
+        self.assertEqual(response.data['subtotal'], '385.20')
+        self.assertEqual(response.data['transport_fee'], '2.00')
+        self.assertEqual(response.data['total_price'], '387.20')
+
+    def test_quote_matches_booked_appointment(self):
+        clients = [
+            {'service_id': 'classic-natural', 'add_on_ids': ['bottom-lashes']},
+            {'service_id': 'classic-natural', 'add_on_ids': ['bottom-lashes', 'lash-removal']},
+        ]
+        quote = self.quote(clients, needs_transport=True)
+
+        booking = self.client.post('/api/appointments/', {
+            'first_name': 'Tariro', 'last_name': 'Moyo',
+            'email': 'tariro@example.com', 'phone': '0771234567', 'location': 'Harare',
+            'needs_transport': True, 'appointment_date': SATURDAY.isoformat(),
+            'appointment_time': '09:30', 'clients': clients,
+        }, format='json')
+
+        self.assertEqual(booking.status_code, 201)
+        appointment = Appointment.objects.get()
+        self.assertEqual(appointment.total_price, Decimal(quote.data['total_price']))
+        self.assertEqual(appointment.total_duration, quote.data['total_duration'])
+
+    def test_quote_runs_no_queries_once_warm(self):
+        catalog_snapshot.get()
+
+        with self.assertNumQueries(0):
+            quote = AppointmentService.quote(['classic-natural'], [['colored-tips']], True)
+
+        self.assertEqual(quote['total_price'], Decimal('147.00'))
+
+    def test_catalog_changes_invalidate_snapshot(self):
+        self.assertEqual(AppointmentService.quote(['classic-natural'], [[]])['total_price'], Decimal('120.00'))
+
+        self.classic.price = Decimal('125.50')
+        self.classic.save()
+        self.assertEqual(AppointmentService.quote(['classic-natural'], [[]])['total_price'], Decimal('125.50'))
+
+        self.tips.is_active = False
+        self.tips.save()
+        response = self.quote([{'service_id': 'classic-natural', 'add_on_ids': ['colored-tips']}])
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_quote_requests_are_rejected(self):
+        self.assertEqual(self.quote([]).status_code, 400)
+        self.assertEqual(self.quote([{'add_on_ids': []}]).status_code, 400)
+        self.assertEqual(self.quote([{'service_id': 'unknown'}]).status_code, 404)
+
+
+class ImportAppointmentsTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+
+    def run_import(self, content, suffix, *args):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / f'bookings{suffix}'
+        path.write_text(content)
+
+        out = StringIO()
+        call_command('import_appointments', str(path), '--chunk-size', '2', *args, stdout=out)
+        rejects = Path(f'{path}.rejects.{suffix.lstrip(".")}')
+        return out.getvalue(), rejects.read_text()
+
+    def test_csv_import_validates_dedupes_and_rejects(self):
+        existing = self.create_appointment(SATURDAY, time(14, 0), duration=90)
+        content = (
+            'first_name,last_name,email,phone,location,appointment_date,appointment_time,clients,needs_transport\n'
+            'Rudo,Chari,rudo@example.com,0771,Harare,2030-06-01,09:30,classic-natural+colored-tips,true\n'
+            'Rudo,Chari,rudo@example.com,0771,Harare,2030-06-01,10:30,classic-natural,\n'
+            'Tendai,Moyo,tendai@example.com,0772,Harare,2030-06-04,18:00,classic-natural;volume-full,\n'
+            'Nyasha,Dube,nyasha@example.com,0773,Harare,2030-06-01,14:30,classic-natural,\n'
+            'Chipo,Ndlovu,chipo@example.com,0774,Harare,2030-06-03,18:00,mega-volume,\n'
+            'Farai,Banda,not-an-email,0775,Harare,2030-06-02,10:00,classic-natural,\n'
+        )
+        out, rejects = self.run_import(content, '.csv')
+
+        self.assertIn('Imported 2 of 6 rows', out)
+        rejected = list(csv.DictReader(StringIO(rejects)))
+        self.assertEqual(
+            [(row['line'], row['email']) for row in rejected],
+            [('3', 'rudo@example.com'), ('5', 'nyasha@example.com'),
+             ('6', 'chipo@example.com'), ('7', 'not-an-email')]
+        )
+        # 10:30 overlaps the 09:30 booking imported from the same file
+        self.assertEqual(rejected[0]['error'], 'Time slot already booked')
+        self.assertEqual(rejected[1]['error'], 'Time slot already booked')
+        self.assertEqual(rejected[2]['error'], 'Service not found: mega-volume')
+        self.assertIn('email', rejected[3]['error'])
+
+        imported = Appointment.objects.exclude(pk=existing.pk).order_by('appointment_time')
+        self.assertEqual(
+            [(a.customer.email, a.total_duration, a.total_price, a.appointment_end_time) for a in imported],
+            [('rudo@example.com', 105, Decimal('147.00'), time(11, 15)),
+             ('tendai@example.com', 240, Decimal('340.00'), time(22, 0))]
+        )
+        self.assertEqual(Customer.objects.filter(email='rudo@example.com').count(), 1)
+        self.assertEqual(imported[1].clients.count(), 2)
+        self.assertEqual(imported[0].clients.get().add_ons.get(), self.tips)
+        self.assertEqual(
+            SlotReservation.objects.filter(appointment__in=imported).count(), 7 + 16
+        )
+
+    def test_off_grid_rows_sharing_a_cell_are_rejected(self):
+        # 14:05 for 90 minutes ends at 15:35, inside the 15:30 cell
+        self.create_appointment(SATURDAY, time(14, 5), duration=90)
+        header = 'first_name,last_name,email,phone,location,appointment_date,appointment_time,clients\n'
+        rows = [
+            'Rudo,Chari,rudo@example.com,0771,Harare,2030-06-01,09:40,classic-natural\n',
+            # Starts as 09:40 ends, but both round into the 11:00 cell
+            'Tendai,Moyo,tendai@example.com,0772,Harare,2030-06-01,11:10,classic-natural\n',
+            'Nyasha,Dube,nyasha@example.com,0773,Harare,2030-06-01,15:35,classic-natural\n',
+            'Chipo,Ndlovu,chipo@example.com,0774,Harare,2030-06-01,11:15,classic-natural\n',
+        ]
+
+        out, rejects = self.run_import(header + ''.join(rows), '.csv')
+
+        self.assertIn('Imported 2 of 4 rows', out)
+        rejected = list(csv.DictReader(StringIO(rejects)))
+        self.assertEqual(
+            [(row['email'], row['error']) for row in rejected],
+            [('tendai@example.com', 'Time slot already booked'),
+             ('nyasha@example.com', 'Time slot already booked')]
+        )
+        self.assertEqual(
+            sorted(Appointment.objects.filter(customer__email__in=['rudo@example.com', 'chipo@example.com'])
+                   .values_list('appointment_time', flat=True)),
+            [time(9, 40), time(11, 15)]
+        )
+
+    def test_jsonl_import_reuses_existing_customers(self):
+        customer = Customer.objects.create(
+            first_name='Rudo', last_name='Chari', email='rudo@example.com', phone='0771'
+        )
+        booking = {
+            'first_name': 'Rudo', 'last_name': 'Chari', 'email': 'rudo@example.com',
+            'phone': '0771', 'location': 'Harare', 'appointment_date': '2030-06-03',
+            'appointment_time': '18:00', 'clients': [{'service_id': 'classic-natural'}],
+        }
+        content = json.dumps(booking) + '\n{not json\n'
+
+        out, rejects = self.run_import(content, '.jsonl')
+
+        self.assertIn('Imported 1 of 2 rows', out)
+        self.assertEqual(customer.appointments.get().status, AppointmentStatus.CONFIRMED)
+        self.assertEqual(json.loads(rejects)['line'], 2)
+
+    def test_import_invalidates_cached_availability(self):
+        self.assertTrue(AvailabilityService.get_available_slots(MONDAY)[0]['available'])
+
+        self.run_import(
+            'first_name,last_name,email,phone,location,appointment_date,appointment_time,clients\n'
+            'Rudo,Chari,rudo@example.com,0771,Harare,2030-06-03,18:00,classic-natural\n',
+            '.csv'
+        )
+
+        self.assertFalse(AvailabilityService.get_available_slots(MONDAY)[0]['available'])
+
+    def test_dry_run_writes_nothing(self):
+        out, _ = self.run_import(
+            'first_name,last_name,email,phone,location,appointment_date,appointment_time,clients\n'
+            'Rudo,Chari,rudo@example.com,0771,Harare,2030-06-03,18:00,classic-natural\n',
+            '.csv', '--dry-run'
+        )
+
+        self.assertIn('Validated 1 of 1 rows', out)
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(Customer.objects.exists())
+
+
+class ConfirmationLookupTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+
+    def create_booking(self, client_count):
+        appointment = self.create_appointment(SATURDAY, time(9, 30), duration=105 * client_count)
+        for number in range(1, client_count + 1):
+            client = AppointmentClient.objects.create(
+                appointment=appointment, client_number=number, service=self.classic
+            )
+            client.add_ons.set([self.tips, self.removal])
+        return appointment
+
+    def lookup(self, code):
+        return self.client.get('/api/appointments/by_confirmation/', {'code': code})
+
+    def test_lookup_query_count_is_constant_in_client_count(self):
+        for client_count in (1, 4):
+            appointment = self.create_booking(client_count)
+            cache.clear()
+            # Appointment with customer, clients with services, add-ons
+            with self.assertNumQueries(3):
+                response = self.lookup(appointment.confirmation_code)
+            self.assertEqual(len(response.data['clients']), client_count)
+            self.assertEqual(response.data['clients'][0]['total_price'], Decimal('175.00'))
+            appointment.delete()
+
+    def test_repeat_lookups_are_served_from_cache(self):
+        appointment = self.create_booking(2)
+        first = self.lookup(appointment.confirmation_code)
+
+        with self.assertNumQueries(0):
+            second = self.lookup(appointment.confirmation_code)
+        self.assertEqual(second.data, first.data)
+
+    def test_changes_invalidate_cached_payload(self):
+        appointment = self.create_booking(1)
+        code = appointment.confirmation_code
+        self.lookup(code)
+
+        appointment.status = AppointmentStatus.CONFIRMED
+        appointment.save()
+        self.assertEqual(self.lookup(code).data['status'], AppointmentStatus.CONFIRMED)
+
+        client = appointment.clients.get()
+        client.add_ons.remove(self.removal)
+        self.assertEqual(len(self.lookup(code).data['clients'][0]['add_ons']), 1)
+
+        self.tips.appointment_clients.clear()
+        self.assertEqual(self.lookup(code).data['clients'][0]['add_ons'], [])
+
+        client.service = self.volume
+        client.save()
+        self.assertEqual(self.lookup(code).data['clients'][0]['service']['id'], 'volume-full')
+
+        self.volume.name = 'Mega Volume'
+        self.volume.save()
+        self.assertEqual(self.lookup(code).data['clients'][0]['service']['name'], 'Mega Volume')
+
+        customer = appointment.customer
+        customer.first_name = 'Rudo'
+        customer.save()
+        self.assertEqual(self.lookup(code).data['customer']['first_name'], 'Rudo')
+
+    def test_unknown_code_is_not_cached(self):
+        self.assertEqual(self.lookup('HLS-MISSING').status_code, 404)
+        self.assertEqual(self.lookup('').status_code, 400)
+
+
+class SlowEmailBackend(locmem.EmailBackend):
+    """In-memory backend that takes as long as a slow SMTP server"""
+    DELAY_SECONDS = 1
+
+    def send_messages(self, messages):
+        timer.sleep(self.DELAY_SECONDS)
+        return super().send_messages(messages)
+
+
+class FailingEmailBackend(locmem.EmailBackend):
+    """Backend whose SMTP server is down"""
+
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+class CountingEmailBackend(locmem.EmailBackend):
+    """In-memory backend that counts connections and can drop the next one mid-send"""
+    opened = 0
+    disconnect_next_send = False
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if CountingEmailBackend.disconnect_next_send:
+            CountingEmailBackend.disconnect_next_send = False
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='bookings.tests.CountingEmailBackend')
+class BatchEmailSenderTests(SimpleTestCase):
+
+    def setUp(self):
+        CountingEmailBackend.opened = 0
+        CountingEmailBackend.disconnect_next_send = False
+
+    def messages(self, count):
+        return [
+            mail.EmailMessage(f'Message {number}', 'Body', 'studio@example.com', [f'c{number}@example.com'])
+            for number in range(count)
+        ]
+
+    def test_reuses_connection_up_to_limit(self):
+        with BatchEmailSender(max_per_connection=2) as sender:
+            for message in self.messages(5):
+                sender.send(message)
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(CountingEmailBackend.opened, 3)
+        self.assertIsNone(sender.connection)
+
+    def test_reconnects_when_server_hangs_up(self):
+        messages = self.messages(3)
+        with BatchEmailSender() as sender:
+            sender.send(messages[0])
+            CountingEmailBackend.disconnect_next_send = True
+            sender.send(messages[1])
+            sender.send(messages[2])
+
+        self.assertEqual([message.subject for message in mail.outbox], ['Message 0', 'Message 1', 'Message 2'])
+        self.assertEqual(CountingEmailBackend.opened, 2)
+
+
+@override_settings(EMAIL_BACKEND='bookings.tests.SlowEmailBackend')
+class EmailOutboxTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+
+    def book(self, appointment_time='10:15'):
+        return self.client.post('/api/appointments/', {
+            'first_name': 'Tariro', 'last_name': 'Moyo',
+            'email': 'tariro@example.com', 'phone': '0771234567', 'location': 'Harare',
+            'appointment_date': SATURDAY.isoformat(), 'appointment_time': appointment_time,
+            'clients': [{'service_id': 'classic-natural', 'add_on_ids': ['colored-tips']}],
+        }, format='json')
+
+    def test_booking_does_not_wait_for_smtp(self):
+        started = timer.perf_counter()
+        response = self.book()
+        elapsed = timer.perf_counter() - started
+
+        self.assertEqual(response.status_code, 201)
+        self.assertLess(elapsed, SlowEmailBackend.DELAY_SECONDS)
+        self.assertEqual(mail.outbox, [])
+        emails = OutboundEmail.objects.order_by('kind')
+        self.assertEqual(
+            [(email.kind, email.to, email.status) for email in emails],
+            [('admin_notification', ['heavenlylashstudiozw@gmail.com'], EmailStatus.PENDING),
+             ('appointment_confirmation', ['tariro@example.com'], EmailStatus.PENDING)]
+        )
+
+        with override_settings(EMAIL_BACKEND='bookings.tests.CountingEmailBackend'):
+            CountingEmailBackend.opened = 0
+            call_command('run_email_worker', '--once', stdout=StringIO())
+
+        # Both emails went over one connection
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 2)
+        confirmation = next(message for message in mail.outbox if message.to == ['tariro@example.com'])
+        self.assertIn(response.data['confirmation_code'], confirmation.subject)
+        self.assertIn('Colored Tips', confirmation.body)
+        self.assertEqual(confirmation.alternatives[0].mimetype, 'text/html')
+        self.assertFalse(OutboundEmail.objects.exclude(status=EmailStatus.SENT).exists())
+
+    def test_emails_render_in_fixed_queries(self):
+        """Both emails for a 5-client booking come from one prefetched appointment"""
+        appointment = self.create_appointment(SATURDAY, time(9, 30), duration=5 * 105)
+        for number in range(1, 6):
+            client = AppointmentClient.objects.create(
+                appointment=appointment, client_number=number, service=self.classic
+            )
+            client.add_ons.set([self.tips, self.removal])
+        appointment = Appointment.objects.get(pk=appointment.pk)
+
+        # Customer, clients with services, add-ons, then one insert
+        with self.assertNumQueries(4):
+            emails = queue_booking_emails(appointment)
+
+        confirmation = next(email for email in emails if email.kind == 'appointment_confirmation')
+        self.assertEqual(confirmation.body.count('• Classic Natural'), 5)
+        self.assertEqual(confirmation.body.count('+ Colored Tips'), 5)
+        self.assertEqual(confirmation.html_body.count('<li>Colored Tips'), 5)
+        self.assertNotIn('{{', confirmation.body)
+
+    def test_rejected_booking_queues_no_email(self):
+        self.create_appointment(SATURDAY, time(9, 30), duration=150)
+
+        self.assertEqual(self.book('11:00').status_code, 409)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='bookings.tests.FailingEmailBackend')
+    def test_failures_back_off_then_dead_letter(self):
+        self.book()
+        delays = []
+
+        for attempt in range(1, EmailOutboxConfig.MAX_ATTEMPTS + 1):
+            started = timezone.now()
+            self.assertEqual(process_outbox()['sent'], 0)
+            email = OutboundEmail.objects.get(kind='appointment_confirmation')
+            self.assertEqual(email.attempts, attempt)
+            self.assertIn('SMTP server unavailable', email.last_error)
+            delays.append((email.next_attempt_at - started).total_seconds())
+
+            # Nothing is retried before its backoff has passed
+            self.assertEqual(sum(process_outbox().values()), 0)
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+
+        self.assertEqual(email.status, EmailStatus.DEAD)
+        self.assertEqual(OutboundEmail.objects.filter(status=EmailStatus.DEAD).count(), 2)
+        # Each retry waits at least twice as long as the one before, up to the cap
+        retry_delays = delays[:-1]
+        self.assertGreaterEqual(retry_delays[0], EmailOutboxConfig.BACKOFF_BASE_SECONDS)
+        for previous, current in zip(retry_delays, retry_delays[1:]):
+            self.assertGreater(current, previous * 1.5)
+        self.assertEqual(sum(process_outbox().values()), 0)
+
+    def test_dead_letters_can_be_retried(self):
+        self.book()
+        OutboundEmail.objects.update(status=EmailStatus.DEAD, attempts=EmailOutboxConfig.MAX_ATTEMPTS)
+
+        call_command('run_email_worker', '--once', '--retry-dead', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(OutboundEmail.objects.filter(status=EmailStatus.SENT, attempts=1).count(), 2)
+
+    def test_claimed_emails_are_leased(self):
+        """A second worker does not pick up emails another worker is sending"""
+        self.book()
+
+        with patch('bookings.email_service.deliver') as deliver:
+            process_outbox()
+            self.assertEqual(deliver.call_count, 2)
+            process_outbox()
+            self.assertEqual(deliver.call_count, 2)
+
+
+@override_settings(EMAIL_BACKEND='bookings.tests.CountingEmailBackend')
+class SendRemindersTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+
+    def setUp(self):
+        super().setUp()
+        CountingEmailBackend.opened = 0
+        # Friday 12:00, so a 24-hour window ends at Saturday 12:00
+        patcher = patch(
+            'django.utils.timezone.localtime',
+            return_value=timezone.make_aware(datetime.combine(SATURDAY - timedelta(days=1), time(12, 0)))
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_reminded_day(self):
+        """Five due appointments, plus ones the window or status exclude"""
+        due = [
+            self.create_appointment(SATURDAY, start, duration=30)
+            for start in (time(9, 0), time(9, 30), time(10, 0), time(10, 30), time(11, 0))
+        ]
+        client = AppointmentClient.objects.create(appointment=due[0], client_number=1, service=self.classic)
+        client.add_ons.set([self.tips])
+        self.create_appointment(SATURDAY, time(12, 30), duration=30)
+        self.create_appointment(SATURDAY, time(11, 30), duration=30, status=AppointmentStatus.CANCELLED)
+        self.create_appointment(SATURDAY - timedelta(days=1), time(11, 0), duration=30)
+        return due
+
+    def send(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('send_reminders', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_sends_due_reminders_in_batches(self):
+        due = self.create_reminded_day()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.send('--batch-size', '2')
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(a.customer.email for a in due))
+        self.assertIn('+ Colored Tips', next(m.body for m in mail.outbox if m.to == [due[0].customer.email]))
+        self.assertEqual(mail.outbox[0].alternatives[0].mimetype, 'text/html')
+        # One connection, one streamed read and one UPDATE per batch of two
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        sql = [query['sql'] for query in queries]
+        self.assertEqual(len([q for q in sql if 'FROM "bookings_appointment" INNER JOIN' in q]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE "bookings_appointment"')]), 3)
+        self.assertEqual(Appointment.objects.filter(reminder_sent_at__isnull=False).count(), 5)
+
+    def test_rerun_sends_nothing_twice(self):
+        self.create_reminded_day()
+        self.send()
+        mail.outbox = []
+
+        output, _ = self.send()
+
+        self.assertEqual(mail.outbox, [])
+        self.assertIn('Sent 0 reminders', output)
+
+    @override_settings(EMAIL_BACKEND='bookings.tests.FailingEmailBackend')
+    def test_failed_reminders_are_retried_next_run(self):
+        self.create_reminded_day()
+
+        output, errors = self.send()
+
+        self.assertIn('5 reminders failed', output)
+        self.assertIn('SMTP server unavailable', errors)
+        self.assertFalse(Appointment.objects.filter(reminder_sent_at__isnull=False).exists())
+
+
+class AppointmentReadQueryTests(BookingTestMixin, APITestCase):
+    """Appointment reads cost the same number of queries at any size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+        cls.customer = Customer.objects.create(
+            first_name='Rudo', last_name='Chari', email='rudo@example.com', phone='0771234567'
+        )
+
+    def create_appointments(self, count, clients_each=2):
+        """count appointments in bulk, each with clients_each clients and two add-ons apiece"""
+        existing = Appointment.objects.count()
+        appointments = Appointment.objects.bulk_create([
+            Appointment(
+                customer=self.customer,
+                appointment_date=SATURDAY + timedelta(days=7 * number),
+                appointment_time=time(9, 30), appointment_end_time=time(11, 0),
+                confirmation_code=f'HLS-R{existing + number:07d}', total_duration=90,
+                total_price=Decimal('120.00'),
+            )
+            for number in range(count)
+        ])
+        clients = AppointmentClient.objects.bulk_create([
+            AppointmentClient(appointment=appointment, client_number=number, service=self.classic)
+            for appointment in appointments
+            for number in range(1, clients_each + 1)
+        ])
+        ClientAddOn = AppointmentClient.add_ons.through
+        ClientAddOn.objects.bulk_create([
+            ClientAddOn(appointmentclient_id=client.id, addon_id=addon.id)
+            for client in clients
+            for addon in (self.tips, self.removal)
+        ])
+        return appointments
+
+    def test_list_is_one_query(self):
+        for count in (1, 10, 1000):
+            with self.subTest(appointments=count):
+                Appointment.objects.all().delete()
+                self.create_appointments(count)
+
+                with self.assertNumQueries(1):
+                    page = self.client.get('/api/appointments/').data['results']
+                with self.assertNumQueries(1):
+                    everything = self.client.get('/api/appointments/', {'paginate': 'false'}).data
+
+                self.assertEqual(len(page), min(count, PaginationConfig.PAGE_SIZE))
+                self.assertEqual(len(everything), count)
+                self.assertEqual(page[0]['client_count'], 2)
+                self.assertEqual(page[0]['customer_name'], 'Rudo Chari')
+
+    def test_detail_reads_are_three_queries(self):
+        for count in (1, 10, 1000):
+            with self.subTest(clients=min(count, 10), appointments=count):
+                Appointment.objects.all().delete()
+                appointment = self.create_appointments(count, clients_each=min(count, 10))[-1]
+                # The confirmation cache would hide the queries
+                cache.clear()
+
+                with self.assertNumQueries(3):
+                    detail = self.client.get(f'/api/appointments/{appointment.id}/')
+                with self.assertNumQueries(3):
+                    by_code = self.client.get(
+                        '/api/appointments/by_confirmation/', {'code': appointment.confirmation_code}
+                    )
+
+                self.assertEqual(detail.data, by_code.data)
+                self.assertEqual(len(detail.data['clients']), min(count, 10))
+                # Classic Natural, Colored Tips and Removal
+                self.assertEqual(detail.data['clients'][0]['total_duration'], 90 + 15 + 30)
+
+    def test_update_query_count_is_constant(self):
+        def count_queries(clients_each):
+            appointment = self.create_appointments(1, clients_each=clients_each)[0]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.patch(
+                    f'/api/appointments/{appointment.id}/', {'notes': 'Gate code 1234'}, format='json'
+                )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['clients']), clients_each)
+            return len(queries)
+
+        self.assertEqual(count_queries(1), count_queries(10))
+
+
+class CursorPaginationTests(BookingTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        customer = Customer.objects.create(
+            first_name='Rudo', last_name='Chari', email='rudo@example.com', phone='0771234567'
+        )
+        # Ties on date and on date and time, so only the id tells some apart
+        cls.appointments = Appointment.objects.bulk_create([
+            Appointment(
+                customer=customer, appointment_date=SATURDAY + timedelta(days=number // 6),
+                appointment_time=time(9 + number % 3, 0), appointment_end_time=time(12, 0),
+                confirmation_code=f'HLS-P{number:07d}', total_duration=60, total_price=Decimal('100.00'),
+            )
+            for number in range(30)
+        ])
+        Customer.objects.bulk_create([
+            Customer(first_name='Client', last_name=str(number), email=f'c{number}@example.com', phone='077')
+            for number in range(11)
+        ])
+
+    def walk(self, url, direction='next'):
+        """Follow links until the end; returns the ids of every page, in order"""
+        pages = []
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            link = response.data[direction]
+            if link is None:
+                return pages, response
+            response = self.client.get(link)
+
+    def test_appointment_pages_follow_model_ordering(self):
+        expected = list(
+            Appointment.objects.order_by('-appointment_date', '-appointment_time', 'id').values_list('id', flat=True)
+        )
+
+        pages, last = self.walk('/api/appointments/?page_size=4')
+
+        self.assertEqual([len(page) for page in pages], [4] * 7 + [2])
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+        # And back again from the last page
+        back, _ = self.walk(last.data['previous'], direction='previous')
+        self.assertEqual([pk for page in reversed(back) for pk in page], expected[:-2])
+
+    def test_customer_pages_follow_model_ordering(self):
+        expected = list(Customer.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+
+        pages, _ = self.walk('/api/customers/?page_size=4')
+
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertIsNone(self.client.get('/api/customers/').data['previous'])
+
+    def test_deep_page_is_one_keyset_query(self):
+        response = self.client.get('/api/appointments/', {'page_size': 4})
+        for _ in range(5):
+            response = self.client.get(response.data['next'])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data['next'])
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_unpaginated_opt_in_keeps_bare_list(self):
+        response = self.client.get('/api/customers/', {'paginate': 'false'})
+
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 12)
+
+    def test_tampered_cursor_is_not_found(self):
+        for cursor in ('not-base64!', 'cD1ub3QtanNvbg==', 'cD0lNUIlMjJ4JTIyJTJDMSUyQzIlNUQ='):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/appointments/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class FastReadPathTests(BookingTestMixin, APITestCase):
+    """values() list endpoints and the orjson renderer/parser match the stdlib bytes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+        # Odd prices, non-ASCII text and the JavaScript line separators
+        Service.objects.create(
+            id='hybrid-wispy', name='Hybrid Wispy \u2028 Caf\u00e9 \u2728', description='Line\u2029break',
+            duration=120, price=Decimal('7.5'), category='hybrid'
+        )
+        AddOn.objects.create(
+            id='under-lashes', name='Under \u201cLashes\u201d', description='',
+            duration=10, price=Decimal('0')
+        )
+        AddOn.objects.create(
+            id='retired', name='Retired', description='', duration=10, price=Decimal('1.00'), is_active=False
+        )
+
+    def assert_same_bytes(self, url, serializer_class, queryset):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        self.assertEqual(response.content, expected)
+        return response
+
+    def test_services_match_model_serializer(self):
+        response = self.assert_same_bytes(
+            '/api/services/', ServiceSerializer, Service.objects.filter(is_active=True)
+        )
+        self.assertIn(b'"price":"7.50"', response.content)
+        self.assertIn(b'\\u2028', response.content)
+
+    def test_addons_match_model_serializer(self):
+        response = self.assert_same_bytes(
+            '/api/addons/', AddOnSerializer, AddOn.objects.filter(is_active=True)
+        )
+        self.assertNotIn(b'retired', response.content)
+
+    def test_business_hours_match_model_serializer(self):
+        response = self.assert_same_bytes(
+            '/api/business-hours/', BusinessHoursSerializer, BusinessHours.objects.all()
+        )
+        self.assertIn(b'"weekday_display":"Saturday"', response.content)
+        self.assertIn(b'"open_time":null', response.content)
+
+    def test_list_is_one_query_after_its_validator(self):
+        # The conditional GET validator, then the rows
+        with self.assertNumQueries(2):
+            self.client.get('/api/business-hours/')
+
+    def test_available_slots_match_json_renderer(self):
+        response = self.client.get('/api/appointments/available_slots/', {'date': SATURDAY.isoformat()})
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_renderer_matches_json_renderer(self):
+        data = ReturnDict({
+            'price': Decimal('12.50'),
+            'at': datetime(2030, 6, 1, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'day': SATURDAY,
+            'time': time(9, 30, 0, 250000),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'label': gettext_lazy('Saturday'),
+            'text': 'caf\u00e9 \u2028 \u2029 </script>',
+            'nested': [{'ok': True, 'n': None, 'f': 1.5}],
+            'codes': ('A', 'B'),
+        }, serializer=None)
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), JSONRenderer().render(None))
+
+    def test_renderer_falls_back_for_indent_and_large_integers(self):
+        data = {'big': 2 ** 70, 'name': 'x'}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        indented = ORJSONRenderer().render(data, 'application/json; indent=2')
+        self.assertEqual(indented, JSONRenderer().render(data, 'application/json; indent=2'))
+
+    def test_parser_matches_json_parser(self):
+        body = '{"name": "caf\u00e9", "clients": [{"service_id": "classic-natural"}], "n": 1.5}'.encode()
+        self.assertEqual(ORJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        for bad in (b'', b'{"a": ', b'{"a": NaN}'):
+            with self.assertRaises(ParseError) as expected:
+                JSONParser().parse(BytesIO(bad))
+            with self.assertRaises(ParseError) as actual:
+                ORJSONParser().parse(BytesIO(bad))
+            self.assertEqual(str(actual.exception.detail), str(expected.exception.detail))
+
+    def test_values_serializer_rejects_computed_fields(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(CustomerSerializer).plan
+
+
+class CatalogEndpointTests(BookingTestMixin, APITestCase):
+    """GET /api/catalog/: one document, a strong ETag and 304s without queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+        cls.blocked = BlockedDate.objects.create(date=MONDAY, reason='Training')
+
+    def get_catalog(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/catalog/', **headers)
+
+    def test_document_matches_list_endpoints(self):
+        response = self.get_catalog()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        document = response.json()
+        self.assertEqual(document['services'], self.client.get('/api/services/').json())
+        self.assertEqual(document['addons'], self.client.get('/api/addons/').json())
+        self.assertEqual(document['business_hours'], self.client.get('/api/business-hours/').json())
+        self.assertEqual(document['blocked_dates'], self.client.get('/api/blocked-dates/').json())
+
+    def test_headers(self):
+        response = self.get_catalog()
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]{32}"$')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=300', response['Cache-Control'])
+
+    @override_settings(CATALOG_MAX_AGE=30)
+    def test_max_age_setting(self):
+        self.assertIn('max-age=30', self.get_catalog()['Cache-Control'])
+
+    def test_if_none_match_is_304_without_queries(self):
+        etag = self.get_catalog()['ETag']
+        with self.assertNumQueries(0):
+            response = self.get_catalog(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_warm_document_runs_no_queries(self):
+        first = self.get_catalog()
+        with self.assertNumQueries(0):
+            second = self.get_catalog()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self.get_catalog('"stale", ' + first['ETag']).status_code, 304)
+        self.assertEqual(self.get_catalog('*').status_code, 304)
+        self.assertEqual(self.get_catalog('"stale"').status_code, 200)
+
+    def test_etag_changes_on_every_catalog_model(self):
+        def rename_service():
+            service = Service.objects.get(pk=self.classic.pk)
+            service.name = 'Classic Natural Set'
+            service.save()
+
+        def close_early():
+            hours = BusinessHours.objects.get(weekday=5)
+            hours.close_time = time(17, 0)
+            hours.save()
+
+        edits = [
+            rename_service,
+            lambda: AddOn.objects.get(pk=self.tips.pk).delete(),
+            close_early,
+            lambda: BlockedDate.objects.create(date=SATURDAY, reason='Holiday'),
+            lambda: BlockedDate.objects.get(pk=self.blocked.pk).delete(),
+        ]
+        etag = self.get_catalog()['ETag']
+        for edit in edits:
+            edit()
+            response = self.get_catalog(etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+    def test_unchanged_content_keeps_its_etag(self):
+        etag = self.get_catalog()['ETag']
+        # A save that changes nothing visible renders the same bytes
+        Service.objects.get(pk=self.classic.pk).save()
+        self.assertEqual(self.get_catalog(etag).status_code, 304)
+
+
+class ConditionalGetTests(BookingTestMixin, APITestCase):
+    """ETag/Last-Modified on the read-only viewsets and the confirmation lookup"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_business_hours()
+        cls.create_catalog()
+        cls.blocked = BlockedDate.objects.create(date=MONDAY, reason='Training')
+
+    def revalidate(self, url, response):
+        headers = {'HTTP_IF_NONE_MATCH': response['ETag']}
+        if response.has_header('Last-Modified'):
+            headers['HTTP_IF_MODIFIED_SINCE'] = response['Last-Modified']
+        return self.client.get(url, **headers)
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        # The validator query only: nothing is loaded or serialized
+        with self.assertNumQueries(1):
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        return response
+
+    def test_lists_revalidate(self):
+        for url in ('/api/services/', '/api/addons/', '/api/business-hours/', '/api/blocked-dates/'):
+            with self.subTest(url=url):
+                response = self.assert_revalidates(url)
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_details_revalidate(self):
+        hours = BusinessHours.objects.get(weekday=5)
+        for url in (
+            f'/api/services/{self.classic.pk}/', f'/api/addons/{self.tips.pk}/',
+            f'/api/business-hours/{hours.pk}/', f'/api/blocked-dates/{self.blocked.pk}/',
+        ):
+            with self.subTest(url=url):
+                response = self.assert_revalidates(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_if_modified_since_alone(self):
+        url = f'/api/services/{self.classic.pk}/'
+        response = self.client.get(url)
+        not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_missing_detail_is_404(self):
+        self.assertEqual(self.client.get('/api/services/no-such-service/').status_code, 404)
+
+    def test_list_changes_on_edit_delete_and_create(self):
+        def rename_service():
+            service = Service.objects.get(pk=self.classic.pk)
+            service.name = 'Classic Natural Set'
+            service.save()
+
+        def deactivate_addon():
+            addon = AddOn.objects.get(pk=self.tips.pk)
+            addon.is_active = False
+            addon.save()
+
+        def close_early():
+            hours = BusinessHours.objects.get(weekday=5)
+            hours.close_time = time(17, 0)
+            hours.save()
+
+        def rename_blocked_date():
+            blocked = BlockedDate.objects.get(pk=self.blocked.pk)
+            blocked.reason = 'Conference'
+            blocked.save()
+
+        edits = [
+            ('/api/services/', rename_service),
+            ('/api/services/', lambda: Service.objects.get(pk=self.volume.pk).delete()),
+            ('/api/addons/', deactivate_addon),
+            ('/api/business-hours/', close_early),
+            ('/api/blocked-dates/', rename_blocked_date),
+            ('/api/blocked-dates/', lambda: BlockedDate.objects.create(date=SATURDAY)),
+        ]
+        for url, edit in edits:
+            response = self.client.get(url)
+            edit()
+            changed = self.revalidate(url, response)
+            self.assertEqual(changed.status_code, 200, url)
+            self.assertNotEqual(changed['ETag'], response['ETag'])
+            self.assertEqual(changed.content, JSONRenderer().render(changed.data))
+
+    def test_detail_changes_on_edit(self):
+        url = f'/api/blocked-dates/{self.blocked.pk}/'
+        response = self.client.get(url)
+        # Past the one-second resolution of If-Modified-Since
+        with patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=5)):
+            blocked = BlockedDate.objects.get(pk=self.blocked.pk)
+            blocked.reason = 'Conference'
+            blocked.save()
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['reason'], 'Conference')
+
+    def test_confirmation_revalidates_without_queries(self):
+        appointment = self.create_appointment(SATURDAY, time(9, 30))
+        AppointmentClient.objects.create(appointment=appointment, client_number=1, service=self.classic)
+        url = f'/api/appointments/by_confirmation/?code={appointment.confirmation_code}'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]{32}"$')
+        self.assertIn('private', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, 304)
+
+        # A catalog edit changes the embedded service, so the page changes
+        service = Service.objects.get(pk=self.classic.pk)
+        service.name = 'Classic Natural Set'
+        service.save()
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['clients'][0]['service']['name'], 'Classic Natural Set')
+
+    def test_unknown_confirmation_is_404(self):
+        response = self.client.get('/api/appointments/by_confirmation/?code=HLS-NOPE', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+
+class ConcurrentBookingTests(BookingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_business_hours()
+        self.create_catalog()
+        schedule_snapshot.invalidate()
+
+    def test_parallel_bookings_for_one_slot_have_one_winner(self):
+        out = StringIO()
+        call_command('stress_booking', '--threads', '8', '--rounds', '3', '--keep', stdout=out)
+
+        self.assertIn('Exactly one booking won every round', out.getvalue())
+        self.assertIn('attempts/s', out.getvalue())
+        # Losing bookings leave nothing behind, not even their customer
+        self.assertEqual(Appointment.objects.count(), 3)
+        self.assertEqual(Customer.objects.count(), 3)
+        self.assertEqual(
+            sorted(Appointment.objects.values_list('appointment_date', flat=True).distinct()),
+            sorted(Appointment.objects.values_list('appointment_date', flat=True))
+        )
+
+    def test_lock_conflicts_are_retried_outside_transactions(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'booked'
+
+        self.assertEqual(AppointmentService.run_booking_transaction(SATURDAY, flaky), 'booked')
+        self.assertEqual(len(calls), 3)
+
+        # Only the outermost transaction can be retried
+        calls.clear()
+        with transaction.atomic(), self.assertRaises(OperationalError):
+            AppointmentService.run_booking_transaction(SATURDAY, flaky)
+        self.assertEqual(len(calls), 1)
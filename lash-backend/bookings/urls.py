@@ -5,7 +5,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from bookings.views import (
     ServiceViewSet, AddOnViewSet, AppointmentViewSet,
-    CustomerViewSet, BusinessHoursViewSet, BlockedDateViewSet
+    CustomerViewSet, BusinessHoursViewSet, BlockedDateViewSet, CatalogView
 )
 
 app_name = 'bookings'
@@ -19,5 +19,6 @@ router.register(r'business-hours', BusinessHoursViewSet, basename='business-hour
 router.register(r'blocked-dates', BlockedDateViewSet, basename='blocked-dates')
 
 urlpatterns = [
+    path('catalog/', CatalogView.as_view(), name='catalog'),
     path('', include(router.urls)),
 ]
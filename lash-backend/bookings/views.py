@@ -1,7 +1,15 @@
+import hashlib
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from datetime import datetime, timedelta, time
 from bookings.models import (
     Service, AddOn, Customer, Appointment, 
@@ -11,20 +19,122 @@ from bookings.serializers import (
     ServiceSerializer, AddOnSerializer, CustomerSerializer,
     AppointmentDetailSerializer, AppointmentListSerializer,
     AppointmentCreateSerializer, BusinessHoursSerializer,
-    BlockedDateSerializer
+    BlockedDateSerializer, QuoteRequestSerializer, QuoteSerializer,
+    ValuesSerializer
+)
+from bookings.cache import CatalogCache, ConfirmationCache
+from bookings.pagination import AppointmentCursorPagination, CustomerCursorPagination
+from bookings.renderers import ORJSONRenderer
+from bookings.services import (
+    AvailabilityService, AppointmentService, IdempotencyService,
+    catalog_snapshot, schedule_snapshot
 )
-from bookings.services import AvailabilityService, AppointmentService
-from bookings.email_service import send_appointment_confirmation, send_admin_notification
 from bookings.exceptions import (
     AppointmentNotFoundException,
     MissingRequiredParameterException,
     InvalidDateFormatException,
+    BatchTooLargeException,
+    InvalidAddOnListsException,
     BookingBaseException
 )
-from bookings.constants import ValidationMessages
+from bookings.constants import IdempotencyConfig, TimeSlotConfig, ValidationMessages
+
+
+def _split_ids(value):
+    """Split a comma-separated query parameter into a list of IDs"""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def content_etag(data):
+    """Strong ETag for response data: a hash of its rendered bytes"""
+    return f'"{hashlib.sha256(ORJSONRenderer().render(data)).hexdigest()[:32]}"'
+
+
+def conditional_response(request, etag, last_modified=None):
+    """304 (or 412) for a request whose validators still match, else None"""
+    return get_conditional_response(
+        request, etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None
+    )
+
+
+def set_validators(response, etag, last_modified=None, private=False):
+    """Attach validators; no-cache makes clients revalidate instead of guessing freshness"""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, no_cache=True)
+    if private:
+        patch_cache_control(response, private=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET for list() and retrieve(). A validator is read with
+    one small query and a matching If-None-Match (or If-Modified-Since,
+    on detail routes) is answered with 304 before anything is serialized.
+    
+    list: count and max(updated_at) of the filtered queryset, as a weak
+    ETag. The count catches deletes; Last-Modified is not sent because a
+    delete does not move max(updated_at).
+    retrieve: the row's updated_at, as a weak ETag and Last-Modified.
+    """
+    
+    validator_field = 'updated_at'
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        validator = queryset.aggregate(count=Count('pk'), last_modified=Max(self.validator_field))
+        last_modified = validator['last_modified']
+        etag = f'W/"{validator["count"]}-{last_modified.timestamp() if last_modified else 0}"'
+        
+        response = conditional_response(request, etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag)
+    
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        last_modified = (
+            self.filter_queryset(self.get_queryset())
+            .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+            .values_list(self.validator_field, flat=True)
+            .first()
+        )
+        if last_modified is None:
+            # Missing rows (and bad lookups) get retrieve()'s usual response
+            return super().retrieve(request, *args, **kwargs)
+        
+        etag = f'W/"{last_modified.timestamp()}"'
+        response = conditional_response(request, etag, last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
 
 
-class ServiceViewSet(viewsets.ReadOnlyModelViewSet):
+class ValuesListMixin:
+    """
+    Serve list() from values() rows (see ValuesSerializer) instead of
+    building model instances for serializer_class. For small, unpaginated
+    catalogs read on every page load.
+    """
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.values_serializer().serialize(queryset))
+    
+    @classmethod
+    def values_serializer(cls):
+        # One plan per viewset class, built on first use
+        if '_values_serializer' not in cls.__dict__:
+            cls._values_serializer = ValuesSerializer(cls.serializer_class)
+        return cls._values_serializer
+
+
+class ServiceViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for retrieving services.
     GET /api/services/ - List all active services
@@ -34,7 +144,7 @@ class ServiceViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ServiceSerializer
 
 
-class AddOnViewSet(viewsets.ReadOnlyModelViewSet):
+class AddOnViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for retrieving add-ons.
     GET /api/addons/ - List all active add-ons
@@ -47,16 +157,30 @@ class AddOnViewSet(viewsets.ReadOnlyModelViewSet):
 class AppointmentViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing appointments.
-    GET /api/appointments/ - List all appointments
-    POST /api/appointments/ - Create new appointment
+    GET /api/appointments/ - List appointments, newest first, a cursor page at a time
+                             (?paginate=false for the whole list)
+    POST /api/appointments/ - Create new appointment (honours Idempotency-Key)
     GET /api/appointments/{id}/ - Get appointment details
     PUT/PATCH /api/appointments/{id}/ - Update appointment
     DELETE /api/appointments/{id}/ - Cancel appointment
     GET /api/appointments/by_confirmation/{code}/ - Get appointment by confirmation code
     POST /api/appointments/check_availability/ - Check time slot availability
+    POST /api/appointments/check_availability_batch/ - Check many time slots at once
+    POST /api/appointments/quote/ - Price a booking before making it
     GET /api/appointments/available_slots/ - Get available time slots for a date
+    GET /api/appointments/availability_calendar/ - Get availability for a date range
+    GET /api/appointments/next_available/ - Find the earliest times that fit a booking
     """
     queryset = Appointment.objects.all()
+    pagination_class = AppointmentCursorPagination
+    
+    def get_queryset(self):
+        # Each read loads what its serializer shows in a fixed number of queries
+        if self.action == 'list':
+            return AppointmentService.list_queryset()
+        if self.action in ('retrieve', 'update', 'partial_update'):
+            return AppointmentService.detail_queryset()
+        return super().get_queryset()
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -65,8 +189,49 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             return AppointmentListSerializer
         return AppointmentDetailSerializer
     
+    def update(self, request, *args, **kwargs):
+        """
+        Update an appointment's own fields. Customer and clients are read-only
+        here, so the prefetched clients stay current and are serialized as
+        loaded, where UpdateModelMixin would drop them and re-query per client.
+        """
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        return Response(serializer.data)
+    
     def create(self, request, *args, **kwargs):
-        """Create a new appointment with customer and clients"""
+        """
+        Create a new appointment with customer and clients.
+        With an Idempotency-Key header, a retry of a successful request
+        returns the original response without booking or emailing again.
+        """
+        key = request.headers.get(IdempotencyConfig.HEADER)
+        if key is None:
+            return self.create_appointment(request)
+        
+        key = IdempotencyService.validate_key(key)
+        record = IdempotencyService.claim(key, IdempotencyService.fingerprint(request.data))
+        if record is not None:
+            return Response(
+                IdempotencyService.replay_data(record),
+                status=record.status_code,
+                headers={'Idempotent-Replayed': 'true'}
+            )
+        
+        try:
+            response = self.create_appointment(request)
+        except Exception:
+            IdempotencyService.release(key)
+            raise
+        
+        IdempotencyService.complete(key, response.status_code, response.data)
+        return response
+    
+    def create_appointment(self, request):
+        """Booking path behind create()"""
         # Transform nested customer data to flat structure
         data = request.data.copy()
         
@@ -89,22 +254,9 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
+        # Confirmation emails are queued by the serializer and sent by run_email_worker
         appointment = serializer.save()
         
-        # Send confirmation email to customer
-        try:
-            send_appointment_confirmation(appointment)
-        except Exception as e:
-            # Log error but don't fail the booking
-            print(f'Failed to send confirmation email: {str(e)}')
-        
-        # Send notification email to admin
-        try:
-            send_admin_notification(appointment)
-        except Exception as e:
-            # Log error but don't fail the booking
-            print(f'Failed to send admin notification: {str(e)}')
-        
         # Return detailed appointment data
         response_serializer = AppointmentDetailSerializer(appointment)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -116,12 +268,18 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         if not code:
             raise MissingRequiredParameterException('code')
         
-        appointment = AppointmentService.get_by_confirmation_code(code)
-        if not appointment:
-            raise AppointmentNotFoundException()
+        def serialize():
+            appointment = AppointmentService.get_by_confirmation_code(code)
+            if not appointment:
+                raise AppointmentNotFoundException()
+            data = AppointmentDetailSerializer(appointment).data
+            return content_etag(data), data
         
-        serializer = AppointmentDetailSerializer(appointment)
-        return Response(serializer.data)
+        # Customers refresh this page; signals drop the entry when the booking
+        # changes, and a cached entry answers If-None-Match without queries
+        etag, data = ConfirmationCache.get_or_compute(code, serialize)
+        response = conditional_response(request, etag) or Response(data)
+        return set_validators(response, etag, private=True)
     
     @action(detail=False, methods=['post'])
     def check_availability(self, request):
@@ -143,6 +301,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         # Parse date and time using service layer
         appointment_date = AvailabilityService.parse_date(date_str)
         appointment_time = AvailabilityService.parse_time(time_str)
+        duration = AvailabilityService.parse_duration(duration)
         
         try:
             is_available, reason = AvailabilityService.check_availability(
@@ -157,11 +316,82 @@ class AppointmentViewSet(viewsets.ModelViewSet):
                 'reason': str(e.detail)
             })
     
+    @action(detail=False, methods=['post'])
+    def quote(self, request):
+        """
+        Price a booking before it is made.
+        POST body: {
+            "clients": [{"service_id": "classic-natural", "add_on_ids": ["colored-tips"]}, ...],
+            "needs_transport": true
+        }
+        Returns per-client and total duration and price, computed exactly
+        as the booking will be.
+        """
+        serializer = QuoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        clients = serializer.validated_data['clients']
+        
+        quote = AppointmentService.quote(
+            [client['service_id'] for client in clients],
+            [client.get('add_on_ids', []) for client in clients],
+            serializer.validated_data['needs_transport']
+        )
+        return Response(QuoteSerializer(quote).data)
+    
+    @action(detail=False, methods=['post'])
+    def check_availability_batch(self, request):
+        """
+        Check several date/time/duration candidates in one request.
+        POST body: {
+            "candidates": [
+                {"appointment_date": "2024-01-15", "appointment_time": "10:00", "duration": 120},
+                ...
+            ]
+        }
+        Returns {"results": [{"available": bool, "reason": str (if unavailable)}, ...]}
+        in the same order as the candidates.
+        """
+        candidates_data = request.data.get('candidates')
+        
+        if not candidates_data or not isinstance(candidates_data, list):
+            raise MissingRequiredParameterException('candidates')
+        
+        if len(candidates_data) > TimeSlotConfig.MAX_BATCH_CANDIDATES:
+            raise BatchTooLargeException(
+                f'No more than {TimeSlotConfig.MAX_BATCH_CANDIDATES} candidates per request'
+            )
+        
+        candidates = []
+        for candidate in candidates_data:
+            date_str = candidate.get('appointment_date') if isinstance(candidate, dict) else None
+            time_str = candidate.get('appointment_time') if isinstance(candidate, dict) else None
+            
+            if not date_str or not time_str:
+                raise MissingRequiredParameterException('appointment_date and appointment_time')
+            
+            candidates.append((
+                AvailabilityService.parse_date(date_str),
+                AvailabilityService.parse_time(time_str),
+                AvailabilityService.parse_duration(candidate.get('duration', 90)),
+            ))
+        
+        results = [
+            {'available': True} if is_available else {'available': False, 'reason': reason}
+            for is_available, reason in AvailabilityService.check_availability_batch(candidates)
+        ]
+        
+        return Response({'results': results})
+    
     @action(detail=False, methods=['get'])
     def available_slots(self, request):
         """
         Get available time slots for a specific date.
-        Query params: date (YYYY-MM-DD)
+        Query params:
+            date (YYYY-MM-DD)
+            service_ids (comma-separated, one per client) and add_on_ids
+            (comma-separated, repeated once per client in service_ids order),
+            or duration (minutes) - optional; when given, only slots where
+            the whole appointment fits are available
         """
         date_str = request.query_params.get('date')
         
@@ -170,24 +400,104 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         
         # Parse date using service layer
         target_date = AvailabilityService.parse_date(date_str)
+        duration = self._requested_duration(request)
         
         # Get slots using service layer
-        slots = AvailabilityService.get_available_slots(target_date)
+        slots = AvailabilityService.get_available_slots(target_date, duration)
         
         return Response({'slots': slots})
+    
+    @action(detail=False, methods=['get'])
+    def availability_calendar(self, request):
+        """
+        Get per-day availability for a date range in one request.
+        Query params:
+            start, end (YYYY-MM-DD, inclusive)
+            service_ids/add_on_ids or duration - optional, as for available_slots
+        """
+        start_str = request.query_params.get('start')
+        end_str = request.query_params.get('end')
+        
+        if not start_str or not end_str:
+            raise MissingRequiredParameterException('start and end')
+        
+        start_date = AvailabilityService.parse_date(start_str)
+        end_date = AvailabilityService.parse_date(end_str)
+        duration = self._requested_duration(request)
+        
+        days = AvailabilityService.get_availability_calendar(start_date, end_date, duration)
+        
+        return Response({'days': days})
+    
+    @action(detail=False, methods=['get'])
+    def next_available(self, request):
+        """
+        Find the earliest start times where a booking fits.
+        Query params:
+            service_ids (or service_id) and add_on_ids, or duration - required
+            from (YYYY-MM-DD) - optional, defaults to today
+            limit - optional, number of slots to return (default 1, max 20)
+        """
+        duration = self._requested_duration(request)
+        if duration is None:
+            raise MissingRequiredParameterException('service_ids or duration')
+        
+        today = timezone.localdate()
+        from_str = request.query_params.get('from')
+        from_date = AvailabilityService.parse_date(from_str) if from_str else today
+        from_date = max(from_date, today)
+        
+        try:
+            limit = int(request.query_params.get('limit', 1))
+        except ValueError:
+            limit = 1
+        limit = min(max(limit, 1), TimeSlotConfig.NEXT_AVAILABLE_MAX_LIMIT)
+        
+        slots, searched_until = AvailabilityService.find_next_available(from_date, duration, limit)
+        
+        return Response({
+            'duration': duration,
+            'slots': slots,
+            'searched_until': searched_until.isoformat(),
+        })
+    
+    @staticmethod
+    def _requested_duration(request):
+        """Resolve the appointment duration from service/add-on IDs or an explicit duration"""
+        service_ids = _split_ids(
+            request.query_params.get('service_ids') or request.query_params.get('service_id')
+        )
+        # One add_on_ids parameter per client, in service_ids order; clients
+        # past the last one take no add-ons
+        add_on_ids = [_split_ids(value) for value in request.query_params.getlist('add_on_ids')]
+        
+        if service_ids:
+            if len(add_on_ids) > len(service_ids):
+                raise InvalidAddOnListsException()
+            return AppointmentService.calculate_total_duration(
+                service_ids, add_on_ids + [[]] * (len(service_ids) - len(add_on_ids))
+            )
+        
+        duration = request.query_params.get('duration')
+        if duration is not None:
+            return AvailabilityService.parse_duration(duration)
+        
+        return None
 
 
 class CustomerViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for retrieving customer information.
-    GET /api/customers/ - List customers
+    GET /api/customers/ - List customers, newest first, a cursor page at a time
+                          (?paginate=false for the whole list)
     GET /api/customers/{id}/ - Get customer details
     """
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    pagination_class = CustomerCursorPagination
 
 
-class BusinessHoursViewSet(viewsets.ReadOnlyModelViewSet):
+class BusinessHoursViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for retrieving business hours.
     GET /api/business-hours/ - Get all business hours
@@ -196,7 +506,7 @@ class BusinessHoursViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = BusinessHoursSerializer
 
 
-class BlockedDateViewSet(viewsets.ReadOnlyModelViewSet):
+class BlockedDateViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for retrieving blocked dates.
     GET /api/blocked-dates/ - Get all blocked dates
@@ -204,3 +514,37 @@ class BlockedDateViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = BlockedDate.objects.all()
     serializer_class = BlockedDateSerializer
 
+
+class CatalogView(APIView):
+    """
+    Everything the booking pages need before a date is picked, in one document.
+    GET /api/catalog/ - Active services and add-ons, business hours and blocked dates
+    
+    Carries a strong ETag that changes when any of them is saved or deleted,
+    and answers If-None-Match with 304 from the cache, without queries.
+    Cache-Control lets browsers and proxies reuse it for CATALOG_MAX_AGE seconds.
+    """
+    
+    def get(self, request):
+        etag, body = CatalogCache.get_or_compute(
+            [catalog_snapshot, schedule_snapshot], self.render_catalog
+        )
+        
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'CATALOG_MAX_AGE', 300))
+        return response
+    
+    @staticmethod
+    def render_catalog():
+        """The document as bytes; each list matches its own endpoint's response"""
+        return ORJSONRenderer().render({
+            'services': ServiceViewSet.values_serializer().serialize(ServiceViewSet.queryset.all()),
+            'addons': AddOnViewSet.values_serializer().serialize(AddOnViewSet.queryset.all()),
+            'business_hours': BusinessHoursViewSet.values_serializer().serialize(
+                BusinessHoursViewSet.queryset.all()
+            ),
+            'blocked_dates': BlockedDateSerializer(BlockedDateViewSet.queryset.all(), many=True).data,
+        })
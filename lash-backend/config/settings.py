@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from pathlib import Path
 import os
 import dj_database_url
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -107,10 +108,62 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Take the write lock at BEGIN so concurrent bookings queue on the
+            # busy timeout instead of failing with "database is locked"
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+            },
         }
     }
 
 
+# Cache
+# Invalidation (signals, management commands) bumps version counters in
+# this cache, so it must be shared by every gunicorn worker and every
+# manage.py process. Use Redis when available; otherwise fall back to a
+# file-based cache, which all processes on the host share. A per-process
+# LocMemCache would leave other workers serving stale availability.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / '.cache')),
+            'OPTIONS': {
+                # Availability entries are per date and duration; keep culling rare
+                'MAX_ENTRIES': 10000,
+            },
+        }
+    }
+
+# Seconds a computed day of availability stays cached
+AVAILABILITY_CACHE_TIMEOUT = int(os.getenv('AVAILABILITY_CACHE_TIMEOUT', '300'))
+
+# Count availability cache hits and misses (see availability_cache_stats).
+# Every count is a cache write, and only Redis increments atomically, so
+# this defaults to on with Redis and off with the file-based cache
+AVAILABILITY_CACHE_STATS = os.getenv(
+    'AVAILABILITY_CACHE_STATS', 'True' if os.getenv('REDIS_URL') else 'False'
+) == 'True'
+
+# Seconds a serialized appointment stays cached for the confirmation page
+CONFIRMATION_CACHE_TIMEOUT = int(os.getenv('CONFIRMATION_CACHE_TIMEOUT', '60'))
+
+# Maximum seconds a worker keeps an in-process snapshot (business hours,
+# blocked dates) before re-reading it, even if no version bump was seen
+SNAPSHOT_MAX_AGE = int(os.getenv('SNAPSHOT_MAX_AGE', '60'))
+
+# Seconds browsers and proxies may reuse GET /api/catalog/ before
+# revalidating it with If-None-Match
+CATALOG_MAX_AGE = int(os.getenv('CATALOG_MAX_AGE', '300'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -161,11 +214,13 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # orjson-backed drop-ins for JSONRenderer and JSONParser; same bytes out,
+    # and they fall back to the stdlib versions when orjson is not installed
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'bookings.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'bookings.parsers.ORJSONParser',
     ],
 }
 
@@ -187,6 +242,12 @@ CORS_ALLOW_METHODS = [
     'PUT',
 ]
 
+# Mobile clients send Idempotency-Key so retried bookings are not duplicated
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
+# Idempotency keys are replayable for this long after a booking succeeds
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
 # Email Configuration
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -70,9 +70,34 @@ export const BookingFlow = ({ onBackToLanding, preselectedServiceId }: BookingFl
 
   const activeClient = clients.find(c => c.id === activeClientId);
   
+  // Services and add-ons per client, so slots are sized for the whole booking
+  const selection = useMemo(() => clients
+    .filter(client => client.service)
+    .map(client => ({
+      serviceId: client.service!.id,
+      addOnIds: client.addOns.map(addon => addon.id),
+    })), [clients]);
+
   // Fetch available time slots for selected date
   const formattedDate = selectedDate ? format(selectedDate, 'yyyy-MM-dd') : null;
-  const { data: timeSlots = [], isLoading: timeSlotsLoading } = useAvailableSlots(formattedDate);
+  const {
+    data: timeSlots = [],
+    isLoading: timeSlotsLoading,
+    isSuccess: timeSlotsLoaded,
+    isFetching: timeSlotsFetching,
+  } = useAvailableSlots(formattedDate, selection);
+
+  // Add-ons are picked after the time, so a chosen time can stop fitting
+  useEffect(() => {
+    if (isConfirmed || !selectedTime || !timeSlotsLoaded || timeSlotsFetching) return;
+
+    const slot = timeSlots.find(s => s.time === selectedTime);
+    if (!slot?.available) {
+      setSelectedTime(null);
+      setCurrentStep(prev => Math.min(prev, 2));
+      toast.error('Your selected time no longer fits this booking. Please choose another time.');
+    }
+  }, [isConfirmed, selectedTime, timeSlots, timeSlotsLoaded, timeSlotsFetching]);
 
   const canProceed = useMemo(() => {
     switch (currentStep) {
@@ -119,6 +144,12 @@ export const BookingFlow = ({ onBackToLanding, preselectedServiceId }: BookingFl
     }
   };
 
+  const handleDateSelect = (date: Date) => {
+    // Times are per date; pick one again for the new date
+    setSelectedDate(date);
+    setSelectedTime(null);
+  };
+
   const handleToggleAddOn = (addOn: AddOn) => {
     setClients(prev => prev.map(c => {
       if (c.id !== activeClientId) return c;
@@ -349,7 +380,7 @@ export const BookingFlow = ({ onBackToLanding, preselectedServiceId }: BookingFl
 
                 <DateSelection
                   selectedDate={selectedDate}
-                  onDateSelect={setSelectedDate}
+                  onDateSelect={handleDateSelect}
                 />
               </div>
             )}
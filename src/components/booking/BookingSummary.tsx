@@ -2,9 +2,8 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { Clock, Sparkles, Truck } from 'lucide-react';
 import { ClientBooking, CustomerDetails } from '@/types/booking';
 import { cn } from '@/lib/utils';
-import { formatDuration, formatPrice, formatCurrency } from '@/lib/format';
-
-const TRANSPORT_FEE = 2; // $2 transport fee
+import { formatDuration, formatCurrency } from '@/lib/format';
+import { useQuote } from '@/hooks/useApi';
 
 interface BookingSummaryProps {
   clients: ClientBooking[];
@@ -13,21 +12,22 @@ interface BookingSummaryProps {
 }
 
 export const BookingSummary = ({ clients, customerDetails, className }: BookingSummaryProps) => {
-  const totalPrice = clients.reduce((acc, client) => {
-    const servicePrice = formatPrice(client.service?.price || 0);
-    const addOnsPrice = client.addOns.reduce((sum, addon) => sum + formatPrice(addon.price), 0);
-    return acc + servicePrice + addOnsPrice;
-  }, 0);
+  const selection = clients
+    .filter(client => client.service)
+    .map(client => ({
+      serviceId: client.service!.id,
+      addOnIds: client.addOns.map(addon => addon.id),
+    }));
+
+  // Transport is opted into on the details form, where it defaults to on
+  const needsTransport = customerDetails?.needsTransport ?? true;
 
-  // Transport fee is always included (mandatory for mobile service)
-  const transportFee = TRANSPORT_FEE;
-  const grandTotal = totalPrice + transportFee;
+  // Prices come from the server so the summary matches what is charged
+  const { data: quote } = useQuote(selection, needsTransport);
 
-  const totalDuration = clients.reduce((acc, client) => {
-    const serviceDuration = client.service?.duration || 0;
-    const addOnsDuration = client.addOns.reduce((sum, addon) => sum + addon.duration, 0);
-    return acc + serviceDuration + addOnsDuration;
-  }, 0);
+  const transportFee = quote ? Number(quote.transport_fee) : 0;
+  const grandTotal = quote ? Number(quote.total_price) : null;
+  const totalDuration = quote?.total_duration ?? 0;
 
   const hasSelection = clients.some(client => client.service);
 
@@ -55,10 +55,12 @@ export const BookingSummary = ({ clients, customerDetails, className }: BookingS
                 <Sparkles className="w-4 h-4" />
                 <span>{clients.filter(c => c.service).length} {clients.filter(c => c.service).length === 1 ? 'client' : 'clients'}</span>
               </div>
-              <div className="flex items-center gap-1.5 text-sm text-muted-foreground">
-                <Truck className="w-4 h-4" />
-                <span>+{formatCurrency(transportFee)}</span>
-              </div>
+              {transportFee > 0 && (
+                <div className="flex items-center gap-1.5 text-sm text-muted-foreground">
+                  <Truck className="w-4 h-4" />
+                  <span>+{formatCurrency(transportFee)}</span>
+                </div>
+              )}
             </div>
             <AnimatePresence mode="wait">
               <motion.span
@@ -68,7 +70,7 @@ export const BookingSummary = ({ clients, customerDetails, className }: BookingS
                 exit={{ opacity: 0, y: -10 }}
                 className="text-2xl font-sans font-medium text-foreground"
               >
-                {formatCurrency(grandTotal)}
+                {grandTotal === null ? '…' : formatCurrency(grandTotal)}
               </motion.span>
             </AnimatePresence>
           </div>
@@ -10,7 +10,10 @@ export const queryKeys = {
   businessHours: ['businessHours'] as const,
   appointments: ['appointments'] as const,
   appointment: (code: string) => ['appointment', code] as const,
-  availableSlots: (date: string) => ['availableSlots', date] as const,
+  availableSlots: (date: string, clients: Array<{ serviceId: string; addOnIds: string[] }>) =>
+    ['availableSlots', date, clients] as const,
+  quote: (clients: Array<{ serviceId: string; addOnIds: string[] }>, needsTransport: boolean) =>
+    ['quote', clients, needsTransport] as const,
 };
 
 // Services Hook
@@ -40,11 +43,14 @@ export function useBusinessHours() {
   });
 }
 
-// Available Slots Hook
-export function useAvailableSlots(date: string | null) {
+// Available Slots Hook - slots long enough for every client's service and add-ons
+export function useAvailableSlots(
+  date: string | null,
+  clients: Array<{ serviceId: string; addOnIds: string[] }>
+) {
   return useQuery({
-    queryKey: queryKeys.availableSlots(date || ''),
-    queryFn: () => api.appointments.getAvailableSlots(date!),
+    queryKey: queryKeys.availableSlots(date || '', clients),
+    queryFn: () => api.appointments.getAvailableSlots(date!, clients),
     enabled: !!date,
     staleTime: 0,
     gcTime: 0,
@@ -53,6 +59,20 @@ export function useAvailableSlots(date: string | null) {
   });
 }
 
+// Quote Hook - server-side price and duration for the current selection
+export function useQuote(
+  clients: Array<{ serviceId: string; addOnIds: string[] }>,
+  needsTransport: boolean
+) {
+  return useQuery({
+    queryKey: queryKeys.quote(clients, needsTransport),
+    queryFn: () => api.appointments.quote(clients, needsTransport),
+    enabled: clients.length > 0,
+    staleTime: QUERY_CONFIG.STALE_TIME.SERVICES,
+    placeholderData: (previous) => previous,
+  });
+}
+
 // Appointment by Confirmation Hook
 export function useAppointment(confirmationCode: string) {
   return useQuery({
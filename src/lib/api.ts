@@ -33,6 +33,39 @@ interface AvailabilityResponse {
   message?: string;
 }
 
+interface QuoteResponse {
+  clients: Array<{
+    client_number: number;
+    service_id: string;
+    add_on_ids: string[];
+    duration: number;
+    price: string;
+  }>;
+  total_duration: number;
+  subtotal: string;
+  transport_fee: string;
+  total_price: string;
+}
+
+interface CatalogResponse {
+  services: Service[];
+  addons: AddOn[];
+  business_hours: Array<{
+    id: number;
+    weekday: number;
+    weekday_display: string;
+    is_open: boolean;
+    open_time: string | null;
+    close_time: string | null;
+  }>;
+  blocked_dates: Array<{
+    id: number;
+    date: string;
+    reason: string;
+    created_at: string;
+  }>;
+}
+
 interface AvailableSlotsResponse {
   slots: Array<{
     time: string;
@@ -58,27 +91,45 @@ async function handleResponse<T>(response: Response): Promise<T> {
   return response.json();
 }
 
+// Catalog API
+// Services, add-ons and business hours come from one cacheable document;
+// the three hooks load together, so they share a single request
+let catalogRequest: Promise<CatalogResponse> | null = null;
+
+export const catalogAPI = {
+  get: (): Promise<CatalogResponse> => {
+    if (!catalogRequest) {
+      catalogRequest = fetch(`${API_BASE_URL}/catalog/`)
+        .then((response) => handleResponse<CatalogResponse>(response))
+        .finally(() => {
+          catalogRequest = null;
+        });
+    }
+    return catalogRequest;
+  },
+};
+
 // Services API
 export const servicesAPI = {
   getAll: async (): Promise<Service[]> => {
-    const response = await fetch(`${API_BASE_URL}/services/`);
-    return handleResponse<Service[]>(response);
+    const catalog = await catalogAPI.get();
+    return catalog.services;
   },
 };
 
 // Add-Ons API
 export const addOnsAPI = {
   getAll: async (): Promise<AddOn[]> => {
-    const response = await fetch(`${API_BASE_URL}/addons/`);
-    return handleResponse<AddOn[]>(response);
+    const catalog = await catalogAPI.get();
+    return catalog.addons;
   },
 };
 
 // Business Hours API
 export const businessHoursAPI = {
   getAll: async () => {
-    const response = await fetch(`${API_BASE_URL}/business-hours/`);
-    return handleResponse(response);
+    const catalog = await catalogAPI.get();
+    return catalog.business_hours;
   },
 };
 
@@ -141,9 +192,40 @@ export const appointmentsAPI = {
     return handleResponse<AvailabilityResponse>(response);
   },
 
-  getAvailableSlots: async (date: string): Promise<TimeSlot[]> => {
+  quote: async (
+    clients: Array<{ serviceId: string; addOnIds: string[] }>,
+    needsTransport: boolean
+  ): Promise<QuoteResponse> => {
+    const response = await fetch(`${API_BASE_URL}/appointments/quote/`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        needs_transport: needsTransport,
+        clients: clients.map((client) => ({
+          service_id: client.serviceId,
+          add_on_ids: client.addOnIds,
+        })),
+      }),
+    });
+    return handleResponse<QuoteResponse>(response);
+  },
+
+  getAvailableSlots: async (
+    date: string,
+    clients: Array<{ serviceId: string; addOnIds: string[] }>
+  ): Promise<TimeSlot[]> => {
+    // Size the slots for the whole booking: one service per client and
+    // one add_on_ids list per client, in the same order
+    const params = new URLSearchParams({ date });
+    if (clients.length > 0) {
+      params.set('service_ids', clients.map((client) => client.serviceId).join(','));
+      clients.forEach((client) => params.append('add_on_ids', client.addOnIds.join(',')));
+    }
+
     const response = await fetch(
-      `${API_BASE_URL}/appointments/available_slots/?date=${date}`
+      `${API_BASE_URL}/appointments/available_slots/?${params}`
     );
     const data = await handleResponse<AvailableSlotsResponse>(response);
     
@@ -155,13 +237,15 @@ export const appointmentsAPI = {
   },
 
   getAll: async (): Promise<AppointmentResponse[]> => {
-    const response = await fetch(`${API_BASE_URL}/appointments/`);
+    // The list is cursor-paginated; ask for the whole list as a plain array
+    const response = await fetch(`${API_BASE_URL}/appointments/?paginate=false`);
     return handleResponse<AppointmentResponse[]>(response);
   },
 };
 
 // Export all APIs
 export const api = {
+  catalog: catalogAPI,
   services: servicesAPI,
   addOns: addOnsAPI,
   businessHours: businessHoursAPI,
@@ -169,4 +253,4 @@ export const api = {
 };
 
 export { APIError };
-export type { AppointmentResponse, AvailabilityResponse };
+export type { AppointmentResponse, AvailabilityResponse, CatalogResponse, QuoteResponse };